@@ -112,6 +112,7 @@ from ncclient.xml_ import to_ele
 from lxml import etree
 import xml.dom.minidom
 import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
 import clips
 import datetime
 from datetime import datetime
@@ -134,8 +135,13 @@ import yaml
 # Imports for syslog message receiver
 #
 import queue
-import socketserver
+import asyncio
+import collections
+import socket
 import threading
+import concurrent.futures
+import itertools
+import hashlib
 try:
     import resource
 except:
@@ -159,46 +165,788 @@ except:
         from genie_parsers import *
     except: pass
 
+from ddrparserlib import compile_protofact, TemplateCache, ResponseCache, assert_facts_bulk
+from ddrparserlib import compile_netconf_fact, compile_multitemplate_fact, merge_subtree_filters, split_reply
+from ddrparserlib import push_updates, subscription_id, yang_push_subscription
+from ddrparserlib import TriggerMatcher, parse_syslog_5424, syslog_frames
+
 ############################################################################################
 #
 # Syslog server for receiving syslog messages from devices that can't send
 # NETCONF notfications for syslog messages
-# The SyslogUDPHandler runs in a thread and when a Syslog message is received from the device
-# puts the Syslog message on the "mesq".  The Syslog mesq is processed by the DDR main loop
+# The SyslogHub for a syslog address and port owns the SyslogReceiver socket.  Each DDR instance in the
+# process subscribes to the hub with its own SyslogQueue and the hub puts each received Syslog message
+# on the queues of the instances that accept the message.  The queue is processed by the DDR main loop
 #
 ############################################################################################
 #
-# This class defines the server for syslog messages
-# The handle function is called whenever a message is received
-#
-class SyslogUDPHandler(socketserver.BaseRequestHandler):
-    global mesq
-    def handle(self):
+# syslog_entry - message text and source names for a syslog datagram or TCP frame
+#
+# The text of an RFC5424 message is the MSG part of the message.  For other messages text before the first ':' is removed
+# The source names are the address of the sender and the RFC5424 HOSTNAME if the message has a HOSTNAME
+#
+def syslog_entry(data, address=None):
+    text = str(bytes.decode(data.strip(), errors="replace"))
+    header = parse_syslog_5424(text)
+    if header is None:
+        return text.split(':', 1)[-1], (address,)
+    if header["hostname"] is None:
+        return header["msg"], (address,)
+    return header["msg"], (address, header["hostname"])
+
+#
+# SyslogQueue - bounded queue of received syslog messages
+#
+# size - maximum number of queued messages, the oldest message is dropped when a message is put on a full queue
+#
+# get_batch waits for a message and returns all queued messages, up to max_batch messages, in the order received
+# received - messages put on the queue
+# dropped - messages removed from a full queue before they were processed
+# overflows - number of times the queue became full
+# latency_max, latency_total - seconds between putting messages on the queue and returning them from get_batch
+#
+class SyslogQueue:
+    def __init__(self, size=10000, clock=time.monotonic):
+        self.size = size
+        self.clock = clock
+        self.messages = collections.deque()
+        self.condition = threading.Condition()
+        self.received = 0
+        self.dropped = 0
+        self.overflows = 0
+        self.batches = 0
+        self.latency_max = 0
+        self.latency_total = 0
+
+    def __len__(self):
+        return len(self.messages)
+
+    def put(self, message):
+        self.put_many([message])
+
+    def put_many(self, messages):
+        now = self.clock()
+        with self.condition:
+            full = len(self.messages) >= self.size
+            for message in messages:
+                self.messages.append((now, message))
+            self.received += len(messages)
+            extra = len(self.messages) - self.size
+            if extra > 0:
+                if not full:
+                    self.overflows += 1
+                self.dropped += extra
+                for x in range(extra):
+                    self.messages.popleft()
+            self.condition.notify()
+
+    def get_batch(self, max_batch=500, timeout=None):
+        with self.condition:
+            if not self.condition.wait_for(lambda: len(self.messages) > 0, timeout):
+                return []
+            now = self.clock()
+            batch = []
+            while self.messages and len(batch) < max_batch:
+                queued, message = self.messages.popleft()
+                latency = now - queued
+                self.latency_total += latency
+                self.latency_max = max(self.latency_max, latency)
+                batch.append(message)
+            self.batches += 1
+            return batch
+#
+# SyslogProtocol - asyncio datagram protocol for the SyslogReceiver
+# Messages received in one pass of the event loop are passed to the SyslogHub together with the source addresses
+#
+class SyslogProtocol(asyncio.DatagramProtocol):
+    def __init__(self, syslog_hub):
+        self.syslog_hub = syslog_hub
+        self.pending = []
+        self.sources = []
+        self.loop = None
+
+    def connection_made(self, transport):
+        self.loop = asyncio.get_running_loop()
+
+    def datagram_received(self, data, addr):
         try:
-            data = bytes.decode(self.request[0].strip())
-            socket = self.request[1]
-            mesq.put(str(data).split(':', 1)[-1])
+            if self.pending == []:
+                self.loop.call_soon(self.flush)
+            message, source = syslog_entry(data, addr[0])
+            self.pending.append(message)
+            self.sources.append(source)
         except Exception as e:
-            print("\n%%%%% Error processing Syslog message queue")
-#
-# Function to put a syslog message in the queue - Runs in thread
-# The SyslogUDPHandler is invoked when a Syslog message is received
-# UDP server is started to receive messages on PORT
+            print("\n%%%%% Error processing Syslog message: " + str(e))
+
+    def flush(self):
+        pending, sources = self.pending, self.sources
+        self.pending = []
+        self.sources = []
+        self.syslog_hub.put_many(pending, sources)
+#
+# SyslogStreamProtocol - asyncio protocol for a TCP syslog connection using RFC6587 framing
+# All of the complete frames in the connection read buffer are passed to the SyslogHub together each time data is received
+# The connection is closed when a frame is not valid
+#
+class SyslogStreamProtocol(asyncio.Protocol):
+    def __init__(self, syslog_hub, receiver=None, max_message=65536):
+        self.syslog_hub = syslog_hub
+        self.receiver = receiver
+        self.max_message = max_message
+        self.buffer = bytearray()
+        self.transport = None
+        self.address = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.address = transport.get_extra_info("peername")[0]
+        if self.receiver is not None:
+            self.receiver.connections += 1
+
+    def data_received(self, data):
+        self.buffer.extend(data)
+        try:
+            frames = syslog_frames(self.buffer, self.max_message)
+        except ValueError as e:
+            print("\n%%%%% Error processing Syslog TCP stream from " + str(self.address) + ": " + str(e))
+            if self.receiver is not None:
+                self.receiver.framing_errors += 1
+            self.buffer.clear()
+            self.transport.close()
+            return
+        self.put_frames(frames)
+
+    def eof_received(self):
+        self.put_frames([bytes(self.buffer)] if self.buffer.strip() else [])
+        self.buffer.clear()
+
+    def put_frames(self, frames):
+        messages = []
+        sources = []
+        for frame in frames:
+            message, source = syslog_entry(frame, self.address)
+            messages.append(message)
+            sources.append(source)
+        if messages != []:
+            self.syslog_hub.put_many(messages, sources)
+#
+# SyslogReceiver - receive syslog messages on a UDP or TCP port and pass the messages and source names to a SyslogHub
+# The receiver runs an asyncio event loop in a thread.  start() returns the port the receiver is bound to
+# receive_buffer - socket receive buffer size requested so bursts of datagrams are not dropped by the host
+# tcp - True listens for TCP connections using RFC6587 octet-counting or newline framing instead of UDP datagrams
 # The device(s) generating Syslog messages are configured "logging host a.b.c.d" to
 # direct Syslog messages to the device hosting the Syslog receiver.  UDP messages on
 # port 514 are forwarded to the Syslog receiver in eMRE
 #
-def queue_syslog(mesq, HOST, PORT):
-    try:
-        server = socketserver.UDPServer((HOST,PORT), SyslogUDPHandler)
-        server.serve_forever(poll_interval=0.5)
-
-    except Exception as e:
-        print("%%%%% Syslog listener exception: " + str(e))
-        print("%%%%% {host,port}: {" + HOST + "," + str(PORT) + "}")
-    except KeyboardInterrupt:
-        print ("Crtl+C Pressed. Shutting down.")
-        return # Exit the DDR main loop
+class SyslogReceiver:
+    def __init__(self, syslog_hub, host, port, receive_buffer=4194304, tcp=False):
+        self.syslog_hub = syslog_hub
+        self.receive_buffer = receive_buffer
+        self.tcp = tcp
+        self.host = host
+        self.port = port
+        self.loop = None
+        self.transport = None
+        self.connections = 0
+        self.framing_errors = 0
+        self.error = None
+        self.started = threading.Event()
+        self.thread = None
+
+    def start(self, timeout=10):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.started.wait(timeout)
+        if self.error is not None:
+            raise self.error
+        return self.port
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        try:
+            if self.tcp:
+                self.transport = self.loop.run_until_complete(
+                    self.loop.create_server(lambda: SyslogStreamProtocol(self.syslog_hub, self), self.host, self.port, reuse_address=True))
+                self.port = self.transport.sockets[0].getsockname()[1]
+            else:
+                self.transport, protocol = self.loop.run_until_complete(
+                    self.loop.create_datagram_endpoint(lambda: SyslogProtocol(self.syslog_hub), local_addr=(self.host, self.port)))
+                self.port = self.transport.get_extra_info("sockname")[1]
+                try:
+                    self.transport.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.receive_buffer)
+                except Exception:
+                    pass
+        except Exception as e:
+            self.error = e
+            self.started.set()
+            self.loop.close()
+            return
+        self.started.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.transport.close()
+            self.loop.close()
+
+    def stop(self):
+        if self.loop is not None and self.transport is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.thread is not None:
+            self.thread.join(5)
+#
+# SyslogSubscription - SyslogQueue of a DDR instance subscribed to a SyslogHub
+#
+# sources - source addresses or RFC5424 hostnames of the messages put on the queue, empty accepts messages from all sources
+# matcher - TriggerMatcher for the syslog triggers of the instance, only messages that match a trigger are put on the queue
+#
+# hub - SyslogHub the subscription was added to
+#
+# Each message is put on the queue as (message, matched) where matched is the list of trigger indexes returned
+# by the matcher, or None without a matcher.  process_syslog uses matched and does not scan the message again
+#
+class SyslogSubscription:
+    def __init__(self, syslog_queue, sources=(), matcher=None, hub=None):
+        self.syslog_queue = syslog_queue
+        self.sources = frozenset(sources or ())
+        self.matcher = matcher
+        self.hub = hub
+
+    def select(self, message, source):
+        if self.sources and self.sources.isdisjoint(source):
+            return None
+        if self.matcher is None:
+            return (message, None)
+        matched = self.matcher.match(message)
+        if matched == []:
+            return None
+        return (message, matched)
+#
+# SyslogHub - one syslog listener shared by all of the DDR instances in the process
+#
+# SyslogHub.shared(host, port) returns the hub for the address and port.  The UDP SyslogReceiver is started
+# by the first subscribe and the TCP SyslogReceiver on the same port by the first subscribe with tcp=True.
+# The receivers are stopped and the hub is removed from hubs when the last subscription is removed
+# unrouted - messages received that were not accepted by any subscription
+#
+# The hub lookup, subscribe and unsubscribe are done holding hubs_lock so a hub that is being removed is
+# not returned and the receivers of a removed hub are stopped before another hub can bind the port.
+# A subscribe to a hub that was removed after it was returned by shared() is added to the hub in hubs
+#
+class SyslogHub:
+    hubs = {}
+    hubs_lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, host, port):
+        with cls.hubs_lock:
+            hub = cls.hubs.get((host, port))
+            if hub is None:
+                hub = cls(host, port)
+                cls.hubs[(host, port)] = hub
+            return hub
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.key = (host, port)
+        self.subscriptions = []
+        self.lock = threading.Lock()
+        self.receiver = None
+        self.tcp_receiver = None
+        self.received = 0
+        self.unrouted = 0
+
+    def subscribe(self, syslog_queue, sources=(), matcher=None, tcp=False):
+        with SyslogHub.hubs_lock:
+            hub = SyslogHub.hubs.setdefault(self.key, self)
+            subscription = SyslogSubscription(syslog_queue, sources, matcher, hub)
+            if hub.receiver is None:
+                receiver = SyslogReceiver(hub, hub.host, hub.port)
+                hub.port = receiver.start()
+                hub.receiver = receiver
+            if tcp and hub.tcp_receiver is None:
+                tcp_receiver = SyslogReceiver(hub, hub.host, hub.port, tcp=True)
+                tcp_receiver.start()
+                hub.tcp_receiver = tcp_receiver
+            hub.subscriptions = hub.subscriptions + [subscription]
+        return subscription
+
+    def unsubscribe(self, subscription):
+        hub = subscription.hub if subscription.hub is not None else self
+        with SyslogHub.hubs_lock:
+            hub.subscriptions = [entry for entry in hub.subscriptions if entry is not subscription]
+            if hub.subscriptions != []:
+                return
+            if SyslogHub.hubs.get(hub.key) is hub:
+                del SyslogHub.hubs[hub.key]
+            for receiver in (hub.receiver, hub.tcp_receiver):
+                if receiver is not None:
+                    receiver.stop()
+            hub.receiver = None
+            hub.tcp_receiver = None
+    #
+    # Called by the SyslogReceivers with the messages received in one pass of the event loop or one TCP read
+    #
+    def put_many(self, messages, sources=None):
+        if sources is None:
+            sources = [()] * len(messages)
+        routed = [False] * len(messages)
+        for subscription in self.subscriptions:
+            selected = []
+            for index, message in enumerate(messages):
+                entry = subscription.select(message, sources[index])
+                if entry is not None:
+                    selected.append(entry)
+                    routed[index] = True
+            if selected != []:
+                subscription.syslog_queue.put_many(selected)
+        with self.lock:
+            self.received += len(messages)
+            self.unrouted += routed.count(False)
+
+############################################################################################
+#
+# Persistent SSH sessions for show command collection
+#
+# Opening an SSH connection for every show command costs a full SSH handshake and login.
+# SSHSession keeps one interactive CLI session open to a device and runs commands by
+# sending the command and waiting for the device prompt.  SSHSessionPool keeps up to
+# "ssh-pool-size" sessions per device that are shared by all of the DDR methods that
+# run show commands over SSH.  Sessions that fail or time out are closed and reopened.
+#
+############################################################################################
+#
+# Pattern used to find the CLI prompt after login, e.g. "Router#", "switch#" or "RP/0/RP0/CPU0:xrv9k#"
+#
+SSH_PASSWORD_PROMPTS = ['\r\nPassword: ', '\r\npassword: ', 'Password: ', 'password: ']
+SSH_CLI_PROMPT = r'[\r\n][\w\-\.:/@\(\)~]+[#>] ?$'
+SSH_OPTIONS = '-q -oStrictHostKeyChecking=no -oUserKnownHostsFile=/dev/null -oPubkeyAuthentication=no'
+#
+# Returned by collect_fact when the show command response is the same as in the last cycle
+#
+RESPONSE_UNCHANGED = object()
+#
+# Notification event time, e.g. <eventTime>2020-09-29T09:47:38+00:00</eventTime>, and the hh:mm:ss part of the time
+#
+EVENT_TIME_REGEX = re.compile('<eventTime>(.*)</eventTime>')
+EVENT_SECONDS_REGEX = re.compile('.{11}(?P<mtime>(.{8}))')
+
+class SSHSession:
+    def __init__(self, address, user, password, timeout=30, logfile=None):
+        self.address = str(address)
+        self.user = str(user)
+        self.password = str(password)
+        self.timeout = timeout
+        self.logfile = logfile
+        self.child = None
+        self.prompt = None
+    #
+    # Log in to the device, find the CLI prompt and disable output paging
+    # The prompt found after login is used to detect the end of each command response
+    #
+    def connect(self):
+        ssh_cmd = 'ssh %s@%s %s' % (self.user, self.address, SSH_OPTIONS)
+        self.child = pexpect.spawn(ssh_cmd, timeout=self.timeout, encoding='utf-8')
+        self.child.delaybeforesend = None
+        if self.logfile is not None:
+            self.child.logfile = self.logfile
+        index = self.child.expect(SSH_PASSWORD_PROMPTS + [SSH_CLI_PROMPT])
+        if index < len(SSH_PASSWORD_PROMPTS):
+            self.child.sendline(self.password)
+            self.child.expect(SSH_CLI_PROMPT)
+        self.prompt = self.child.after.strip()
+        self.run("terminal length 0")
+
+    def alive(self):
+        return self.child is not None and self.child.isalive()
+    #
+    # Run a command and return the response without the echoed command line or the trailing prompt
+    #
+    def run(self, command, timeout=None):
+        if timeout is None:
+            timeout = self.timeout
+        self.child.sendline(str(command))
+        self.child.expect_exact('\n' + self.prompt, timeout=timeout)
+        response = self.child.before
+        if '\n' in response:
+            response = response.split('\n', 1)[1]
+        else:
+            response = ''
+        return response
+    #
+    # Run a command and yield the response one line at a time as it is read from the device
+    # The response ends when the prompt is found at the start of a line
+    #
+    def run_lines(self, command, timeout=None):
+        if timeout is None:
+            timeout = self.timeout
+        self.child.sendline(str(command))
+        self.child.expect_exact('\n', timeout=timeout)
+        partial = ''
+        while True:
+            index = self.child.expect_exact([self.prompt, '\n'], timeout=timeout)
+            if index == 0:
+                if partial == '' and self.child.before.strip() == '':
+                    return
+                partial = partial + self.child.before + self.child.after
+                continue
+            yield (partial + self.child.before).rstrip('\r')
+            partial = ''
+
+    def close(self):
+        try:
+            if self.child is not None:
+                self.child.close(force=True)
+        except Exception:
+            pass
+        self.child = None
+
+class SSHSessionPool:
+    def __init__(self, default_size=1, logfile=None, session_class=SSHSession):
+        self.default_size = default_size
+        self.logfile = logfile
+        self.session_class = session_class
+        self.sizes = {}
+        self.idle = {}
+        self.created = {}
+        self.condition = threading.Condition()
+    #
+    # Set the maximum number of sessions opened to a device address
+    #
+    def set_size(self, address, size):
+        self.sizes[str(address)] = max(1, int(size))
+    #
+    # Get an idle session for the device or open a new session if fewer than the pool size
+    # are open.  If all sessions are in use wait for a session to be returned to the pool or
+    # discarded.  pexpect.TIMEOUT is raised if no session is available after timeout seconds
+    #
+    def checkout(self, address, user, password, timeout):
+        key = (str(address), str(user))
+        end_time = time.monotonic() + timeout
+        with self.condition:
+            while True:
+                idle = self.idle.setdefault(key, collections.deque())
+                if idle:
+                    return idle.popleft()
+                if self.created.get(key, 0) < self.sizes.get(key[0], self.default_size):
+                    self.created[key] = self.created.get(key, 0) + 1
+                    break
+                remaining = end_time - time.monotonic()
+                if remaining <= 0:
+                    raise pexpect.TIMEOUT("No SSH session to " + key[0] + " available after " + str(timeout) + " seconds")
+                self.condition.wait(remaining)
+        session = self.session_class(address, user, password, timeout, self.logfile)
+        try:
+            session.connect()
+        except Exception:
+            session.close()
+            self.discard(key)
+            raise
+        return session
+
+    def checkin(self, session):
+        key = (session.address, session.user)
+        with self.condition:
+            self.idle.setdefault(key, collections.deque()).append(session)
+            self.condition.notify()
+
+    def discard(self, key):
+        with self.condition:
+            self.created[key] = max(0, self.created.get(key, 1) - 1)
+            self.condition.notify()
+    #
+    # Run a command on the device using a pooled session
+    # If the session has been closed by the device, or the command fails, the session is closed
+    # and the command is retried once on a new session
+    #
+    def run_command(self, address, user, password, command, timeout=60):
+        for attempt in range(2):
+            session = self.checkout(address, user, password, timeout)
+            if not session.alive():
+                session.close()
+                self.discard((session.address, session.user))
+                continue
+            try:
+                response = session.run(command, timeout)
+                self.checkin(session)
+                return response
+            except Exception as e:
+                session.close()
+                self.discard((session.address, session.user))
+                if attempt == 1:
+                    raise e
+        raise pexpect.EOF("SSH session to " + str(address) + " closed")
+    #
+    # Run a command on the device using a pooled session and yield the response lines
+    # The session is returned to the pool when all lines have been read.  If the consumer
+    # stops reading early the rest of the response is still pending on the session so the
+    # session is closed.  Commands are not retried because lines may already have been used
+    #
+    def run_command_lines(self, address, user, password, command, timeout=60):
+        session = self.checkout(address, user, password, timeout)
+        complete = False
+        try:
+            if not session.alive():
+                raise pexpect.EOF("SSH session to " + str(address) + " closed")
+            for line in session.run_lines(command, timeout):
+                yield line
+            complete = True
+        finally:
+            if complete:
+                self.checkin(session)
+            else:
+                session.close()
+                self.discard((session.address, session.user))
+
+    def close_all(self):
+        with self.condition:
+            for key, idle in self.idle.items():
+                while idle:
+                    idle.popleft().close()
+                    self.created[key] = max(0, self.created.get(key, 1) - 1)
+            self.condition.notify_all()
+
+############################################################################################
+#
+# Managed NETCONF sessions
+#
+# NetconfSession holds the ncclient manager for one device and passes method calls to the
+# manager so it is used in place of the manager.  The manager is opened by the connect function
+# passed in so the same class is used for device-list, mgmt-device and notification sessions.
+#
+# Each session has a circuit breaker:
+#    "closed"    - the session is connected and requests are sent to the device
+#    "open"      - the session failed, requests fail immediately with NetconfSessionUnavailable
+#    "half-open" - a reconnect attempt is in progress
+#
+# A get waits up to "timeout" seconds for a get in progress on the session to complete and then
+# fails with NetconfSessionUnavailable so a request is not blocked by a get that does not return.
+#
+# NetconfSessionPool runs a background thread that sends an SSH keepalive on each connected
+# session every "keepalive" seconds and reconnects failed sessions.  The time between reconnect
+# attempts doubles after each failure from "backoff" up to "backoff_max" seconds.  A device
+# that is down costs a fast failure instead of a full "nc-timeout" for each request.
+#
+############################################################################################
+class NetconfSessionUnavailable(Exception):
+    pass
+
+class NetconfSession:
+    def __init__(self, name, connect, log=None, timeout=None):
+        self.name = str(name)
+        self.connect_function = connect
+        self.log_function = log
+        self.timeout = timeout
+        self.manager = None
+        self.state = "open"
+        self.failures = 0
+        self.retry_time = 0
+        self.error = None
+        self.lock = threading.Lock()
+
+    def log(self, message):
+        if self.log_function is not None:
+            self.log_function(message)
+    #
+    # Open the session.  Exceptions from the connect function are returned to the caller
+    #
+    def connect(self):
+        self.state = "half-open"
+        try:
+            self.manager = self.connect_function()
+        except Exception as e:
+            self.failed(e)
+            raise
+        self.state = "closed"
+        self.failures = 0
+        self.error = None
+
+    def connected(self):
+        return self.state == "closed"
+    #
+    # Open the circuit breaker and close the manager after a failure
+    #
+    def failed(self, error):
+        self.state = "open"
+        self.error = str(error)
+        self.retry_time = 0
+        manager = self.manager
+        self.manager = None
+        if manager is not None:
+            try:
+                manager.close_session()
+            except Exception:
+                pass
+
+    def available(self):
+        if self.state != "closed" or self.manager is None:
+            raise NetconfSessionUnavailable("NETCONF session to " + self.name + " is not connected: " + str(self.error))
+        return self.manager
+    #
+    # Return True for exceptions that show the session can not be used
+    # RPC errors returned by the device do not affect the session
+    #
+    def session_error(self, manager, error):
+        return isinstance(error, ncclient.operations.TimeoutExpiredError) or not manager.connected
+    #
+    # Run a NETCONF get and return the reply XML.  The session is used by one thread at a time
+    #
+    def get_xml(self, subtree):
+        if not self.lock.acquire(timeout=-1 if self.timeout is None else self.timeout):
+            raise NetconfSessionUnavailable("NETCONF session to " + self.name + " is busy: get in progress for more than " + str(self.timeout) + " seconds")
+        try:
+            manager = self.available()
+            try:
+                return manager.get(filter=('subtree', subtree)).xml
+            except Exception as e:
+                if self.session_error(manager, e):
+                    self.failed(e)
+                raise
+        finally:
+            self.lock.release()
+    #
+    # Wait for a notification.  The wait continues on the new manager if the session is reconnected
+    #
+    def take_notification(self, block=True, timeout=None):
+        if not block:
+            return self.available().take_notification(block=False)
+        if timeout is not None:
+            end_time = time.time() + timeout
+        while timeout is None or time.time() < end_time:
+            manager = self.manager
+            if self.state == "closed" and manager is not None:
+                notification = manager.take_notification(block=True, timeout=1)
+                if notification is not None:
+                    return notification
+                if not manager.connected and self.manager is manager:
+                    self.failed("notification session closed")
+            else:
+                time.sleep(1)
+        return None
+    #
+    # Send an SSH keepalive and open the circuit breaker if the session has dropped
+    # Sessions in use by a get are not checked
+    #
+    def keepalive(self):
+        if not self.lock.acquire(blocking=False):
+            return
+        try:
+            manager = self.manager
+            if manager is None:
+                return
+            if not manager.connected:
+                self.failed("session closed")
+                return
+            transport = getattr(manager.session, "_transport", None)
+            if transport is not None:
+                transport.send_ignore()
+        except Exception as e:
+            self.failed(e)
+        finally:
+            self.lock.release()
+
+    def close_session(self):
+        self.state = "open"
+        self.error = "closed"
+        manager = self.manager
+        self.manager = None
+        if manager is not None:
+            manager.close_session()
+
+    def __getattr__(self, name):
+        if name.startswith("_") or name in ["state", "manager", "error"]:
+            raise AttributeError(name)
+        manager = self.available()
+        attribute = getattr(manager, name)
+        if not callable(attribute):
+            return attribute
+        def call(*args, **kwargs):
+            try:
+                return attribute(*args, **kwargs)
+            except Exception as e:
+                if self.session_error(manager, e) and self.manager is manager:
+                    self.failed(e)
+                raise
+        return call
+
+class NetconfSessionPool:
+    def __init__(self, keepalive=30, backoff=1, backoff_max=60, log=None):
+        self.keepalive = keepalive
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.log_function = log
+        self.sessions = []
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def add(self, session):
+        self.sessions.append(session)
+        return session
+    #
+    # Connect the sessions that are not connected in parallel
+    # Returns a list of (session, error) for the sessions that could not be connected
+    #
+    def connect(self, sessions):
+        sessions = [session for session in sessions if not session.connected()]
+        if sessions == []:
+            return []
+        errors = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(sessions)) as executor:
+            futures = [(session, executor.submit(session.connect)) for session in sessions]
+            for session, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    errors.append((session, e))
+        return errors
+    #
+    # Schedule the next reconnect attempt for a failed session using exponential backoff
+    #
+    def schedule_retry(self, session, now):
+        delay = min(self.backoff_max, self.backoff * (2 ** min(session.failures, 16)))
+        session.failures = session.failures + 1
+        session.retry_time = now + delay
+
+    def maintain(self, now, next_keepalive):
+        for session in list(self.sessions):
+            if session.state == "closed":
+                if now >= next_keepalive:
+                    session.keepalive()
+                    if session.state == "open":
+                        session.log("%%%% DDR Error: NETCONF session to " + session.name + " dropped: " + str(session.error))
+            if session.state == "open":
+                if session.retry_time == 0:
+                    self.schedule_retry(session, now)
+                elif now >= session.retry_time:
+                    try:
+                        session.connect()
+                        session.log("**** DDR Notice: NETCONF session to " + session.name + " reconnected")
+                    except Exception as e:
+                        session.log("%%%% DDR Error: NETCONF session to " + session.name + " reconnect failed: " + str(e))
+                        self.schedule_retry(session, now)
+
+    def run(self):
+        next_keepalive = time.time() + self.keepalive
+        while not self.stop_event.wait(min(1, self.backoff)):
+            now = time.time()
+            try:
+                self.maintain(now, next_keepalive)
+            except Exception as e:
+                if self.log_function is not None:
+                    self.log_function("%%%% DDR Error: NETCONF session pool: " + str(e))
+            if now >= next_keepalive:
+                next_keepalive = now + self.keepalive
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
 
     #############################################################################
     #############################################################################
@@ -228,8 +976,6 @@ class DDR:
 
         return str(self.si_notification)
 
-    global mesq
-    mesq = queue.Queue()
     #
     # DDR entry point - Call this function to load and start CLIPs execution
     #
@@ -281,6 +1027,7 @@ class DDR:
         timed_trigger = False
         notification_trigger = False
         control_trigger = False
+        telemetry_trigger = False
 
 #######################################################################################
 #
@@ -309,160 +1056,16 @@ class DDR:
 
         if self.control["run-mode"] == 1:
 #
-# mesq.get() checks to see if there is a message available on the Queue that
-# contains device Syslog messages received and processed by "queue_syslog" function.
-# If there are no syslog messages in the queue, do not wait
-#
-# script waits to receive a syslog message sent the IP and port defined for the syslog listener
-#
-            syslog = mesq.get()
-            timestamp =  datetime.now().strftime("%m-%d-%Y_%H:%M:%S.%f")
-            
-            if self.control["debug-syslog"] == 1:
-                self.print_log("\n**** DDR Debug: Syslog Message Queued at: " + str(timestamp))
-                self.print_log(syslog)
-#
-# Loop through all match strings for the Syslog message.  All of the strings must be found
-# in the syslog or the trigger condition is not satisfied
-#
-#   element 0 - List containing strings that must all be matched
-#   element 1 - Optional statically defined FACTs with no parameters.  Each FACT in the list is asserted
-#   element 2 - 'True' if the FACT defined in element 3 should be asserted using content parsed from the Syslog message
-#   element 3[0] - Regular expression used to extract fields from the syslog message and insert into variables.
-#   element 3[1] - List variable names that will be used to populate the FACT
-#   element 3[2] - Prototype FACT template name
-#   element 3[3] - Syslog event-type
-#   element 3[4] - device name
-#
-# The example below will assert a "rule-step" FACT normally used to trigger usecase execution
-# A bgp-event FACT will also be generated
-#
-# ddr-fact content:
-#   syslog_triggers = 
-#    [['BGP-5-ADJCHANGE', 'Down'], 
-#     ['(rule-step (step bgp-adjacency-syslog-received))'], 
-#     'True', 
-#     ['.*neighbor.{1}(?P<neighbor>(\S+)).{1}(?P<state>(\S+)).*\(VRF\: (?P<vrf>(\S[^)]+)).*', 
-#      [['device', 'str'], ['event-time', 'str'], ['event-type', 'str'], ['neighbor', 'str'], ['state', 'str'], ['vrf', 'str']], 'bgp-event', 'NEIGHBOR-DOWN']]
-#
-            syslog_trigger = False
-            for trigger in self.control["syslog-triggers"]:
-                if self.control["debug-syslog"] == 1:
-                    self.print_log("**** DDR Debug: Syslog trigger: " + str(trigger))
-
-#
-# Loop through all match string for the syslog trigger entry.  All of the strings must be found
-# in the syslog or the trigger condition is not satisfied
-#
-                if all([val in str(syslog) for val in trigger[0]]):
-                    syslog_trigger = True
-                    if self.control["debug-syslog"] == 1:
-                        self.print_log("**** DDR Debug: Syslog trigger strings matched: " + str(trigger[0]))
-                    try:
-                        if trigger[2] == 'True':
-                            if self.control["debug-syslog"] == 1:
-                                self.print_log("\n**** DDR Debug: Assert Syslog FACT")
-                            self.assert_syslog_fact(syslog)
-#
-#  If additional FACTs should be asserted assert each static FACT in the list
-#
-                        if trigger[1] != []:
-                            try:
-                                for syslog_fact in trigger[1]:
-                                    if self.control["debug-syslog"] == 1:
-                                        self.print_log("**** DDR Debug: Assert static Syslog FACT: " + str(syslog_fact))
-                                    self.env.assert_string(str(syslog_fact))
-                            except Exception as e:
-                                self.print_log("%%%% DDR Error: Asserting static Syslog fact: " + str(trigger[1]) + "\n" + str(e))
-                            break
-                    except:
-                        self.print_log("%%%% DDR Error: Asserting syslog fact for: " + str(syslog))
-                        break
-#
-# Extract FACTs from the notification message and assert a FACT in CLIPs
-# Process in a try clause for backward compatibility with older FACT files that do not have this option
-#
-                    if trigger[3] != []:
-                        mdata = trigger[3]
-                        SlogClean = syslog.replace(',',' ')
-                        if self.control["debug-syslog"] == 1:
-                            self.print_log("**** DDR Debug: Clean Syslog message: " + str(SlogClean) + "\nRegex: " + str(mdata[0]))
-                        try:
-                            p1 = re.compile(str(mdata[0])) #generate regex object
-                        except Exception as e:
-                            self.print_log("\n%%%% DDR Error: Syslog fact regex: " + str(mdata[0]) + "\n" +str(e))
-                            break
-#
-# Build the notification FACT using data parsed from the notification text
-# This code supports selecting up to 6 values from the Syslog message to assert in the FACT
-# 
-                        timestamp =  datetime.now().strftime("%m-%d-%Y_%H:%M:%S.%f")
-                        try:
-                            try:
-                                results = p1.match(str(SlogClean)) #extract fields from message
-                                if str(results) == 'None':
-                                    self.print_log("**** DDR Debug: Syslog no data found: " + str(mdata[0]) + "\nSyslog Message: " + str(SlogClean))
-                                    break
-
-                                if self.control["debug-syslog"] == 1:
-                                     self.print_log("**** DDR Debug: Syslog regex results: " + str(results))
-
-                            except Exception as e:
-                                self.print_log("\n%%%% DDR Error: Syslog parsing: " + str(SlogClean) + "\n" +str(e))
-                                break
+# syslog_queue.get_batch() waits for syslog messages queued by the SyslogHub and returns all of the
+# messages in the queue, up to syslog-batch-size messages.  The SyslogHub queues each message with the
+# syslog triggers it matched.  Messages that match a trigger within trigger-window ms of the first matching message
+# are processed together, up to trigger-max-batch messages, before one FACT collection and inference engine run
 #
-# create a python dictionary containing the Syslog message FACT data - mdata
-#  ['.*', '.*Ethernet ring (?P<ring>\\S+).*', 'ASR903_4', [['ring', 'str']], 'PENDING-CHANGE', 'ring-event']
-#                                         
-                            if self.control["debug-syslog"] == 1:
-                                 self.print_log("**** DDR Debug: Syslog match data: " + str(mdata))
-                            try:
-                                keys = mdata[3] #get the slot names
-                                template = self.env.find_template(str(mdata[5])) # get an empty template fact for event
-                                fact1 = {}
-                                fact1["device"] = str(mdata[2])
-                                fact1["event-type"] = str(mdata[4]) # event type defined for this Syslog message
-                                fact1["event-time"] = str(timestamp)
-                            except Exception as e:
-                                self.print_log("\n%%%% DDR Error: Syslog fact template: " + str(e))
-#  ['ring', 'str']
-
-                            try:
-                                results = re.search(mdata[1], str(SlogClean))
-                                group = results.groupdict() #dictionary contains key/values for parsed message slots
-
-                                for fact in mdata[3]:
-                                    if fact[1] == 'str':
-                                        fact1[str(fact[0])] = str(group[str(fact[0])])
-                                    elif fact[1] == 'int':
-                                        fact1[str(fact[0])] = int(group[str(fact[0])])
-                                    elif fact[1] == 'flt':
-                                        fact1[str(fact[0])] = float(group[str(fact[0])])
-                                    elif fact[1] == 'none':
-                                        fact1[str(fact[0])] = group[str(fact[0])]
-                            except Exception as e:
-                                self.print_log("\n%%%% DDR Error: Syslog fact parameters: " + str(e) + " fact: " + str(fact) + " " + str(group[str(fact[0])]))
-
-                            try:
-                                fact1["timestamp"] = datetime.now().strftime("%m-%d-%Y_%H:%M:%S.%f")
-                                result = template.assert_fact(**fact1)
-                                if self.control["debug-fact"] == 1:
-                                    self.print_log("**** DDR Debug: syslog fact dictionary: " + str(result))
-
-                            except Exception as e:
-                                if self.control["debug-fact"] == 1:
-                                    self.print_log("\n%%%% DDR Exception: syslog fact: " + str(e) + " " + str(fact1))
-                                pass
-
-                        except Exception as e:
-                                self.print_log("\n%%%% DDR Error: Syslog processing error :" + str(SlogClean) + " " + str(e))
-
-                    if syslog_trigger == True: break
-
-                else:
-                    if self.control["debug-syslog"] == 1:
-                        self.print_log("**** DDR Debug: Syslog did not match all triggering conditions :" + str(syslog) + "\n" + str(trigger[0]))
-                    return
+            syslog_trigger = self.coalesce_triggers(self.wait_syslog, self.process_syslog_entry) > 0
+            self.ddr_timing(' **** DDR Time: Syslog messages dropped: %d', self.syslog_queue.dropped, "syslog-dropped", 1)
+            self.ddr_timing(' **** DDR Time: Syslog maximum queue latency(ms): %8.3f', self.syslog_queue.latency_max, "syslog-latency-max")
+            if syslog_trigger == False:
+                return
 
 #######################################################################################
 #
@@ -481,259 +1084,72 @@ class DDR:
 #######################################################################################
 #
 # block and wait until an RFC5277 NETCONF notification is received
+# Notifications that match a trigger within trigger-window ms of the first matching notification
+# are processed together, up to trigger-max-batch notifications, before one FACT collection and inference engine run
 #
-            if self.control["debug-notify"] == 1:
-               self.print_log("**** DDR Debug: Wait for Notification Event")
-
-            if self.control["single-notify"] == 1:
-                input("\n\nHit Enter to accept one notification event\n\n")  # useful when manually debugging
-
-            try:
-                if self.control["run-mode"] == 2:
-                    notification_found = False
-                    notif = self.notify_conn.take_notification(block=True) # block on IO waiting for the NETCONF notification
-                    notify_xml = notif.notification_xml
-                if self.control["debug-notify"] == 1:
-                    self.print_log("**** DDR Debug: RFC5277 notification received: " + notify_xml)
-            except Exception as e:
-                self.print_log("\n%%%% DDR Error: In notification event processing: " + str(e))
-                notify_xml = ''
-
-######################################################################################
-# Test to see if the snmpevents notification included any of the strings that
-# are included in the notification_triggers definitions in the FACTs file.  If so, run the rules engine
-######################################################################################
-
-            if notify_xml != '':
+            notification_trigger = self.coalesce_triggers(self.wait_notification, self.process_notification) > 0
 
-                for trigger in self.control["notification-triggers"]:
-                    notification_trigger = False
-#
-# Loop through all match strings for the notification.  All of the strings must be found
-# in the notification or the trigger condition is not satisfied
-#
-#   element 0 - List containing strings that must all be matched.  Strings appear in the NETCONF Notification
-#   element 1 - Optional statically defined FACT with no paramters if triggering conditions in element 0 are satisfied
-#   element 2 - 'True' if the the content in element 3 should be used to generate a FACT from the message content
-#   element 3[0] - The regular expression in this entry extracts all of the text from the indicated xml tag for processing
-#   element 3[1] - Regular expression used to extract fields from the message and insert into variables.
-#   element 3[2] - List variable names that will be used to populate the FACT
-#   element 3[3] - Prototype FACT template.  The variables are inserted in order into the template and the FACT is asserted
-#   element 3[4] - RULE template name.  Name of the RULE in ddr-rules used to assert the FACT
+#######################################################################################
 #
-# notification_triggers = [
-#      [['ADJCHANGE', 'Down'], 
-#       ['(assert (sample-fact (sample-slot sample-value)))'], 
-#       'false', 
-#       ['<clogHistMsgText>(.*)</clogHistMsgText>', 
-#        'neighbor.{1}(?P<neighbor>(\S+)).{1}(?P<state>(\S+)).{1}(?P<message>(.+))', 
-#        ['neighbor', 'state', 'message'],
-#        '(bgp-event (device {0}) (event-time {1}) (event-type NEIGHBOR-DOWN) (neighbor {2}) (state {3}) (message {4})  (syslog-time {5}))']
-#     ]
-# ]
+# control["run-mode"] = 3 Run CLIPs immediately - Subsequent triggers caused by
+#                         control files written by external systems to /bootflash/guest-share/ddr
 #
-                    if all([val in str(notify_xml) for val in trigger[0]]): 
-                        notification_trigger = True                        
-                        try:
-                            timestamp =  datetime.now().strftime("%m-%d-%Y_%H:%M:%S.%f")
-                            self.print_log("\n**** DDR Notice: Triggering Notification Event Found: " + str(trigger[0]) + " at: " + str(timestamp))
-                            for fact in trigger[1]:
-                                if self.control["debug-fact"] == 1:
-                                    self.print_log("**** DDR Debug: Notification static FACT: " + str(fact))  
-                                try:                                  
-                                    self.env.assert_string(str(fact))
-                                except Exception as e:
-                                    self.print_log("\n%%%% DDR Error: Asserting notification static FACT: " + str(fact) + " " + str(e))
-                                    break
+#######################################################################################
+        if self.control["run-mode"] == 3:
+            self.print_log("\n**** DDR Notice: Wait for trigger from external application control-file write to device")
+            run_delay = self.control["run-wait"]/1000
+            self.run_read_control_file(self.control["control-file"], run_delay)
+            control_trigger = True
+            timestamp =  datetime.now().strftime("%m-%d-%Y_%H:%M:%S.%f")
+            
+            self.print_log("\n**** DDR Notice: Trigger Event: Enable external application trigger at: " + str(timestamp))
 
+#######################################################################################
 #
-# Get the event time - Extract syslog mesasge time from notification and translate into seconds since midnight
-# Insert the seconds into the generated syslog FACT
-# Sample time: <eventTime>2020-09-29T09:47:38+00:00</eventTime>
+# control["run-mode"] = 4 Run when a telemetry update is pushed by a device or after run-wait
+#                         if no update is received.  Requires "telemetry" set to 1
 #
-                            try:
-                                event_seconds = 0
-                                event_content = re.search('<eventTime>(.*)</eventTime>', str(notify_xml)) #extract event_time field from message
-                                p1 = re.compile('.{11}(?P<mtime>(.{8}))') #regex to extract time in seconds
-                                results = p1.match(str(event_content.group(1))) #extract seconds field from message
-                                syslog_time = str(event_content.group(1))
-                                group = results.groupdict() #dictionary contains objects
-                                times = str(group["mtime"]).split(":")
-                                event_seconds = sum(int(x) * 60 ** i for i, x in enumerate(reversed(times)))
-                            except Exception as e:
-                                self.print_log("\n%%%% DDR Error: Generating notification time: " + str(event_content.group(1)) + " " + str(e))
-                                break
+#######################################################################################
+        if self.control["run-mode"] == 4:
+            self.print_log("\n**** DDR Notice: Wait for telemetry update")
+            if self.telemetry_event.wait(self.control["run-wait"]/1000):
+                telemetry_trigger = True
+            else:
+                timed_trigger = True
+            self.telemetry_event.clear()
+            timestamp =  datetime.now().strftime("%m-%d-%Y_%H:%M:%S.%f")
+
+            self.print_log("\n**** DDR Notice: Trigger Event: Telemetry update at: " + str(timestamp))
+            
+###################################################################################
 #
-# Extract FACTs from the notification message and assert a FACT in CLIPs
+# Determine if DDR is in the "active" mode with standby-active set to 1
+# If standby-active is set to 0, skip processing for this execution cycle
+# The standby-active state is updated at the end of each execution loop
 #
-                            if trigger [2] == "True" and trigger[3] != [] :
-                                try:                                
-                                    SlogClean = notify_xml.replace(',',' ')
-                                except Exception as e:
-                                    self.print_log("\n%%%% DDR Error: Processing notification message: " + str(notify_xml) + " " + str(e))
-                                    break
+###################################################################################
+
+        if self.control["standby-active"] == 1:
+         
+###################################################################################
 #
-# Build the notification FACT using data parsed from the notification text
-# trigger[3][0] is used to select content from the Syslog message
+# Test to see if any triggering event was found
 #
-                                timestamp =  datetime.now().strftime("%m-%d-%Y_%H:%M:%S.%f")
-                                try:
-                                    if self.control["debug-notify"] == 1:
-                                        self.print_log("**** DDR Debug: Syslog trigger regex: \n" + str(trigger[3][0]) + " " + str(trigger[3][1]))
-                                    message_content = re.search(trigger[3][0], str(notify_xml))
-
-                                    if self.control["debug-notify"] == 1:
-                                        self.print_log("**** DDR Debug: Syslog trigger message: \n" + str(message_content.group(1)))
-
-                                    p1 = re.compile(trigger[3][1]) #regex to extract fields from the message content
-                                    results = p1.match(str(message_content.group(1))) #extract fields from message
+###################################################################################
 
-                                    if results == None:
-                                        self.print_log("\n%%%% DDR Error: No Notification match for: \n" + str(message_content.group(1)) +  " " + str(trigger[3][1]) )
-                                        break
+            if syslog_trigger or timed_trigger or notification_trigger or control_trigger or telemetry_trigger:
 
-                                    if self.control["debug-notify"] == 1:
-                                        self.print_log("**** DDR Debug: Syslog FACT string: \n" + str(results))
-                                        
-                                except Exception as e:
-                                    self.print_log("\n%%%% DDR Error: Notification parsing: Check for errors or missing regex definitions\n "  +str(e) + "\n" + str(trigger))
-                                    break
+######################################################################################
+#
+# For each fact in the fact_list get the operational or configuration data required
+# to populate the facts required by the expert system
+# Assert the facts in the expert system
+# Measure the amount of time required to collect the facts from the device
+#
+######################################################################################
 
-############################################################################################################
-#
-# notification_triggers are triggered by matching a list of strings contained in RFC5277 notifications generated by the device.
-# If the notification first element of the list, the trigger is matched, eMRE asserts a triggers eMRE execution
-# The notification_trigger can also be used to extract data from the Syslog message and assert a FACT.
-# In the examples below two notifications are used, one for neighbor up and one for neighbor down.
-#   element 0 - List containing strings that must all be matched
-#   element 1 - Optional statically defined FACT with no paramters
-#   element 2 - 'True' if the FACT defined in element 3 should be asserted
-#   element 3[0] - The regular expression in this entry extracts all of the text in the indicated xml tag for processing
-#   element 3[1] - Regular expression used to extract fields from the message and insert into variables.
-#   element 3[2] - List variable names that will be used to populate the FACT
-#   element 3[3] - Value to put into notification FACT 'event-type' slot
-#   element 3[4] - deftemplate name in ddr-rules file to contain the generated FACT
-#
-# Example: *Feb 26 07:13:33.842: %LINEPROTO-5-UPDOWN: Line protocol on Interface GigabitEthernet1/0/12, changed state to down
-#     <clogHistMsgText>Line protocol on Interface GigabitEthernet1/0/11, changed state to down</clogHistMsgText>
-#notification_triggers = [
-#  [['LINEPROTO', 'changed state to down'],
-#   ['(notify-event (event-type "INTERFACE-DOWN") (name GE12))'],
-#   'True',
-#  ['<clogHistMsgText>(.*)</clogHistMsgText>',
-#    'Line protocol on Interface (?P<name>(\S+))',
-#  [['name', 'str']], 'INTERFACE-DOWN', 'notify-event']
-#  ]
-#]
-#
-# create a python dictionary containing the Notification message FACT data
-# Create a FACT and insert the slot values for device, event-time, and event-type defined in ddr-facts 
-#
-                                fact1 = {"notification-not-found"} # return in error message if FACT is not generated
-
-                                try:
-                                    try:
-                                        template = self.env.find_template(str(trigger[3][4])) # get an empty template fact for event
-                                    except Exception as e:
-                                        self.print_log("\n%%%% DDR Error: Notification template not found: " + str(fact1) + " " + str(e))
-                                        break
-
-                                    fact1 = {}
-                                    fact1["device"] = str(self.control["mgmt-device"][4])
-                                    fact1["event-type"] = str(trigger[3][3]) # event type defined for this Syslog message
-                                    fact1["event-time"] = str(timestamp)
-                                    if self.control["debug-fact"] == 1:
-                                        self.print_log("**** DDR Debug: notification fact initialization: " + str(fact1))
-
-                                except Exception as e:
-                                    self.print_log("\n%%%% DDR Error: Notification FACT initialization error: " + str(fact1) + " " + str(e))
-                                    break
-#
-# Insert the FACT slot values defined in ddr-facts for this notification
-#
-                                try:
-                                    if results == None:
-                                        self.print_log("\n%%%% DDR Error: No Notification match for fact slots in: " + str(message_content))
-                                                                          
-                                    group = results.groupdict() #dictionary contains key/values for parsed message slots
-                                    try:
-                                        keys = trigger[3][2] #get the slot names
-                                        if self.control["debug-notify"] == 1:
-                                            self.print_log("**** DDR Debug: Notification FACT keys: " + str(keys))
-                                       
-                                        for fact in keys:
-                                            if fact[1] == "int":
-                                                fact1[fact[0]] = int(group[str(fact[0])])
-                                            elif fact[1] == "flt":
-                                                fact1[fact[0]] = float(group[str(fact[0])])
-                                            elif fact[1] == "str":
-                                                fact1[fact[0]] = str(group[str(fact[0])])
-                                            else:
-                                                fact1[fact[0]] = group[str(fact[0])]
-
-                                    except Exception as e:
-                                        self.print_log("\n%%%% DDR Error: notification fact slots: " + str(fact) + " " + str(e))
-
-                                    fact1["timestamp"] = datetime.now().strftime("%m-%d-%Y_%H:%M:%S.%f")
-                                    result = template.assert_fact(**fact1)
-                                    if self.control["debug-fact"] == 1:
-                                        self.print_log("**** DDR Debug: notification fact dictionary: " + str(result))
-                                        
-                                except Exception as e:
-                                    if self.control["debug-fact"] == 1:
-                                        self.print_log("\n%%%% DDR Error: Notification fact: " + str(e) + " " + str(fact1))
-                                    pass
-
-                        except Exception as e:
-                            self.print_log("\n%%%% DDR Error: Processing notification fact: " + str(fact1) + " " + str(e))
-                            break
-
-                    if notification_trigger == True: break
-
-#######################################################################################
-#
-# control["run-mode"] = 3 Run CLIPs immediately - Subsequent triggers caused by
-#                         control files written by external systems to /bootflash/guest-share/ddr
-#
-#######################################################################################
-        if self.control["run-mode"] == 3:
-            self.print_log("\n**** DDR Notice: Wait for trigger from external application control-file write to device")
-            run_delay = self.control["run-wait"]/1000
-            self.run_read_control_file(self.control["control-file"], run_delay)
-            control_trigger = True
-            timestamp =  datetime.now().strftime("%m-%d-%Y_%H:%M:%S.%f")
-            
-            self.print_log("\n**** DDR Notice: Trigger Event: Enable external application trigger at: " + str(timestamp))
-            
-###################################################################################
-#
-# Determine if DDR is in the "active" mode with standby-active set to 1
-# If standby-active is set to 0, skip processing for this execution cycle
-# The standby-active state is updated at the end of each execution loop
-#
-###################################################################################
-
-        if self.control["standby-active"] == 1:
-         
-###################################################################################
-#
-# Test to see if any triggering event was found
-#
-###################################################################################
-
-            if syslog_trigger or timed_trigger or notification_trigger or control_trigger:
-
-######################################################################################
-#
-# For each fact in the fact_list get the operational or configuration data required
-# to populate the facts required by the expert system
-# Assert the facts in the expert system
-# Measure the amount of time required to collect the facts from the device
-#
-######################################################################################
-
-#####################################################################
-#####################################################################
+#####################################################################
+#####################################################################
 #
 # Assert all FACTS here
 #
@@ -772,20 +1188,29 @@ class DDR:
 #
                 else:
                     starttime = time.time()
+                    self.response_cache_hits = 0
                     try:
-                        for fact in self.control["fact-list"]:
-                            if self.control["debug-fact"] == 1:
-                                self.print_log("**** DDR Debug: Main fact loop: " + str(fact))
-                            if fact["fact_type"] == "show_and_assert":
-                                if "log_message_while_running" in fact:
-                                    self.print_log(fact["log_message_while_running"])
-                                self.show_and_assert_fact(fact, self.control["device-list"][0][6])
-                            elif fact["fact_type"] == "multitemplate":
-                                self.get_template_multifacts_index(fact["data"], 'none', 'none', self.control["device-list"][0][6])
-                            elif fact["fact_type"] == "multitemplate_protofact":
-                                self.get_template_multifacts_protofact_index(fact, 'none', 'none', self.control["device-list"][0][6])
-                            else:
-                                self.print_log("\n%%%% DDR Error: Error in ddr-facts fact_list [] - Invalid fact type: " + str(fact))
+                        if self.control["collect-workers"] > 1:
+                            self.collect_fact_list()
+                        else:
+                            replies = self.prefetch_netconf_facts(self.control["fact-list"])
+                            for fact in self.control["fact-list"]:
+                                if self.control["debug-fact"] == 1:
+                                    self.print_log("**** DDR Debug: Main fact loop: " + str(fact))
+                                device_index = self.fact_device_index(fact)
+                                if fact["fact_type"] == "show_and_assert":
+                                    if "log_message_while_running" in fact:
+                                        self.print_log(fact["log_message_while_running"])
+                                    self.show_and_assert_fact(fact, device_index)
+                                elif id(fact) in replies:
+                                    if replies[id(fact)] is not None:
+                                        self.assert_netconf_reply(fact, device_index, replies[id(fact)], 'none', 'none')
+                                elif fact["fact_type"] == "multitemplate":
+                                    self.get_template_multifacts_index(fact["data"], 'none', 'none', device_index)
+                                elif fact["fact_type"] == "multitemplate_protofact":
+                                    self.get_template_multifacts_protofact_index(fact, 'none', 'none', device_index)
+                                else:
+                                    self.print_log("\n%%%% DDR Error: Error in ddr-facts fact_list [] - Invalid fact type: " + str(fact))
                     except Exception as e:
                     
                         self.print_log("\n%%%% DDR Error: Error in ddr-facts fact_list [] - Fact type selection error: " + str(e))
@@ -803,6 +1228,8 @@ class DDR:
                     endtime = time.time()
                     fact_runtime = endtime - starttime
                     self.ddr_timing(' **** DDR Time: Get and process FACTS from devices(ms): %8.3f', fact_runtime, "get-device-facts")
+                    if self.control["show-response-cache"] == 1:
+                        self.ddr_timing(' **** DDR Time: Unchanged show responses not parsed: %d', self.response_cache_hits, "show-response-cache-hits", 1)
 
 #
 # If control facts are being used, get the facts from the ddr-control file
@@ -859,7 +1286,9 @@ class DDR:
                     self.memory_use(" **** DDR Memory: Before Running Inference Engine in KBytes: ", "before-clips-run")
                     if self.control["debug-fact"] == 1:
                         self.print_log("**** DDR Debug: Run CLIPs to process FACTs")
-                    
+                    self.read_cache.new_cycle()
+                    if self.control["telemetry"] == 1:
+                        self.assert_telemetry_updates()
                     self.env.run()
                 except Exception as e:
                     self.print_log("\n%%%% DDR Error: Exception when running inference engine " + str(e))
@@ -869,6 +1298,9 @@ class DDR:
 
                 endtime = time.time()
                 clips_runtime = endtime - starttime
+                if self.control["rule-read-cache"] == 1:
+                    self.ddr_timing(' **** DDR Time: Rule reads from cache: %d', self.read_cache.hits, "rule-read-cache-hits", 1)
+                    self.ddr_timing(' **** DDR Time: Rule reads from devices: %d', self.read_cache.misses, "rule-read-cache-misses", 1)
                 self.ddr_timing(' **** DDR Time: Run Inference Engine(ms): %8.3f\n', clips_runtime, "clips-runtime")
 #
 # Add facts to service impact notification after CLIPs is run if required
@@ -887,11 +1319,12 @@ class DDR:
                     event_time = datetime.now().strftime("%m-%d-%Y_%H_%M_%S.%f")
                     impactMessage = ''.join(self.impactList)
                     self.impactList = []
+                    triggerCounts = self.trigger_counts_xml()
 #
 # Generate RFC5277 formated Service Impact notification message
 #
                     try:
-                        self.si_notification = self.control["service-impact"].format("DDR Service Impact Notification: " + str(self.control["use-case"]), impactMessage, self.clips_facts, self.dict_facts, str(self.control["session-time"]), datetime.now().strftime("%m-%d-%Y_%H_%M_%S.%f"))
+                        self.si_notification = self.control["service-impact"].format("DDR Service Impact Notification: " + str(self.control["use-case"]), impactMessage, self.clips_facts, self.dict_facts, str(self.control["session-time"]), datetime.now().strftime("%m-%d-%Y_%H_%M_%S.%f"), triggerCounts)
                         if self.control["json-notify"] == 1:
                             data_dict = xmltodict.parse(self.si_notification)
                             self.si_notification = json.dumps(data_dict, indent=2, sort_keys=True)
@@ -1062,6 +1495,65 @@ class DDR:
                     self.control.update({"session-log-count" : 0})
                     self.print_log("**** DDR Notice: ddr-flags.yaml in usecase directory used to set DDR control flags")
     #
+    # Default values for optional ddr-flags.yaml content
+    #
+    #   collect-workers - number of threads used to collect fact-list FACTs, 1 collects FACTs sequentially
+    #   collect-device-workers - maximum number of fact-list entries collected from one device at the same time
+    #   stream-batch-size - number of FACTs asserted together by FACT definitions using "stream": True
+    #   event-history-watermark - 1 asserts FACTs only for event-history entries newer than the entries
+    #                             seen in earlier collections from the device, 0 asserts all entries
+    #   show-response-cache - 1 skips parsing show_and_assert responses that are the same as the response
+    #                         in the last cycle for the device and command
+    #   show-response-cache-keep-facts - 1 asserts the FACTs generated from the last parse again when the
+    #                         response is unchanged, 0 does not assert FACTs for an unchanged response
+    #   netconf-workers - maximum number of NETCONF gets run at the same time, 1 runs the gets sequentially
+    #   nc-keepalive - seconds between keepalives sent on the NETCONF sessions
+    #   nc-reconnect-backoff - seconds before the first attempt to reconnect a dropped NETCONF session,
+    #                          the time doubles after each failed attempt up to nc-reconnect-backoff-max seconds
+    #   nc-merge-filters - 1 merges the subtree filters of the NETCONF fact-list entries for a device and model
+    #                      into one get and returns the data for each entry from the merged reply
+    #   rule-read-cache - 1 uses the response from memory when run_nc_fact_index or run_show_parameter_index_version
+    #                     repeat a read with the same device, filter or command and parameters
+    #   rule-read-cache-ttl - seconds a cached response is used, 0 uses the response until it is removed
+    #   rule-read-cache-cycle - 1 removes the cached responses before each inference engine run
+    #   rule-read-cache-size - maximum number of cached responses, the least recently used is removed first
+    #   telemetry - 1 establishes YANG push subscriptions for the telem_list entries in ddr-facts on the device
+    #               sessions and asserts the FACTs in the pushed updates before each inference engine run
+    #   syslog-queue-size - maximum number of received syslog messages waiting to be processed, the oldest
+    #                       message is dropped when a message is received and the queue is full
+    #   syslog-batch-size - maximum number of queued syslog messages tested against the syslog triggers
+    #                       before one FACT collection and inference engine run
+    #   syslog-sources - source addresses or RFC5424 hostnames of the syslog messages processed by this DDR instance,
+    #                    [] processes messages from all sources.  DDR instances in the same process share one syslog listener
+    #   syslog-tcp - 1 also listens for syslog over TCP on syslog-port using RFC6587 octet-counting or newline framing
+    #   trigger-window - ms after the first syslog message or notification that matches a trigger to wait for more
+    #                    matching events, all of the trigger FACTs are asserted before one FACT collection and
+    #                    inference engine run, 0 runs for the events already received
+    #   trigger-max-batch - maximum number of matching events processed before the FACT collection and inference engine run
+    #
+                    self.control.setdefault("collect-workers", 1)
+                    self.control.setdefault("collect-device-workers", 1)
+                    self.control.setdefault("stream-batch-size", 500)
+                    self.control.setdefault("event-history-watermark", 1)
+                    self.control.setdefault("show-response-cache", 0)
+                    self.control.setdefault("show-response-cache-keep-facts", 1)
+                    self.control.setdefault("netconf-workers", 8)
+                    self.control.setdefault("nc-keepalive", 30)
+                    self.control.setdefault("nc-reconnect-backoff", 1)
+                    self.control.setdefault("nc-reconnect-backoff-max", 60)
+                    self.control.setdefault("nc-merge-filters", 0)
+                    self.control.setdefault("rule-read-cache", 0)
+                    self.control.setdefault("rule-read-cache-ttl", 0)
+                    self.control.setdefault("rule-read-cache-cycle", 1)
+                    self.control.setdefault("rule-read-cache-size", 256)
+                    self.control.setdefault("telemetry", 0)
+                    self.control.setdefault("syslog-queue-size", 10000)
+                    self.control.setdefault("syslog-batch-size", 500)
+                    self.control.setdefault("syslog-sources", [])
+                    self.control.setdefault("syslog-tcp", 0)
+                    self.control.setdefault("trigger-window", 0)
+                    self.control.setdefault("trigger-max-batch", 500)
+    #
     # if ddr-flags.yaml is not in the local directory use ddr-flags
     #
             else:
@@ -1114,6 +1606,24 @@ class DDR:
     #
             self.impactList = []
     #
+    # trigger_counts is the number of events that matched each syslog or notification trigger since the last service-impact notification
+    #
+            self.trigger_counts = {}
+    #
+    # telemetry_event is set when a telemetry update is queued.  The events are created here so run-mode 4
+    # waits for run-wait when "telemetry" is not set to 1 and no subscriptions are started
+    #
+            self.telemetry_queue = queue.Queue()
+            self.telemetry_event = threading.Event()
+            self.telemetry_stop = threading.Event()
+            self.telemetry_facts = {}
+            self.telemetry_update_facts = {}
+    #
+    # syslog_queue holds the syslog messages for run-mode 1.  The queue is created here so run-mode 1 waits
+    # for syslog messages when "syslog-address" is "none" and no syslog receiver is started
+    #
+            self.syslog_queue = SyslogQueue(self.control["syslog-queue-size"])
+    #
     # Initialize the service-impact notfication response
     #
             self.control["service-impact"] = '''
@@ -1125,6 +1635,8 @@ class DDR:
 {2}    </clips-facts>
     <dict-facts>
 {3}    </dict-facts>
+    <trigger-counts>
+{6}    </trigger-counts>
   </ddr-notification>'''
 
         except Exception as e:
@@ -1206,8 +1718,19 @@ class DDR:
                 device_list = []
                 device_instance = []
                 device_dictionary = [] # Save each device definition dictionary entry to assert as an initial FACT
+    #
+    # Optional "ssh-pool-size" in a device definition sets the maximum number of persistent SSH sessions
+    # opened to the device.  It is removed from the definition so the device-list positions are unchanged
+    #
+                if self.control["debug-CLI"] == 1:
+                    self.ssh_pool = SSHSessionPool(logfile=sys.stdout)
+                else:
+                    self.ssh_pool = SSHSessionPool()
                 for key, device in devices.items():
+                    pool_size = device.pop("ssh-pool-size", None)
                     device_instance = list(device.values())
+                    if pool_size is not None:
+                        self.ssh_pool.set_size(device_instance[0], pool_size)
                     if key == "mgmt":
                         self.control["mgmt-device"] = device_instance
                     else:
@@ -1266,6 +1789,8 @@ class DDR:
         except Exception as e:
             self.print_log('\n%%%% DDR Error: ddr-facts file read error: ' + str(e))
             return # Exit the DDR main loop
+        self.compile_protofacts()
+        self.compile_triggers()
 
         self.memory_use("**** DDR Memory: On Entry(kb): ", "entry")
 
@@ -1286,8 +1811,13 @@ class DDR:
                 time.sleep(self.control["startup-delay"])
                 self.print_log("**** DDR Notice: Startup Connect Delay Complete")
     #
+    # NETCONF sessions are managed by a session pool that sends keepalives and reconnects dropped sessions
+    #
+            self.netconf_pool = NetconfSessionPool(self.control["nc-keepalive"], self.control["nc-reconnect-backoff"], self.control["nc-reconnect-backoff-max"], self.print_log)
+    #
     # Connect to device identified as the management device
     #
+            self.netconf_connection = self.netconf_pool.add(NetconfSession(self.control["mgmt-device"][0], self.netconf_connector(self.control["mgmt-device"], 5), self.print_log, self.control["nc-timeout"]))
             retry_count = 1
             connect_success = False
             while retry_count <= self.control["retry-count"]:
@@ -1295,24 +1825,7 @@ class DDR:
     #    Try multiple times to connect (may be delayed for DHCP lease)
     #    If using passwordless NETCONF the ip address will be 127.0.0.1 and connect is different
                 try:
-                    if self.control["mgmt-device"][0] == '127.0.0.1':
-                    
-                        self.netconf_connection = (ncclient.manager.connect(host=self.control["mgmt-device"][0], port=self.control["mgmt-device"][1],
-                            username=self.control["mgmt-device"][2],
-                            ssh_config=True,
-                            hostkey_verify=False,
-                            look_for_keys=False,
-                            allow_agent=False,
-                            timeout=self.control["nc-timeout"]))
-
-                    else:
-                        self.netconf_connection = (ncclient.manager.connect_ssh(host=self.control["mgmt-device"][0], port=self.control["mgmt-device"][1],
-                            username=self.control["mgmt-device"][2],
-                            password=self.control["mgmt-device"][3],
-                            hostkey_verify=False,
-                            look_for_keys=False,
-                            allow_agent=False,
-                            timeout=5))
+                    self.netconf_connection.connect()
     #
     # If connections successful break out of the retry loop
     #
@@ -1362,14 +1875,14 @@ class DDR:
 
     ######################################################################
     #
-    # Start the syslog server and use threading to recieve and queue
-    # syslog messasges for processing
+    # Subscribe to the syslog hub for the syslog address and port.  The hub starts the syslog
+    # receiver for the first DDR instance in the process and queues the syslog messages
+    # from syslog-sources that match the syslog triggers of this instance for processing
     #
     #####################################################################
 
-                        t = threading.Thread(target=queue_syslog, args = (mesq, self.control["syslog-address"], self.control["syslog-port"]))
-                        t.deamon = True
-                        t.start()
+                        self.syslog_hub = SyslogHub.shared(self.control["syslog-address"], self.control["syslog-port"])
+                        self.syslog_subscription = self.syslog_hub.subscribe(self.syslog_queue, self.control["syslog-sources"], self.syslog_matcher, self.control["syslog-tcp"] == 1)
 
                     except Exception as e:
                         self.print_log("\n%%%% DDR Error: Unable to start syslog receiver: " + str(e))   
@@ -1381,35 +1894,16 @@ class DDR:
     # Create a notification listener for run-mode
     #
             if (self.control["run-mode"] == 2):
+                self.notify_conn = self.netconf_pool.add(NetconfSession(self.control["mgmt-device"][0], self.netconf_connector(self.control["mgmt-device"], subscribe=True), self.print_log, self.control["nc-timeout"]))
                 retry_count = 1
                 connect_success = False
                 while retry_count <= self.control["retry-count"]:
     #
     #    Try multiple times to connect for notifications (may be delayed for DHCP lease)
+    #    The session subscribes to the snmpevents stream when it is connected or reconnected
     #
                     try:
-                        if self.control["mgmt-device"][0] == '127.0.0.1':
-
-                            self.notify_conn = (ncclient.manager.connect(host=self.control["mgmt-device"][0], port=self.control["mgmt-device"][1],
-                                username=self.control["mgmt-device"][2],
-                                ssh_config=True,
-                                hostkey_verify=False,
-                                look_for_keys=False,
-                                allow_agent=False,
-                                timeout=self.control["nc-timeout"]))
-                            self.notify_conn.async_mode = False
-                            self.notify_conn.create_subscription(stream_name='snmpevents')
-
-                        else:
-                            self.notify_conn = (ncclient.manager.connect_ssh(host=self.control["mgmt-device"][0], port=self.control["mgmt-device"][1],
-                                username=self.control["mgmt-device"][2],
-                                password=self.control["mgmt-device"][3],
-                                hostkey_verify=False,
-                                look_for_keys=False,
-                                allow_agent=False,
-                                timeout=self.control["nc-timeout"]))
-                            self.notify_conn.async_mode = False
-                            self.notify_conn.create_subscription(stream_name='snmpevents')
+                        self.notify_conn.connect()
     #
     # If connections successful break out of the retry loop
     #
@@ -1446,45 +1940,27 @@ class DDR:
     # If control["test-facts"] is not set, connect to the devices
     #
     ###########################################################################
+            self.device = []
+            for device_dat in self.control["device-list"]:
+                self.device.append(self.netconf_pool.add(NetconfSession(device_dat[4], self.netconf_connector(device_dat), self.print_log, self.control["nc-timeout"])))
             retry_count = 1
             connect_success = False
             while retry_count <= self.control["retry-count"]:
-            
-                try:
-                    self.device = []
-                    for device_dat in self.control["device-list"]:
-                        if device_dat[0] == '127.0.0.1':
-                            self.device.append(ncclient.manager.connect(host=device_dat[0], port=device_dat[1],
-                                        username=device_dat[2],
-                                        ssh_config=True,
-                                        hostkey_verify=False,
-                                        look_for_keys=False,
-                                        allow_agent=False,
-                                        timeout=self.control["nc-timeout"]))
-
-                        else:
-                            self.device.append(ncclient.manager.connect_ssh(host=device_dat[0], port=device_dat[1],
-                                        username=device_dat[2],
-                                        password=device_dat[3],
-                                        hostkey_verify=False,
-                                        look_for_keys=False,
-                                        allow_agent=False,
-                                        timeout=self.control["nc-timeout"]))
-
     #
-    # If connections successful break out of the retry loop
+    # Connect the device sessions in parallel.  Sessions that connected are not reopened on a retry
     #
+                errors = self.netconf_pool.connect(self.device)
+                if errors == []:
                     connect_success = True
                     break
     #
     # If connection failed, retry after waiting "retry-time" seconds
     #
-                except Exception as e:
-                    timestamp =  datetime.now().strftime("%m-%d-%Y_%H:%M:%S.%f")
-                
-                    self.print_log("\n%%%% DDR Error: Unable to connect to device-list entry: " + str(device_dat[0]) + " retry: " + str(retry_count) + " at: " + str(timestamp) + " " + str(e))
-                    retry_count = retry_count + 1
-                    time.sleep(self.control["retry-time"])
+                timestamp =  datetime.now().strftime("%m-%d-%Y_%H:%M:%S.%f")
+                for session, e in errors:
+                    self.print_log("\n%%%% DDR Error: Unable to connect to device-list entry: " + str(session.name) + " retry: " + str(retry_count) + " at: " + str(timestamp) + " " + str(e))
+                retry_count = retry_count + 1
+                time.sleep(self.control["retry-time"])
     #
     # If device connections failed exit
     #
@@ -1497,6 +1973,9 @@ class DDR:
             timestamp =  datetime.now().strftime("%m-%d-%Y_%H:%M:%S.%f")
         
             self.print_log("**** DDR Notice: Connected to all device-list entry devices at: " + str(timestamp))
+            self.netconf_pool.start()
+            if self.control["telemetry"] == 1:
+                self.start_telemetry()
 
     ################################################################################################
     ################################################################################################
@@ -1588,6 +2067,11 @@ class DDR:
         try:
             self.memory_use("**** DDR Memory: Before Creating CLIPs env(kb): ", "before-clips-env")
             self.env = clips.Environment()
+            self.template_cache = TemplateCache(self.env)
+            self.event_watermarks = {}
+            self.response_cache = {}
+            self.response_cache_hits = 0
+            self.read_cache = ResponseCache(self.control["rule-read-cache-size"], self.control["rule-read-cache-ttl"], self.control["rule-read-cache-cycle"] == 1)
             if self.control["debug-action"] == 1:
                 self.print_log("**** DDR Debug: CLIPs Environment: " + str(self.env))
 
@@ -1723,6 +2207,448 @@ class DDR:
                 self.print_log("%%%% DDR Exception: Initializing test-mode FACT: " + str(e))
             pass
 
+    ##############################################################################################
+    #
+    # fact_device_index - Index into the device-list for a fact-list entry
+    #                     An entry can select the device with "device_index" or "device-index"
+    #                     otherwise the device selected by the first device-list entry is used
+    #
+    ##############################################################################################
+    def fact_device_index(self, fact):
+        if "device_index" in fact:
+            return int(fact["device_index"])
+        if "device-index" in fact:
+            return int(fact["device-index"])
+        return self.control["device-list"][0][6]
+
+    ##############################################################################################
+    #
+    # collect_fact_list - Collect the fact-list FACTs using a pool of "collect-workers" threads
+    #
+    # Device access and parsing for each fact-list entry run in a worker thread.  At most
+    # "collect-device-workers" entries access the same device at the same time.
+    # Entries using "stream": True are collected in the main thread when their turn comes.
+    # The CLIPs environment is not thread safe so the results are asserted in the main thread
+    # in fact-list order after each worker completes.
+    # With "nc-merge-filters" 1 the merged NETCONF gets are run and asserted before the workers start.
+    #
+    ##############################################################################################
+    def collect_fact_list(self):
+        device_locks = {}
+        for fact in self.control["fact-list"]:
+            device_index = self.fact_device_index(fact)
+            if device_index not in device_locks:
+                device_locks[device_index] = threading.BoundedSemaphore(self.control["collect-device-workers"])
+
+        replies = {}
+        if self.control["nc-merge-filters"] == 1:
+            replies = self.prefetch_netconf_facts(self.control["fact-list"])
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.control["collect-workers"]) as executor:
+            futures = []
+            for fact in self.control["fact-list"]:
+                device_index = self.fact_device_index(fact)
+                if id(fact) in replies:
+                    if replies[id(fact)] is not None:
+                        self.assert_netconf_reply(fact, device_index, replies[id(fact)], 'none', 'none')
+                    continue
+                if fact["fact_type"] == "show_and_assert" and self.stream_parser(fact) is not None:
+                    futures.append((fact, device_index, None))
+                    continue
+                futures.append((fact, device_index, executor.submit(self.collect_fact, fact, device_index, device_locks[device_index])))
+
+            for fact, device_index, future in futures:
+    #
+    # Streaming FACTs assert while the response is read so they are collected in the main thread
+    #
+                if future is None:
+                    with device_locks[device_index]:
+                        self.show_and_assert_fact(fact, device_index)
+                    continue
+                try:
+                    result = future.result()
+                except Exception as e:
+                    self.print_log("\n%%%% DDR Error: collect_fact_list device: " + str(device_index) + " " + str(e))
+                    continue
+                if result is None:
+                    continue
+                if result is RESPONSE_UNCHANGED:
+                    self.assert_cached_facts(fact, device_index)
+                elif fact["fact_type"] == "show_and_assert":
+                    self.assert_show_response(fact, result, device_index)
+                else:
+                    self.assert_netconf_reply(fact, device_index, result, 'none', 'none')
+
+    ##############################################################################################
+    #
+    # collect_fact - Read the data for one fact-list entry from the device - runs in a worker thread
+    #                Returns the parsed show command output or the NETCONF get reply XML
+    #
+    ##############################################################################################
+    def collect_fact(self, fact, device_index, device_lock):
+        if self.control["debug-fact"] == 1:
+            self.print_log("**** DDR Debug: Collect fact: " + str(fact))
+        with device_lock:
+            if fact["fact_type"] == "show_and_assert":
+                if "log_message_while_running" in fact:
+                    self.print_log(fact["log_message_while_running"])
+                response, version = self.get_show_response(fact, device_index)
+                if response is None:
+                    return None
+                if self.response_unchanged(fact, device_index, response):
+                    return RESPONSE_UNCHANGED
+            elif fact["fact_type"] in ["multitemplate", "multitemplate_protofact"]:
+                return self.netconf_get(device_index, self.netconf_fact_filter(fact))
+            else:
+                self.print_log("\n%%%% DDR Error: Error in ddr-facts fact_list [] - Invalid fact type: " + str(fact))
+                return None
+        parsed_genie_output = self.parse_show_response(fact, response, version, device_index)
+        if parsed_genie_output is None:
+            self.cache_response_facts(fact, device_index, [])
+        return parsed_genie_output
+
+    ##############################################################################################
+    #
+    # netconf_connector - Return the function used by NetconfSession to open a NETCONF session to a
+    #               device-list or mgmt-device entry.  If using passwordless NETCONF the ip address
+    #               will be 127.0.0.1 and connect is different.  subscribe=True subscribes to the
+    #               snmpevents notification stream after the session is opened
+    #
+    ##############################################################################################
+    def netconf_connector(self, device_dat, timeout=None, subscribe=False):
+        if timeout is None:
+            timeout = self.control["nc-timeout"]
+        def connect():
+            if device_dat[0] == '127.0.0.1':
+                manager = ncclient.manager.connect(host=device_dat[0], port=device_dat[1],
+                            username=device_dat[2],
+                            ssh_config=True,
+                            hostkey_verify=False,
+                            look_for_keys=False,
+                            allow_agent=False,
+                            timeout=self.control["nc-timeout"])
+            else:
+                manager = ncclient.manager.connect_ssh(host=device_dat[0], port=device_dat[1],
+                            username=device_dat[2],
+                            password=device_dat[3],
+                            hostkey_verify=False,
+                            look_for_keys=False,
+                            allow_agent=False,
+                            timeout=timeout)
+            if subscribe:
+                manager.async_mode = False
+                manager.create_subscription(stream_name='snmpevents')
+            return manager
+        return connect
+
+    ##############################################################################################
+    #
+    # NETCONF get fan-out
+    #
+    # netconf_get - Run a NETCONF get using a subtree filter on the device-list entry device_index
+    #               and return the reply XML.  Each device session is used by one thread at a time
+    #               If the device session is down NetconfSessionUnavailable is raised without contacting the device
+    #
+    # netconf_get_many - Run the NETCONF gets for a list of (device_index, subtree filter) requests at the same time
+    #               Gets for different devices run in parallel, gets for the same device wait for the device session.
+    #               "netconf-workers" sets the maximum number of gets in progress.
+    #               Returns a result dictionary for each request in the request order:
+    #
+    #                 {"device_index": 0, "device": "leaf1", "xml": reply XML or None, "error": None or error message, "time": seconds}
+    #
+    #               "time" includes the time waiting for the device session
+    #
+    #               The gets for each device are run in request order by one worker.  A get that has not completed
+    #               "timeout" seconds after it starts is reported with the error "timeout" together with the gets
+    #               for the same device that follow it.  The worker is left to finish the get and a new worker is
+    #               started so the gets for the other devices still run.  The default timeout is "nc-timeout".
+    #               Failures are logged for each device
+    #
+    # cached_read - Return the response for a read by a rule action from the "rule-read-cache" if the same
+    #               read was made before, otherwise call read() and cache the response.  kind is "nc" or "show",
+    #               request is the filter or command with the parameters substituted.  Responses for which
+    #               cacheable(response) is False are not cached
+    #
+    ##############################################################################################
+    def netconf_get(self, device_index, subtree):
+        return self.device[int(device_index)].get_xml(subtree)
+
+    def cached_read(self, kind, device_index, request, read, cacheable=None):
+        if self.control["rule-read-cache"] != 1:
+            return read()
+        key = (kind, int(device_index), str(request))
+        found, response = self.read_cache.get(key)
+        if found:
+            if self.control["debug-fact"] == 1:
+                self.print_log("**** DDR Debug: cached_read " + kind + " response from cache device_index: " + str(device_index))
+            return response
+        response = read()
+        if cacheable is None or cacheable(response):
+            self.read_cache.put(key, response)
+        return response
+
+    def netconf_get_timed(self, device_index, subtree):
+        starttime = time.time()
+        reply = self.netconf_get(device_index, subtree)
+        return reply, time.time() - starttime
+
+    def netconf_get_many(self, requests, timeout=None):
+        if timeout is None:
+            timeout = self.control["nc-timeout"]
+        results = []
+        for device_index, subtree in requests:
+            results.append({"device_index": device_index, "device": str(self.control["device-list"][int(device_index)][4]), "xml": None, "error": None, "time": None})
+        if results == []:
+            return results
+
+        devices = {}
+        for index, (device_index, subtree) in enumerate(requests):
+            devices.setdefault(int(device_index), []).append(index)
+        work = collections.deque(devices.values())
+        condition = threading.Condition()
+        running = {}
+        finished = set()
+
+        def worker():
+            while True:
+                with condition:
+                    if not work:
+                        return
+                    indexes = work.popleft()
+                for index in indexes:
+                    with condition:
+                        if index in finished:
+                            return
+                        running[index] = time.monotonic()
+                        condition.notify()
+                    device_index, subtree = requests[index]
+                    xml, get_time, error = None, None, None
+                    try:
+                        xml, get_time = self.netconf_get_timed(device_index, subtree)
+                    except Exception as e:
+                        error = str(e)
+                    with condition:
+                        if running.pop(index, None) is None:
+                            return
+                        results[index]["xml"], results[index]["time"], results[index]["error"] = xml, get_time, error
+                        finished.add(index)
+                        condition.notify()
+
+        def start_worker():
+            threading.Thread(target=worker, daemon=True).start()
+
+        for x in range(min(len(devices), self.control["netconf-workers"])):
+            start_worker()
+        with condition:
+            while len(finished) < len(requests):
+                now = time.monotonic()
+                for index, started in list(running.items()):
+                    if now - started >= timeout:
+                        del running[index]
+                        for device_request in devices[int(requests[index][0])]:
+                            if device_request not in finished:
+                                finished.add(device_request)
+                                results[device_request]["error"] = "timeout"
+                        start_worker()
+                if len(finished) == len(requests):
+                    break
+                deadlines = [started + timeout for started in running.values()]
+                condition.wait(min(deadlines) - now if deadlines != [] else None)
+
+        for result in results:
+            if result["error"] is not None:
+                self.print_log("\n%%%% DDR Error: netconf_get_many device: " + result["device"] + " " + result["error"])
+            elif self.control["debug-nc"] == 1:
+                self.print_log("**** DDR Debug: netconf_get_many device: " + result["device"] + " get time(ms): %8.3f" % (result["time"] * 1000))
+        return results
+
+    ##############################################################################################
+    #
+    # netconf_fact_filter - Return the subtree filter for a multitemplate or multitemplate_protofact FACT
+    #
+    # assert_netconf_reply - Assert the FACTs for a NETCONF FACT definition using a get reply
+    #
+    # prefetch_netconf_facts - Run the NETCONF gets for the multitemplate and multitemplate_protofact entries
+    #               in fact_list using netconf_get_many.  Returns {id(fact): reply XML or None if the get failed}
+    #               No gets are run if "netconf-workers" is 1 or there is only one NETCONF FACT unless
+    #               "nc-merge-filters" is 1
+    #
+    # netconf_get_plan - Return the gets to run for the NETCONF FACTs as [(device_index, subtree filter, [facts])]
+    #               With "nc-merge-filters" 1 the filters for each device are merged so there is one get
+    #               for each device and model, otherwise there is one get for each FACT
+    #
+    ##############################################################################################
+    def netconf_fact_filter(self, fact):
+        if fact["fact_type"] == "multitemplate":
+            return fact["data"][3]
+        return str(fact["path"])
+
+    def assert_netconf_reply(self, fact, device_index, reply, hard_slot, hard_slot_value):
+        if fact["fact_type"] == "multitemplate":
+            self.get_template_multifacts_index(fact["data"], hard_slot, hard_slot_value, device_index, sim_nc=True, simdata=reply)
+        elif fact["fact_type"] == "multitemplate_protofact":
+            self.get_template_multifacts_protofact_index(fact, hard_slot, hard_slot_value, device_index, sim_nc=True, simdata=reply)
+        else:
+            self.print_log("\n%%%% DDR Error: assert_netconf_reply Invalid fact type: " + str(fact))
+
+    def prefetch_netconf_facts(self, fact_list):
+        facts = [fact for fact in fact_list if fact["fact_type"] in ["multitemplate", "multitemplate_protofact"]]
+        if facts == [] or (self.control["nc-merge-filters"] != 1 and (self.control["netconf-workers"] <= 1 or len(facts) <= 1)):
+            return {}
+        plan = self.netconf_get_plan(facts)
+        replies = {}
+        for (device_index, subtree, members), result in zip(plan, self.netconf_get_many([(device_index, subtree) for device_index, subtree, members in plan])):
+            if result["xml"] is None or len(members) == 1:
+                for fact in members:
+                    replies[id(fact)] = result["xml"]
+                continue
+            try:
+                selected = split_reply(result["xml"], [self.netconf_fact_filter(fact) for fact in members])
+            except Exception as e:
+                self.print_log("\n%%%% DDR Error: prefetch_netconf_facts split_reply device: " + result["device"] + " " + str(e))
+                selected = [None] * len(members)
+            for fact, reply in zip(members, selected):
+                replies[id(fact)] = reply
+        return replies
+
+    def netconf_get_plan(self, facts):
+        if self.control["nc-merge-filters"] != 1:
+            return [(self.fact_device_index(fact), self.netconf_fact_filter(fact), [fact]) for fact in facts]
+        devices = {}
+        for fact in facts:
+            devices.setdefault(self.fact_device_index(fact), []).append(fact)
+        plan = []
+        for device_index, members in devices.items():
+            try:
+                merged = merge_subtree_filters([self.netconf_fact_filter(fact) for fact in members])
+            except Exception as e:
+                self.print_log("\n%%%% DDR Error: netconf_get_plan merge_subtree_filters: " + str(e))
+                plan.extend([(device_index, self.netconf_fact_filter(fact), [fact]) for fact in members])
+                continue
+            for subtree, indexes in merged:
+                if len(indexes) == 1:
+                    subtree = self.netconf_fact_filter(members[indexes[0]])
+                elif self.control["debug-nc"] == 1:
+                    self.print_log("**** DDR Debug: netconf_get_plan merged " + str(len(indexes)) + " filters for device: " + str(device_index))
+                plan.append((device_index, subtree, [members[index] for index in indexes]))
+        return plan
+
+    ##############################################################################################
+    #
+    # Telemetry subscriptions
+    #
+    # start_telemetry - Start a listener thread for each device with telem_list entries.  Each telem_list
+    #               entry is a multitemplate_protofact FACT definition with the subscription settings:
+    #
+    #                 {"device_index": 1, "device": "leaf1", "path": subtree filter, "period": 500,
+    #                  "assert_fact_for_each": "DyPeer-list", "hardcoded_list": ["device"], "protofact": {...},
+    #                  "key_slots": ["peer-ip"]}
+    #
+    #               "on_change": True with optional "dampening_period" requests on-change updates in place
+    #               of "period" (centiseconds).  telemetry_config holds defaults for settings not in an entry
+    #               "key_slots" is optional.  A FACT from an update replaces the FACT asserted for the same
+    #               template and key slot values from an earlier update.  Without "key_slots" the FACTs from an
+    #               update replace all of the FACTs from the last update for the subscription, so "key_slots" is
+    #               needed for on-change subscriptions where an update only contains the data that changed
+    #
+    # telemetry_listener - Runs in a thread for each device.  Establishes the subscriptions on the device
+    #               session, again after the session is reconnected, and queues the pushed updates
+    #
+    # assert_telemetry_updates - Assert the FACTs for the queued updates.  Called in the main thread before
+    #               each inference engine run.  Returns the number of updates processed
+    #
+    ##############################################################################################
+    def start_telemetry(self):
+        config = getattr(self, "telemetry_config", None)
+        if not isinstance(config, dict):
+            config = {}
+        devices = {}
+        for entry in getattr(self, "telem_list", []):
+            devices.setdefault(self.fact_device_index(entry), []).append(dict(config, **entry))
+        for device_index, entries in devices.items():
+            threading.Thread(target=self.telemetry_listener, args=(device_index, entries), daemon=True).start()
+
+    def telemetry_subscribe(self, session, device_index, entries):
+        subscriptions = {}
+        for entry in entries:
+            reply = session.dispatch(to_ele(yang_push_subscription(entry)))
+            subscriptions[subscription_id(reply.xml)] = entry
+            if self.control["debug-nc"] == 1:
+                self.print_log("**** DDR Debug: telemetry_subscribe device_index: " + str(device_index) + " subscription: " + str(entry.get("assert_fact_for_each")))
+        return subscriptions
+
+    def telemetry_listener(self, device_index, entries):
+        session = self.device[int(device_index)]
+        manager = None
+        subscriptions = {}
+        while not self.telemetry_stop.is_set():
+            try:
+                if session.manager is None:
+                    self.telemetry_stop.wait(1)
+                    continue
+                if session.manager is not manager:
+                    manager = session.manager
+                    subscriptions = self.telemetry_subscribe(session, device_index, entries)
+                notification = session.take_notification(block=True, timeout=1)
+                if notification is None:
+                    continue
+                queued = False
+                for sid, content in push_updates(notification.notification_xml):
+                    if sid in subscriptions:
+                        self.telemetry_queue.put((device_index, subscriptions[sid], content))
+                        queued = True
+                if queued:
+                    self.telemetry_event.set()
+            except Exception as e:
+                self.print_log("\n%%%% DDR Error: telemetry_listener device_index: " + str(device_index) + " " + str(e))
+                manager = None
+                self.telemetry_stop.wait(self.control["retry-time"])
+
+    def assert_telemetry_updates(self):
+        count = 0
+        while True:
+            try:
+                device_index, entry, content = self.telemetry_queue.get_nowait()
+            except queue.Empty:
+                return count
+            try:
+                self.assert_telemetry_update(entry, device_index, content)
+            except Exception as e:
+                self.print_log("\n%%%% DDR Error: assert_telemetry_updates: " + str(e))
+            count = count + 1
+
+    def assert_telemetry_update(self, entry, device_index, content):
+        plan = self.netconf_plan(entry)
+        device_id = str(self.control["device-list"][int(device_index)][4])
+        timestamp = datetime.now().strftime("%m-%d-%Y_%H:%M:%S.%f")
+        update_key = (int(device_index), id(entry))
+        if "key_slots" not in entry:
+            for old_fact in self.telemetry_update_facts.pop(update_key, []):
+                self.retract_telemetry_fact(old_fact)
+        for fact1, errors in plan.extract(content, entry.get("device", device_id)):
+            for error_type, slot, e in errors:
+                self.print_log("\n%%%% DDR Error: assert_telemetry_update: type error: " + str(plan.template) + " slot: " + str(slot) + " " + str(e))
+            fact1["timestamp"] = timestamp
+            if "key_slots" in entry:
+                key = (plan.template,) + tuple(fact1.get(slot) for slot in entry["key_slots"])
+                self.retract_telemetry_fact(self.telemetry_facts.pop(key, None))
+            try:
+                new_fact = self.template_cache[plan.template].assert_fact(**fact1)
+            except Exception as e:
+                self.print_log("\n%%%% DDR Error: assert_telemetry_update: " + str(plan.template) + " " + str(fact1) + " " + str(e))
+                continue
+            if "key_slots" in entry:
+                self.telemetry_facts[key] = new_fact
+            else:
+                self.telemetry_update_facts.setdefault(update_key, []).append(new_fact)
+
+    def retract_telemetry_fact(self, fact):
+        if fact is not None:
+            try:
+                fact.retract()
+            except Exception:
+                pass #ignore case where the FACT was retracted by a rule
+
     ##############################################################################################
     #
     # memory_use - Measure and display memory used by the DDR Python script
@@ -1740,13 +2666,15 @@ class DDR:
     ##############################################################################################
     #
     # timing - Report execution time used by DDR Python script
+    #          runtime is in seconds and is reported in ms unless a different scale is passed
+    #          Counters are reported with scale 1
     #
     ##############################################################################################
-    def ddr_timing(self, message, runtime, key):
+    def ddr_timing(self, message, runtime, key, scale=1000):
         if self.control["show-timing"] == 1:
             try:
-                self.print_log(message%(runtime*1000))
-                self.timing[key] = runtime*1000
+                self.print_log(message%(runtime*scale))
+                self.timing[key] = runtime*scale
             except:
                 pass
 
@@ -1758,7 +2686,7 @@ class DDR:
     #
     ########################################################################################
 
-    def get_template_multifacts_protofact_index(self, fact, hard_slot, hard_slot_value, device_index=None, sim_nc=None, simdata=None):
+    def get_template_multifacts_protofact_index(self, fact, hard_slot, hard_slot_value, device_index=None, sim_nc=None, simdata=None, cache=False):
       '''
       The test_get_template_multifacts_protofact function is used in Python scripts to test the implementation
       of FACT definitions used to translate the content of NETCONF get responses into CLIPs FACTs.
@@ -1871,123 +2799,47 @@ class DDR:
         try:
             if sim_nc == True:
                 get_result = simdata
-                instances = xml.dom.minidom.parseString(get_result).getElementsByTagName(fact["assert_fact_for_each"])
+            elif cache:
+                get_result = self.cached_read("nc", device_index, fact['path'], lambda: self.netconf_get(device_index, str(fact['path'])))
             else:
-                get_result = self.device[int(device_index)].get(filter=('subtree', str(fact['path'])))                
-                instances = xml.dom.minidom.parseString(get_result.xml).getElementsByTagName(fact["assert_fact_for_each"])
+                get_result = self.netconf_get(device_index, str(fact['path']))
         except Exception as e:
             self.print_log("\n%%%% DDR Error: get_template_multifacts_protofact_index ddr-nc response: " + str(e))
             return
 
-        # The instances in the response that will be used to generate FACTs can be filtered
-        # If the fact definition includes a dictionary key "filtered_instances" the following code includes
-        # only instances where the value in the selected slot matches a valued in "filtered_instances"
-        # For example: "element_list": {"peer-ip": ["1.2.3.5", "201.1.1.1"], "peer-mac": ["00:00:00:00:00:00", "10:00:00:00:00:00"]},
-        # FACTs will only be generated if the FACT contains one of the listed peer-ip AND one of the listed peer-mac
-        #
-        if "element_list" in fact:
-            filtered_instances = []
-            for each in instances:
-                found = False
-                slots = fact['protofact']["slots"]
-                for slot in slots:
-                    if found: break
-                    if ("hardcoded_list" in fact) and (slot in fact["hardcoded_list"]): continue
-                    node_list = each.getElementsByTagName(slots[slot])
-                    if node_list:
-                        node = node_list[0]
-                    elif "/" in slots[slot]:
-                        node = self.get_upper_value(each, slots[slot])
-                    else: continue
-                    for category in fact["element_list"]:
-                        if slot == category:
-                            if self.control["debug-fact"] == 1:
-                                self.print_log("\n**** DDR Debug: get_template_multifacts_protofact element_list: \n" + "Instance value and element_list: " + str(node.firstChild.nodeValue).replace(" ", "") + " " + str(fact["element_list"][category]) + "\n")
-                            if (str(node.firstChild.nodeValue).replace(" ", "") in fact["element_list"][category]):
-                                filtered_instances.append(each)
-                                found = True
-                                break
-        else:
-            filtered_instances = instances
-
-        # Generate a FACT for each instance in the get_response
-        # The protofact element in the FACT dictionary is copied and the slot values read from the get_response are
-        # written into the copy of the protofact dictionary
-        # For example, after execution the new "protofact" variable could contain:
+        # Generate a FACT for each "assert_fact_for_each" instance in the get_response
+        # The compiled plan for the FACT definition reads the slot values for each instance as the reply is parsed
+        # and only generates FACTs for instances selected by the "element_list" if it is in the FACT definition
+        # For example, the slot dictionary generated for an instance could contain:
         #
-        #    protofact: {'template': 'nve-peer-list', 'slots': {'device': 'n9k', 'nve': 1, 'primary-ip': '204.1.1.1', 'admin-state': 'enabled', 'peer-ip': '201.1.1.1', 'peer-state': 'Up', 'peer-mac': '00:00:00:00:00:00'}
+        #    {'device': 'n9k', 'nve': 1, 'primary-ip': '204.1.1.1', 'admin-state': 'enabled', 'peer-ip': '201.1.1.1', 'peer-state': 'Up', 'peer-mac': '00:00:00:00:00:00'}
         #
-        # The protofact dictionary generated below is used to assert the FACT into CLIPs
+        # The slot named in hardcoded_list[0] is set to the "device" in the FACT definition or 'hard_slot_value' if passed in
         #
-        for each in filtered_instances:
-            protofact = copy.deepcopy(fact['protofact'])
-            slots = fact['protofact']["slots"] # list of slots (fields) that will have values assigned
-            for slot in slots:
-                if ("hardcoded_list" in fact) and (slot == fact["hardcoded_list"][0]):
-                    if (hard_slot_value == None): # Get the slot value from the FACT definition
-                        protofact["slots"][slot] = fact["device"]                
-                        continue
-                    else: # Get the slot value passed in by the function call 'hard_slot_value'
-                        protofact["slots"][slot] = hard_slot_value                
-                        continue
-
-                # create a list XML nodes that for the "slot" in the FACT, for example "ip"
-                # There will only be one element in the list
-                # If the value has a / then a second lookup is required to get value 'Ep-list/primaryIp'
-
-                try:
-                    node_list = each.getElementsByTagName(slots[slot])
-                    if node_list:
-                        node = node_list[0]
-                        value = node.firstChild.nodeValue
-                    elif "/" in slots[slot]:
-                        # for upper tags, node_list would have been empty above
-                        node = self.get_upper_value(each, slots[slot])
-                        value = node.firstChild.nodeValue
-                    else: value = "nil" # if no value provided for the slot, set the value in the FACT to "nil"
-                except Exception as e:
-                    self.print_log("\n%%%% DDR Error: get_template_multifacts_protofact_index: slots, node_list " + str(slots[slot]) + " " + str(node_list) + " " + str(e))
-
-                # set the type of value saved in the protofact dictionary using the types defined in the FACT section "types"
-                
-                if protofact["types"][slot] == "int":
-                    protofact["slots"][slot] = int(value)
-                elif protofact["types"][slot] == "flt":
-                    protofact["slots"][slot] = float(value)
-                else:
-                    protofact["slots"][slot] = str(value)
+        plan = self.netconf_plan(fact)
+        if hard_slot_value == None:
+            hardcoded_value = fact.get("device")
+        else:
+            hardcoded_value = hard_slot_value
+        timestamp = datetime.now().strftime("%m-%d-%Y_%H:%M:%S.%f")
+        records = []
+        for fact1, errors in plan.extract(get_result, hardcoded_value):
+            for error_type, slot, e in errors:
+                self.print_log("\n%%%% DDR Error: get_template_multifacts_protofact_index: type error: " + str(plan.template) + " slot: " + str(slot) + " " + str(e))
+            if hard_slot != 'none':
+                fact1[hard_slot] = str(hard_slot_value)
+            fact1["timestamp"] = timestamp
+            records.append((plan.template, fact1))
+        if self.control["debug-fact"] == 1:
+            self.print_log("\n**** DDR Debug: get_template_multifacts_protofact_index: " + str(fact["assert_fact_for_each"]) + " FACTs: " + str(len(records)))
     #
-    # Assert the FACT in the CLIPs instance using the deftemplate "template"
-    # and the FACT content (protofact) generated above.  For example:
-    #    protofact: {'template': 'nve-peer-list', 'slots': {'device': 'n9k', 'nve': 1, 'primary-ip': '204.1.1.1', 'admin-state': 'enabled', 'peer-ip': '201.1.1.1', 'peer-state': 'Up', 'peer-mac': '00:00:00:00:00:00'}
-    # CLIPs provides a function that asserts a FACT using the content of a dictionary
+    # Assert the FACTs in the CLIPs instance using the deftemplate "template"
     #
-                     
-            self.assert_template_fact(protofact, hard_slot, hard_slot_value)
+        self.assert_facts_bulk(records)
       except Exception as e:
           self.print_log("\n%%%% DDR Error: get_template_multifacts_protofact_index: " + str(e))
-          
-    ##############################################################################
-    #
-    # get_upper_value - Get the value for model nodes above the target nodes
-    #                   These nodes are normally keys in a nested list above the
-    #                   target nodes
-    #
-    ##############################################################################
-    def get_upper_value(self, node, upper_tag_key_combo):
-        tag_key_list = upper_tag_key_combo.split("/")
-        upper_tag = tag_key_list[0]
-        key = tag_key_list[1]
-        cur_node = node
-        while cur_node.tagName != upper_tag:
-            try:
-                cur_node = cur_node.parentNode
-            except:
-                self.print_log("\n%%%% DDR Error: Protofact could not find parent: " + str(upper_tag_key_combo))
-                return
-        return cur_node.getElementsByTagName(key)[0]
 
-    def get_template_multifacts_index(self, fact, slot, slot_value, device_index, sim_nc=None, simdata=None):
+    def get_template_multifacts_index(self, fact, slot, slot_value, device_index, sim_nc=None, simdata=None, cache=False):
         '''
             Use a NETCONF get operation to read operational or configuration model content.
             If the data is in a list, create a fact for each list entry optionally filtered using a list of key names.
@@ -2058,12 +2910,12 @@ class DDR:
             try:
                 if sim_nc == True:
                     get_result = simdata
-                    instances = xml.dom.minidom.parseString(get_result).getElementsByTagName(key)
                     if self.control["debug-nc"] == 1:
                         self.print_log("**** DDR Debug: get_template_multifacts_index: ddr-nc simulated response:\n" + str(simdata))
+                elif cache:
+                    get_result = self.cached_read("nc", device_index, path, lambda: self.netconf_get(device_index, path))
                 else:
-                    get_result = self.device[int(device_index)].get(filter=('subtree', path))                
-                    instances = xml.dom.minidom.parseString(get_result.xml).getElementsByTagName(key)
+                    get_result = self.netconf_get(device_index, path)
             except Exception as e:
                 self.print_log("\n%%%% DDR Error: get_template_multifacts_index ddr-nc response: " + str(e))
                 return
@@ -2072,99 +2924,27 @@ class DDR:
                 self.print_log("\n**** DDR Debug: get_template_multifact NETCONF get result: \n" + str(get_result))
 
     #
+    # Read the leaf values for each instance of the key as the reply is parsed
     # Filter entries in multitemplate list if a filter is specified to limit fact collection
-    #
-            if element_list != []:
-                filtered_elements = []
-                filtered_instances = []
-                for each in instances:
-                    instance = []
-                    fact = facts[0]
-                    if fact[1] == 'str':
-                        for node in each.getElementsByTagName(fact[0]):
-                            if str(node.firstChild.nodeValue).replace(" ", "") in element_list:
-                                if self.control["debug-fact"] == 1:
-                                    self.print_log("**** DDR Debug: Multitemplate instance in list: " + str(node.firstChild.nodeValue))
-                                filtered_elements.append(str(node.firstChild.nodeValue).replace(" ", ""))
-                                filtered_instances.append(each)
-                    if fact[1] == 'int':
-                        for node in each.getElementsByTagName(fact[0]):
-                            if int(node.firstChild.nodeValue) in element_list:
-                                if self.control["debug-fact"] == 1:
-                                    self.print_log("**** DDR Debug: Multitemplate instance in list: " + str(node.firstChild.nodeValue))
-                                filtered_elements.append(int(node.firstChild.nodeValue))
-                                filtered_instances.append(each)
-                element_list = filtered_elements
-                instances = filtered_instances
-
-            instance_list = []
-            for each in instances:
-                instance = []
-                for leaf in leafs:
-    #
-    # If no value is returned for the get request the value is []
-    # A value of 'nil' must be filled in if no value is returned from the get request
-    #
-                    if len(each.getElementsByTagName(leaf)) == 0:
-                        instance.append('nil')
-                    else:
-                        for node in each.getElementsByTagName(leaf):
-                            instance.append(node.firstChild.nodeValue)
-                if instance != []:
-                    instance_list.append(instance)
-                instance = []
-    #
-    # For each instance in the instance_list assert the information read as facts
-    # Create a python dictionary with each key:value pair where the key is the slot
-    # and value is the slot value
+    # An instance is included once for each key leaf value in the element_list
+    # If no value is returned for a leaf the slot value is 'nil'
     # Template facts may specify the type of the value stored into the slot
     #  [["five-seconds", "int"], ["one-minute", "int"], ["five-minutes", "int"]]
     #
-            for each in instance_list:
-                template = self.env.find_template(str(deftemplate))
-                fact1 = {}
-                fact1["device"] = str(device_name)
-                j = 0
-
-                try:
-                    for fact in facts:
-                        if len(fact) == 2:
-                            if fact[1] == "int":
-                                fact1[str(fact[0])] = int(each[j])
-                            elif fact[1] == "str":
-                                fact1[str(fact[0])] = str(each[j])
-                            elif fact[1] == "flt":
-                                fact1[str(fact[0])] = float(each[j])
-                            else:
-                                self.print_log("%%%% DDR Exception: Invalid fact type " + str(fact))
-                                break
-
-                            j = j + 1
-                        
-                        else:
-                            if isinstance(each[j], int):
-                                fact1[str(fact)] = int(each[j])
-                            else:
-                                fact1[str(fact)] = str(each[j])
-                                j = j + 1
-                except Exception as e:
-                    self.print_log("\n%%%% DDR Error: get_template_multifacts fact generation error: " + str(fact))                      
+            plan = self.multitemplate_plan(fact)
+            records = []
+            for fact1, errors in plan.extract(get_result, device_name):
+                for error_type, slot, e in errors:
+                    self.print_log("\n%%%% DDR Error: get_template_multifacts fact generation error: " + str(slot) + " " + str(e))
+                fact1["timestamp"] = datetime.now().strftime("%m-%d-%Y_%H:%M:%S.%f")
+                records.append((plan.template, fact1))
     #
     # Assert the FACT defined by a Python dictionary
-    #                   
-                try:
-                    fact1["timestamp"] = datetime.now().strftime("%m-%d-%Y_%H:%M:%S.%f")
-                    result = template.assert_fact(**fact1)
-                    if self.control["debug-fact"] == 1:
-                        self.print_log("\n**** DDR Debug: get_template_multifacts_index fact asserted: " + str(result))
-                except Exception as e:
-                    if self.control["debug-fact"] == 1:
-                        self.print_log("%%%% DDR Exception: get_template_multifacts_index assert_fact: " + str(e))
-                    pass
+    #
+            self.assert_facts_bulk(records)
 
         except Exception as e:
             self.print_log("\n%%%% DDR Error: get_template_multifacts_index error: " + str(e))
-            self.print_log("\n%%%% DDR Error: No value found in get_template_multifacts_index: " + str(fact1))
         return
 
 ##############################################################################
@@ -2180,293 +2960,945 @@ class DDR:
 #
 #############################################################################
     def show_and_assert_fact(self, fact, device_index):
+        parser = self.stream_parser(fact)
+        if parser is not None:
+            self.stream_show_response(fact, parser, device_index)
+            return
+        response, version = self.get_show_response(fact, device_index)
+        if response is None:
+            return
+        if self.response_unchanged(fact, device_index, response):
+            self.assert_cached_facts(fact, device_index)
+            return
+        parsed_genie_output = self.parse_show_response(fact, response, version, device_index)
+        if parsed_genie_output is None:
+            self.cache_response_facts(fact, device_index, [])
+            return
+        self.assert_show_response(fact, parsed_genie_output, device_index)
+
+##############################################################################
+#
+# stream_show_response - Run the show command for a show_and_assert FACT that uses streaming
+#            For ssh access the response lines are parsed as they are read from the device
+#
+#############################################################################
+    def stream_show_response(self, fact, parser, device_index):
+        device_info = self.control["device-list"][int(device_index)]
+        device_name = str(device_info[4])
+        try:
+            access_type = device_info[5]
+            version = device_info[10]
+        except:
+            access_type = 'cli'
+            version = None
+
+        try:
+            if access_type == 'ssh':
+                if self.control["debug-fact"] == 1:
+                    self.print_log("**** DDR Debug: stream_show_response SSH command: " + str(device_info[0]) + " " + str(fact["command"]) + "\n")
+                lines = self.ssh_command_lines(device_info, str(fact["command"]), 15)
+            elif access_type == 'cli':
+                response = cli.cli(str(fact["command"]), "30")
+                if "error" in response:
+                    self.print_log("\n%%%% DDR Error: error in show_and_assert show command response")
+                    return
+                lines = response.splitlines()
+            else:
+                self.print_log("\n%%%% DDR Error: Exception in show_and_assert_fact: Invalid access-method")
+                return
+            self.stream_and_assert_fact(fact, parser, lines, version, device_name, fact["command"])
+        except Exception as e:
+            self.print_log("\n%%%% DDR Error: Exception in stream_show_response: " + str(fact["command"]) + " " + str(e))
+
+##############################################################################
+#
+# get_show_response - Run the show command for a show_and_assert FACT on the device
+#            Returns the command response and the OS version of the device or
+#            (None, None) if the command could not be run
+#            This method does not access CLIPs and can be run in a worker thread
+#
+#############################################################################
+    def get_show_response(self, fact, device_index):
+    #
+    # Determine if ssh should be used to access device
+    # Execute in try clause for backward compatibility with older FACT files
     #
-    # Determine if ssh should be used to access device
-    # Execute in try clause for backward compatibility with older FACT files
-    #
         try:
             access_type = self.control["device-list"][int(device_index)][5]
             version = self.control["device-list"][int(device_index)][10]
+        except:
+            access_type = 'cli'
+            version = None
 
-            if access_type == 'ssh':
-                try:
-                    device_info = self.control["device-list"][int(device_index)]
-                    device_address = str(device_info[0])
-                    device_user = str(device_info[2])
-                    device_pass = str(device_info[3])
-                except Exception as e:
-                    self.print_log("\n%%%% DDR Error: Exception in ssh show_and_assert_fact invalid device definitions: " + str(e))
-                    return
-                
-                options = '-q -oStrictHostKeyChecking=no -oUserKnownHostsFile=/dev/null -oPubkeyAuthentication=no'
+        if access_type == 'ssh':
+            try:
+                device_info = self.control["device-list"][int(device_index)]
+            except Exception as e:
+                self.print_log("\n%%%% DDR Error: Exception in ssh show_and_assert_fact invalid device definitions: " + str(e))
+                return None, None
     #
-    # Select the device to use
+    # Run the command using a pooled SSH session to the selected device
     #
-                ssh_cmd = 'ssh %s@%s %s "%s"' % (device_user, device_address, options, str(fact["command"]))
+            if self.control["debug-fact"] == 1:
+                self.print_log("**** DDR Debug: run_show_and_assert SSH command: " + str(device_info[0]) + " " + str(fact["command"]) + "\n")
+            try:
+                response = self.ssh_command(device_info, str(fact["command"]), 15)
                 if self.control["debug-fact"] == 1:
-                    self.print_log("**** DDR Debug: run_show_and_assert SSH command: " + str(ssh_cmd) + "\n")
-                try:
-                    child = pexpect.spawn(ssh_cmd, timeout=15, encoding='utf-8')
-                    child.delaybeforesend = None
-                    if self.control["debug-CLI"] == 1:
-                        child.logfile = sys.stdout
-                    child.expect(['\r\nPassword: ', '\r\npassword: ', 'Password: ', 'password: '])
-                    child.sendline(device_pass)
-                    child.expect(pexpect.EOF)
-                    response = child.before
-                    if self.control["debug-fact"] == 1:
-                        self.print_log("**** DDR Debug: run_show_and_assert SSH execution response: " + str(response))
-                except Exception as e:
-                    child.close()
-                    self.print_log("\n%%%% DDR ERROR: show_and_assert ssh or timeout Error: " + str(ssh_cmd) + "\n")
-                    return
+                    self.print_log("**** DDR Debug: run_show_and_assert SSH execution response: " + str(response))
+            except Exception as e:
+                self.print_log("\n%%%% DDR ERROR: show_and_assert ssh or timeout Error: " + str(device_info[0]) + " " + str(fact["command"]) + "\n")
+                return None, None
 
-                child.close()
+        elif access_type == 'cli':
+            try:
+                response = cli.cli(str(fact["command"]), "30")
+                if self.control["debug-fact"] == 1:
+                    self.print_log("**** DDR Debug: show_and_assert cli command result \n" + str(response))
+            except Exception as e:
+                self.print_log("\n%%%% DDR Error: Exception in cli show_and_assert_fact: " + str(e))
+                return None, None
     #
-    # process response and generate FACTs
+    # If "access-method" not supported, return error
     #
-                try:
-                    if "error" in response:
-                        self.print_log("\n%%%% DDR Error: error in ssh show_and_assert show command response")
-                        return
-                    parser = genie_str_to_class(fact["genie_parser"])
-                    if parser == None:
-                        self.print_log("\n%%%% DDR Error: Exception in ssh show_and_assert_fact: parser not found: \n" + str(fact["genie_parser"]) + " \n")
-                        return
+        else:
+            self.print_log("\n%%%% DDR Error: Exception in show_and_assert_fact: Invalid access-method")
+            return None, None
+
+        if "error" in response:
+            self.print_log("\n%%%% DDR Error: error in show_and_assert show command response")
+            return None, None
+        return response, version
+
+##############################################################################
+#
+# parse_show_response - Parse a show command response using the "genie_parser" in the FACT
+#            Returns the parsed dictionary or None if there is no parser output
+#            Event-history parsers only return the entries newer than the device watermark
+#            This method does not access CLIPs and can be run in a worker thread
+#
+#############################################################################
+    def parse_show_response(self, fact, response, version, device_index=None):
+        parser = genie_str_to_class(fact["genie_parser"])
+        if parser == None:
+            self.print_log("\n%%%% DDR Error: Exception in show_and_assert_fact: parser not found: \n" + str(fact["genie_parser"]) + " \n")
+            return None
     #
     # Parse data if the parser is available
     #
+        try:
+            if self.control["debug-parser"] == 1:
+                self.print_log("**** DDR Debug: show_and_assert_fact raw data: \n\n" + str(response) + "\n")
+            if device_index is not None and self.use_event_watermark(parser):
+                device_name = str(self.control["device-list"][int(device_index)][4])
+                parsed_genie_output = records_to_dict(self.parse_event_records(fact, parser, response.splitlines(), version, device_name, fact["command"]))
+            else:
+                parsed_genie_output = parser.parse(output=response, pversion=version, debug=self.control["debug-parser"])
+        except Exception as e:
+            self.print_log("\n%%%% DDR Error: Exception in show_and_assert_fact: parser error: " + str(fact["genie_parser"]) + " " + str(e))
+            return None
+
+        if self.control["debug-parser"] == 1:
+            self.print_log("\n*** DDR Debug: show_and_assert_fact parsed genie output: " + str(parsed_genie_output))
+        if parsed_genie_output == {}:
+            if device_index is not None and self.use_event_watermark(parser):
+                return None
+            self.print_log("\n%%%% DDR Error: show_and_assert_fact no parser output: " + str(fact["genie_parser"]))
+            return None
+        return parsed_genie_output
+
+##############################################################################
+#
+# use_event_watermark - Return True if event-history watermarks are used for the parser output
+#
+# parse_event_records - Return the records generated by an event-history parser that are newer
+#            than the watermark for the device and command
+#            The parser stops reading lines when an entry that was seen before is found because
+#            NX-OS displays the event-history newest entry first.  The watermark is advanced to
+#            the newest entry read
+#            command is the show command with the rule parameters substituted, or the file name for
+#            run_process_file, so commands using the same parser with different parameters have separate
+#            watermarks.  A response read again from the rule read cache has no newer entries
+#
+#############################################################################
+    def use_event_watermark(self, parser):
+        return getattr(parser, "newest_first", False) and self.control["event-history-watermark"] == 1
+
+    def parse_event_records(self, fact, parser, lines, version, device_name, command):
+        records = parser.parse_iter(lines, version, self.control["debug-parser"])
+        key = (device_name, str(command))
+        if self.control["debug-parser"] == 1:
+            self.print_log("\n*** DDR Debug: parse_event_records: " + str(key) + " watermark: " + str(self.event_watermarks.get(key)))
+        return records_newer_than(records, self.event_watermarks, key)
+
+##############################################################################
+#
+# assert_show_response - Assert FACTs for each item in the parsed show command output
+#            using the "protofact" in the FACT definition
+#
+#############################################################################
+    def assert_show_response(self, fact, parsed_genie_output, device_index):
+        try:
+            device_name = str(self.control["device-list"][int(device_index)][4])
+            sub_dictionary_list = self.find(fact["assert_fact_for_each_item_in"], parsed_genie_output)
+            records = self.assert_protofact_items(fact, sub_dictionary_list, device_name)
+            self.cache_response_facts(fact, device_index, records)
+        except Exception as e:
+            self.print_log("\n%%%% DDR Error: Exception in show_and_assert_fact response processing: " + str(e))
+
+##############################################################################
+#
+# Show response cache - skip parsing and FACT generation for show_and_assert responses that
+#            are the same as the response processed in the last cycle
+#
+# response_cache[(device name, command)] = [hash of the last response, FACTs generated from the response]
+# The FACT list is None until the FACTs for the last response are generated
+# FACT definitions using "stream": True are not cached because the response is not saved
+#
+# response_unchanged - Return True if the response has the same hash as the last response and the FACTs
+#            for the last response are cached.  Otherwise save the hash for the new response
+#            This method does not access CLIPs and can be run in a worker thread
+#
+# cache_response_facts - Save the FACTs generated from the last response
+#
+# assert_cached_facts - Count the cache hit and if "show-response-cache-keep-facts" is 1 assert the cached
+#            FACTs with the current timestamp.  Event-history FACTs are not asserted again because
+#            the event-history watermark excludes the entries that were already asserted
+#
+#############################################################################
+    def response_cache_key(self, fact, device_index):
+        return (str(self.control["device-list"][int(device_index)][4]), str(fact["command"]))
+
+    def response_unchanged(self, fact, device_index, response):
+        if self.control["show-response-cache"] != 1:
+            return False
+        key = self.response_cache_key(fact, device_index)
+        digest = hashlib.blake2b(str(response).encode('utf-8', 'replace'), digest_size=16).digest()
+        cached = self.response_cache.get(key)
+        if cached is not None and cached[0] == digest and cached[1] is not None:
+            return True
+        self.response_cache[key] = [digest, None]
+        return False
+
+    def cache_response_facts(self, fact, device_index, records):
+        if self.control["show-response-cache"] != 1:
+            return
+        cached = self.response_cache.get(self.response_cache_key(fact, device_index))
+        if cached is not None and cached[1] is None:
+            cached[1] = records
+
+    def assert_cached_facts(self, fact, device_index):
+        self.response_cache_hits += 1
+        if self.control["debug-fact"] == 1:
+            self.print_log("**** DDR Debug: assert_cached_facts: response unchanged: " + str(self.response_cache_key(fact, device_index)))
+        if self.control["show-response-cache-keep-facts"] != 1:
+            return
+        if self.use_event_watermark(genie_str_to_class(fact["genie_parser"])):
+            return
+        timestamp = datetime.now().strftime("%m-%d-%Y_%H:%M:%S.%f")
+        records = self.response_cache[self.response_cache_key(fact, device_index)][1]
+        self.assert_facts_bulk([(template, dict(slots, timestamp=timestamp)) for template, slots in records])
+
+##############################################################################
+#
+# find - return nested dictionary value given a dictionary (j) and a string
+#		 element (element) in the form of "Garden.Flowers.White"
+#
+#############################################################################
+    def find(self, element, j):
+        if element == "":
+            return j
+        keys = element.split('+')
+        rv = j
+        for i, key in enumerate(keys):
+            if key == '*':
+                new_list = []
+                new_keys = copy.deepcopy(keys[i+1:]) # all the keys past the * entry
+                for entry in rv: # for each entry in the * dictionary
+                    new_rv = copy.deepcopy(rv[entry])
+                    for new_key in new_keys:
+                        new_rv = new_rv[new_key]
+                    for e in new_rv:
+                        new_rv[e]["upper_value"] = entry
+                    new_list.append(new_rv)
+                return new_list
+            else:
+    # normal stepping through dictionary
+                rv = rv[key]
+        return [rv]
+
+##############################################################################
+#
+# assert_template_fact - given a protofact, assert the fact into the clips system
+#
+# This function generates a python dictionary from the FACT data
+# The python dictionary contains all of the slots that are applied to a FACT template
+# The clipspy template.assert_fact method creates a CLIPs FACT using a python dictionary produced by this function
+#
+#############################################################################
+    def assert_template_fact(self, protofact, add_slot, slot_value, sub_dictionary=None):
+        try:
+            template = self.template_cache[protofact["template"]]
+            fact1 = {}
+            for slot, value in protofact["slots"].items():
+    #
+    # If the "value" is in a subdirectory, look up the final value in the sub_dictionary
+    #
+                if type(value) is str and "+" in value:
                     try:
-                        if self.control["debug-parser"] == 1:
-                            self.print_log("**** DDR Debug: show_and_assert_fact raw data: \n\n" + str(response) + "\n")
-                        parsed_genie_output = parser.parse(output=response, pversion=version, debug=self.control["debug-parser"])
+                        value = self.find(value, sub_dictionary)[0]
                     except Exception as e:
-                        self.print_log("\n%%%% DDR Error: Exception in ssh show_and_assert_fact: parser not found: " + str(fact["genie_parser"]))
-                        return
-                    if self.control["debug-parser"] == 1:
-                        self.print_log("\n*** DDR Debug: parsed genie output: " + str(parsed_genie_output))
-                    if parsed_genie_output == {}:
-                        self.print_log("\n%%%% DDR Error: show_and_assert_fact no parser output: " + str(fact["genie_parser"]))
-                        return
-                    sub_dictionary_list = self.find(fact["assert_fact_for_each_item_in"], parsed_genie_output)
-                    import copy
-                    for sub_dictionary in sub_dictionary_list:
-                        for item in sub_dictionary:
-                            protofact = copy.deepcopy(fact["protofact"])
-                            for slot in protofact["slots"]:
-                                value = protofact["slots"][slot]
-	#
-	# insert the device name into the fact
-	#
-                                if value == "device":
-                                    protofact["slots"][slot] = value.replace("device", self.control["device-list"][int(device_index)][4])
-                                elif type(value) == str and "$" in value:
-                                    protofact["slots"][slot] = value.replace("$", item)
-                            self.assert_template_fact(protofact, 'device', self.control["device-list"][int(device_index)][4], sub_dictionary)
-                    return
+                        if self.control["debug-fact"] == 1:
+                            self.print_log("\n**** DDR Debug: assert_template_fact: No value found for slot: " + str(e))
+                        continue
+    #
+    # Use "types" in the protofact to determine the type to assert in the FACT
+    #
+                try:
+                    if protofact["types"][slot] == "int":
+                        fact1[slot] = int(value)
+                    elif protofact["types"][slot] == "flt":
+                        fact1[slot] = float(value)
+                    else:
+                        fact1[slot] = str(value)
                 except Exception as e:
-                    self.print_log("\n%%%% DDR Error: Exception in ssh show_and_assert_fact response processing: " + str(e))
-                    return
-
+                    self.print_log("\n%%%% DDR Error: Exception assert_template_fact: type error: " +  str(protofact["template"]) + " slot: "  + str(slot) + " " + str(e))
+    # 
+    # Append extra "slot" if there is a slot and slot_value passed in to the function
+    # The added slot will always be type string
+    #  
+            if add_slot != 'none':
+                fact1[add_slot] = str(slot_value)                
+    #
+    # Assert the FACT defined by a Python dictionary
+    #
+            try:
+                fact1["timestamp"] = datetime.now().strftime("%m-%d-%Y_%H:%M:%S.%f")
+                result = template.assert_fact(**fact1)
+                if self.control["debug-fact"] == 1:
+                    self.print_log("\n**** DDR Debug: assert_template_fact: " + str(result))
+            except Exception as e:
+                if self.control["debug-fact"] == 1:
+                    self.print_log("%%%% DDR Exception: assert_template_fact: " + str(e))
+                pass
+        except Exception as e:
+            self.print_log("\n%%%% DDR Error: Exception assert_template_fact: " + str(e))
 
-            elif access_type == 'cli':
+    ##############################################################################
+    #
+    # compile_protofacts - Compile the protofact in each ddr-facts entry that generates FACTs
+    #                      from parsed show command output.  The compiled plans are used by
+    #                      assert_protofact_items to generate FACTs without copying the protofact
+    #                      for each item in the parsed output
+    #                      multitemplate_protofact entries are compiled into NETCONF plans used by
+    #                      get_template_multifacts_protofact_index
+    #
+    #############################################################################
+    def compile_protofacts(self):
+        self.protofact_plans = {}
+        self.netconf_plans = {}
+        self.multitemplate_plans = {}
+        for fact_list in ["fact-list", "show-fact-list", "show-parameter-fact-list", "file-fact-list", "decode-btrace-fact-list", "logging-trigger-list", "nc-fact-list"]:
+            for fact in self.control.get(fact_list, []):
                 try:
-                    response = cli.cli(str(fact["command"]), "30")
+                    if "assert_fact_for_each_item_in" in fact:
+                        self.protofact_plan(fact)
+                    elif fact.get("fact_type") == "multitemplate_protofact":
+                        self.netconf_plan(fact)
+                    elif fact.get("fact_type") == "multitemplate":
+                        self.multitemplate_plan(fact["data"])
+                except Exception as e:
+                    self.print_log("\n%%%% DDR Error: compile_protofacts: " + str(fact_list) + " " + str(e))
+
+    #
+    # Syslog and notification triggers are compiled once so each message is scanned a single time
+    # The regular expressions in element 3 positions 0 and 1 of each trigger are compiled with the trigger strings
+    #
+    def compile_triggers(self):
+        self.syslog_matcher = TriggerMatcher(self.control.get("syslog-triggers", []), regex_fields=(0, 1))
+        self.notification_matcher = TriggerMatcher(self.control.get("notification-triggers", []), regex_fields=(0, 1))
+
+    def protofact_plan(self, fact):
+        plan = self.protofact_plans.get(id(fact["protofact"]))
+        if plan is None:
+            plan = compile_protofact(fact["protofact"], replace_spaces=False)
+            self.protofact_plans[id(fact["protofact"])] = plan
+        return plan
+    #
+    # NETCONF plans are looked up by the content of the FACT definition because run_nc_fact_index
+    # uses a copy of the nc-fact-list entry for each call
+    #
+    def netconf_plan(self, fact):
+        key = str((fact["assert_fact_for_each"], fact["protofact"], fact.get("hardcoded_list"), fact.get("element_list")))
+        plan = self.netconf_plans.get(key)
+        if plan is None:
+            plan = compile_netconf_fact(fact)
+            self.netconf_plans[key] = plan
+        return plan
+    #
+    # Multitemplate plans are looked up by the FACT definition content after the subtree filter
+    # because the filter is different for each set of parameters passed to run_nc_fact_index
+    #
+    def multitemplate_plan(self, fact):
+        key = str(fact[4:])
+        plan = self.multitemplate_plans.get(key)
+        if plan is None:
+            plan = compile_multitemplate_fact(fact)
+            self.multitemplate_plans[key] = plan
+        return plan
+
+    ##############################################################################
+    #
+    # assert_protofact_items - Assert a FACT for each item in each sub_dictionary of parsed data
+    #                          using the compiled protofact for the FACT definition
+    #                          The 'device' slot is set to device_name
+    #                          Returns the list of (template name, slot dictionary) FACTs
+    #
+    #############################################################################
+    def assert_protofact_items(self, fact, sub_dictionary_list, device_name):
+        items = ((item, sub_dictionary) for sub_dictionary in sub_dictionary_list for item in sub_dictionary)
+        records = list(self.protofact_records(fact, items, device_name))
+        self.assert_facts_bulk(records)
+        return records
+
+    ##############################################################################
+    #
+    # protofact_records - Generate the (template name, slot dictionary) FACT for each
+    #                     (item, sub_dictionary) in items using the compiled protofact
+    #
+    #############################################################################
+    def protofact_records(self, fact, items, device_name):
+        plan = self.protofact_plan(fact)
+        timestamp = datetime.now().strftime("%m-%d-%Y_%H:%M:%S.%f")
+        for item, sub_dictionary in items:
+            fact1, errors = plan.materialize(item, sub_dictionary, device_name)
+            for error_type, slot, e in errors:
+                if error_type == "lookup":
                     if self.control["debug-fact"] == 1:
-                        self.print_log("**** DDR Debug: show_and_assert cli command result \n" + str(response))
-                    if "error" in response:
-                        self.print_log("\n%%%% DDR Error: show_and_assert show command response")
-                        return
+                        self.print_log("\n**** DDR Debug: assert_template_fact: No value found for slot: " + str(e))
+                else:
+                    self.print_log("\n%%%% DDR Error: Exception assert_template_fact: type error: " +  str(plan.template) + " slot: "  + str(slot) + " " + str(e))
+            fact1["device"] = device_name
+            fact1["timestamp"] = timestamp
+            yield plan.template, fact1
 
-                    parser = genie_str_to_class(fact["genie_parser"])
-                    if parser == None:
-                        self.print_log("\n%%%% DDR Error: Exception in show_and_assert_fact: parser not found: \n" + str(fact["genie_parser"]) + " \n")
-                        return
+    ##############################################################################
     #
-    # convert show command response to parsed dictionary
+    # stream_parser - Return the parser for a FACT definition that uses streaming
+    #                 FACT definitions with "stream": True and a parser that supports parse_iter
+    #                 assert a FACT for each parser record without building the parsed dictionary
+    #                 Returns None if the FACT should be processed using the parsed dictionary
     #
+    #############################################################################
+    def stream_parser(self, fact):
+        if not fact.get("stream", False):
+            return None
+        parser = genie_str_to_class(fact["genie_parser"])
+        if parser is None or not hasattr(parser, "parse_iter"):
+            return None
+        return parser
+
+    ##############################################################################
     #
-    # Parse data if the parser is available
+    # stream_and_assert_fact - Parse the lines of a show command response or file using the
+    #                          parse_iter method of the parser and assert a FACT for each record
+    #                          in the "assert_fact_for_each_item_in" dictionary
     #
-                    try:
-                        if self.control["debug-parser"] == 1:
-                            self.print_log("**** DDR Debug: show_and_assert_fact raw data: \n\n" + str(response) + "\n")
-                        parsed_genie_output = parser.parse(output=response, pversion=version, debug=self.control["debug-parser"])
-                    except Exception as e:
-                       self.print_log("\n%%%% DDR Error: Exception in show_and_assert_fact: parser not found: " + str(fact["genie_parser"]))
-                       return
+    # The lines are read and parsed as the FACTs are asserted.  FACTs are asserted in batches of
+    # "stream-batch-size" so memory use does not grow with the size of the response.
+    # Each record generates a FACT, records with the same key are not merged.
+    # Returns the number of FACTs asserted
+    #
+    #############################################################################
+    def stream_and_assert_fact(self, fact, parser, lines, version, device_name, command):
+        name = fact["assert_fact_for_each_item_in"]
+        lines = (line.rstrip('\r\n') for line in lines)
+        if self.use_event_watermark(parser):
+            records = self.parse_event_records(fact, parser, lines, version, device_name, command)
+        else:
+            records = parser.parse_iter(lines, version, self.control["debug-parser"])
+        items = ((key, {key: entry}) for record_name, key, entry in records if record_name == name)
+        fact_records = self.protofact_records(fact, items, device_name)
+        count = 0
+        while True:
+            batch = list(itertools.islice(fact_records, self.control["stream-batch-size"]))
+            if batch == []:
+                break
+            count = count + len(batch) - len(self.assert_facts_bulk(batch))
+        if self.control["debug-parser"] == 1:
+            self.print_log("\n*** DDR Debug: stream_and_assert_fact: " + str(fact["genie_parser"]) + " FACTs asserted: " + str(count))
+        return count
 
-                    if self.control["debug-parser"] == 1:
-                        self.print_log("\n*** DDR Debug: show_and_assert_fact parsed genie output: " + str(parsed_genie_output))
-                    if parsed_genie_output == {}:
-                        self.print_log("\n%%%% DDR Error: show_and_assert_fact no parser output: " + str(fact["genie_parser"]))
-                        return
+    ##############################################################################
+    #
+    # assert_facts_bulk - Assert a list of (template name, slot dictionary) FACTs into CLIPs
+    #                     The deftemplate objects are cached in self.template_cache
+    #                     Returns the list of FACTs that could not be asserted with the error
+    #
+    #############################################################################
+    def assert_facts_bulk(self, records):
+        errors = assert_facts_bulk(self.env, records, self.template_cache)
+        if self.control["debug-fact"] == 1:
+            self.print_log("\n**** DDR Debug: assert_facts_bulk: asserted: " + str(len(records) - len(errors)) + " errors: " + str(len(errors)))
+            for error in errors:
+                self.print_log("%%%% DDR Exception: assert_template_fact: " + str(error["template"]) + " " + str(error["error"]) + " " + str(error["slots"]))
+        return errors
 
-                    sub_dictionary_list = self.find(fact["assert_fact_for_each_item_in"], parsed_genie_output)
-                    import copy
-                    for sub_dictionary in sub_dictionary_list:
-                        for item in sub_dictionary:
-                            protofact = copy.deepcopy(fact["protofact"])
-                            for slot in protofact["slots"]:
-                                value = protofact["slots"][slot]
-	#
-	# insert the device name into the fact
-	#
-                                if value == "device":
-                                    protofact["slots"][slot] = value.replace("device", str(self.control["device-list"][int(device_index)][4]))
-                                elif type(value) == str and "$" in value:
-                                    protofact["slots"][slot] = value.replace("$", item)
-                            self.assert_template_fact(protofact, 'device', str(self.control["device-list"][int(device_index)][4]), sub_dictionary)
-                    return
-                except Exception as e:
-                    self.print_log("\n%%%% DDR Error: Exception in cli show_and_assert_fact: " + str(e))
-                    return
+    #############################################################################
     #
-    # If "access-method" not supported, return error
+    # count_trigger - Count the events that matched each trigger for the service-impact notification
+    #                 kind is "syslog" or "notification" and trigger_index is the position of the trigger
+    #                 in syslog_triggers or notification_triggers so triggers with the same strings are counted separately
     #
-            else:
-                self.print_log("\n%%%% DDR Error: Exception in show_and_assert_fact: Invalid access-method")
-                return
+    # trigger_counts_xml - Return the trigger-counts entries for the service-impact notification and clear the counts
+    #
+    #############################################################################
+    def count_trigger(self, kind, trigger_index):
+        key = (kind, trigger_index)
+        self.trigger_counts[key] = self.trigger_counts.get(key, 0) + 1
+
+    def trigger_counts_xml(self):
+        entries = []
+        for (kind, trigger_index), count in self.trigger_counts.items():
+            match = " ".join(str(val) for val in self.control[kind + "-triggers"][trigger_index][0])
+            entries.append('      <trigger><type>' + kind + '</type><index>' + str(trigger_index) + '</index><match>' + escape(match) +
+                           '</match><count>' + str(count) + '</count></trigger>\n')
+        self.trigger_counts = {}
+        return ''.join(entries)
+
+    #############################################################################
+    #
+    # coalesce_triggers - Wait for trigger events and process the events that arrive within
+    #                     trigger-window ms of the first event that matched a trigger
+    #
+    # wait_event(timeout, limit) - returns a list of up to limit events, or an empty list if no event was received
+    # process_event(event) - tests an event against the triggers, asserts the trigger FACTs and returns True if the event matched
+    #
+    # Processing stops when the window ends or trigger-max-batch events matched
+    # Returns the number of events that matched a trigger, 0 if the first events received did not match a trigger
+    #
+    #############################################################################
+    def coalesce_triggers(self, wait_event, process_event):
+        max_batch = self.control["trigger-max-batch"]
+        triggered = 0
+        end_time = None
+        while triggered < max_batch:
+            timeout = None
+            if end_time is not None:
+                timeout = end_time - time.monotonic()
+                if timeout <= 0:
+                    break
+            events = wait_event(timeout, max_batch - triggered)
+            if events == []:
+                break
+            for event in events:
+                if process_event(event):
+                    triggered += 1
+            if end_time is None:
+                if triggered == 0 or self.control["trigger-window"] <= 0:
+                    break
+                end_time = time.monotonic() + self.control["trigger-window"]/1000
+        if triggered > 1:
+            self.print_log("\n**** DDR Notice: Trigger events processed together: " + str(triggered))
+        return triggered
+
+    #############################################################################
+    #
+    # wait_syslog - Wait for syslog messages on the syslog queue
+    #
+    # timeout - seconds to wait, None waits until a message is received
+    # Returns a list of up to limit queued (message, matched) entries, limited to syslog-batch-size entries
+    #
+    #############################################################################
+    def wait_syslog(self, timeout=None, limit=None):
+        max_batch = self.control["syslog-batch-size"]
+        if limit is not None:
+            max_batch = min(max_batch, limit)
+        return self.syslog_queue.get_batch(max_batch, timeout)
+
+    def process_syslog_entry(self, entry):
+        return self.process_syslog(entry[0], entry[1])
+
+    #############################################################################
+    #
+    # wait_notification - Wait for an RFC5277 notification on the notification session
+    #
+    # timeout - seconds to wait, None waits until a notification is received
+    # Returns a list with the notification XML or an empty list if no notification was received
+    #
+    #############################################################################
+    def wait_notification(self, timeout=None, limit=1):
+        if self.control["debug-notify"] == 1:
+           self.print_log("**** DDR Debug: Wait for Notification Event")
+
+        if self.control["single-notify"] == 1 and timeout is None:
+            input("\n\nHit Enter to accept one notification event\n\n")  # useful when manually debugging
+
+        try:
+            notif = self.notify_conn.take_notification(block=True, timeout=timeout) # block on IO waiting for the NETCONF notification
+            if notif is None:
+                return []
+            notify_xml = notif.notification_xml
+            if self.control["debug-notify"] == 1:
+                self.print_log("**** DDR Debug: RFC5277 notification received: " + notify_xml)
+        except Exception as e:
+            self.print_log("\n%%%% DDR Error: In notification event processing: " + str(e))
+            return []
+        return [notify_xml]
+
+    #############################################################################
+    #
+    # process_notification - Test an RFC5277 notification against the notification_triggers in ddr-facts and
+    #                        assert the FACTs for the first trigger matched by the notification
+    #
+    # Returns True if the notification matched a trigger
+    #
+    #############################################################################
+    def process_notification(self, notify_xml):
+        notification_trigger = False
+        for trigger_index in self.notification_matcher.match(notify_xml):
+            trigger = self.control["notification-triggers"][trigger_index]
+            notification_trigger = False
+#
+# Loop through all match strings for the notification.  All of the strings must be found
+# in the notification or the trigger condition is not satisfied
+#
+#   element 0 - List containing strings that must all be matched.  Strings appear in the NETCONF Notification
+#   element 1 - Optional statically defined FACT with no paramters if triggering conditions in element 0 are satisfied
+#   element 2 - 'True' if the the content in element 3 should be used to generate a FACT from the message content
+#   element 3[0] - The regular expression in this entry extracts all of the text from the indicated xml tag for processing
+#   element 3[1] - Regular expression used to extract fields from the message and insert into variables.
+#   element 3[2] - List variable names that will be used to populate the FACT
+#   element 3[3] - Prototype FACT template.  The variables are inserted in order into the template and the FACT is asserted
+#   element 3[4] - RULE template name.  Name of the RULE in ddr-rules used to assert the FACT
+#
+# notification_triggers = [
+#      [['ADJCHANGE', 'Down'], 
+#       ['(assert (sample-fact (sample-slot sample-value)))'], 
+#       'false', 
+#       ['<clogHistMsgText>(.*)</clogHistMsgText>', 
+#        'neighbor.{1}(?P<neighbor>(\S+)).{1}(?P<state>(\S+)).{1}(?P<message>(.+))', 
+#        ['neighbor', 'state', 'message'],
+#        '(bgp-event (device {0}) (event-time {1}) (event-type NEIGHBOR-DOWN) (neighbor {2}) (state {3}) (message {4})  (syslog-time {5}))']
+#     ]
+# ]
+#
+            notification_trigger = True                        
+            self.count_trigger("notification", trigger_index)
+            try:
+                timestamp =  datetime.now().strftime("%m-%d-%Y_%H:%M:%S.%f")
+                self.print_log("\n**** DDR Notice: Triggering Notification Event Found: " + str(trigger[0]) + " at: " + str(timestamp))
+                for fact in trigger[1]:
+                    if self.control["debug-fact"] == 1:
+                        self.print_log("**** DDR Debug: Notification static FACT: " + str(fact))  
+                    try:                                  
+                        self.env.assert_string(str(fact))
+                    except Exception as e:
+                        self.print_log("\n%%%% DDR Error: Asserting notification static FACT: " + str(fact) + " " + str(e))
+                        break
+
+#
+# Get the event time - Extract syslog mesasge time from notification and translate into seconds since midnight
+# Insert the seconds into the generated syslog FACT
+# Sample time: <eventTime>2020-09-29T09:47:38+00:00</eventTime>
+#
+                try:
+                    event_seconds = 0
+                    event_content = EVENT_TIME_REGEX.search(str(notify_xml)) #extract event_time field from message
+                    results = EVENT_SECONDS_REGEX.match(str(event_content.group(1))) #extract seconds field from message
+                    syslog_time = str(event_content.group(1))
+                    group = results.groupdict() #dictionary contains objects
+                    times = str(group["mtime"]).split(":")
+                    event_seconds = sum(int(x) * 60 ** i for i, x in enumerate(reversed(times)))
+                except Exception as e:
+                    self.print_log("\n%%%% DDR Error: Generating notification time: " + str(event_content.group(1)) + " " + str(e))
+                    break
+#
+# Extract FACTs from the notification message and assert a FACT in CLIPs
+#
+                if trigger [2] == "True" and trigger[3] != [] :
+                    try:                                
+                        SlogClean = notify_xml.replace(',',' ')
+                    except Exception as e:
+                        self.print_log("\n%%%% DDR Error: Processing notification message: " + str(notify_xml) + " " + str(e))
+                        break
+#
+# Build the notification FACT using data parsed from the notification text
+# trigger[3][0] is used to select content from the Syslog message
+#
+                    timestamp =  datetime.now().strftime("%m-%d-%Y_%H:%M:%S.%f")
+                    try:
+                        if self.control["debug-notify"] == 1:
+                            self.print_log("**** DDR Debug: Syslog trigger regex: \n" + str(trigger[3][0]) + " " + str(trigger[3][1]))
+                        message_content = self.notification_matcher.regex(trigger_index, 0).search(str(notify_xml))
+
+                        if self.control["debug-notify"] == 1:
+                            self.print_log("**** DDR Debug: Syslog trigger message: \n" + str(message_content.group(1)))
+
+                        p1 = self.notification_matcher.regex(trigger_index, 1) #regex to extract fields from the message content
+                        results = p1.match(str(message_content.group(1))) #extract fields from message
+
+                        if results == None:
+                            self.print_log("\n%%%% DDR Error: No Notification match for: \n" + str(message_content.group(1)) +  " " + str(trigger[3][1]) )
+                            break
+
+                        if self.control["debug-notify"] == 1:
+                            self.print_log("**** DDR Debug: Syslog FACT string: \n" + str(results))
+                            
+                    except Exception as e:
+                        self.print_log("\n%%%% DDR Error: Notification parsing: Check for errors or missing regex definitions\n "  +str(e) + "\n" + str(trigger))
+                        break
+
+############################################################################################################
+#
+# notification_triggers are triggered by matching a list of strings contained in RFC5277 notifications generated by the device.
+# If the notification first element of the list, the trigger is matched, eMRE asserts a triggers eMRE execution
+# The notification_trigger can also be used to extract data from the Syslog message and assert a FACT.
+# In the examples below two notifications are used, one for neighbor up and one for neighbor down.
+#   element 0 - List containing strings that must all be matched
+#   element 1 - Optional statically defined FACT with no paramters
+#   element 2 - 'True' if the FACT defined in element 3 should be asserted
+#   element 3[0] - The regular expression in this entry extracts all of the text in the indicated xml tag for processing
+#   element 3[1] - Regular expression used to extract fields from the message and insert into variables.
+#   element 3[2] - List variable names that will be used to populate the FACT
+#   element 3[3] - Value to put into notification FACT 'event-type' slot
+#   element 3[4] - deftemplate name in ddr-rules file to contain the generated FACT
+#
+# Example: *Feb 26 07:13:33.842: %LINEPROTO-5-UPDOWN: Line protocol on Interface GigabitEthernet1/0/12, changed state to down
+#     <clogHistMsgText>Line protocol on Interface GigabitEthernet1/0/11, changed state to down</clogHistMsgText>
+#notification_triggers = [
+#  [['LINEPROTO', 'changed state to down'],
+#   ['(notify-event (event-type "INTERFACE-DOWN") (name GE12))'],
+#   'True',
+#  ['<clogHistMsgText>(.*)</clogHistMsgText>',
+#    'Line protocol on Interface (?P<name>(\S+))',
+#  [['name', 'str']], 'INTERFACE-DOWN', 'notify-event']
+#  ]
+#]
+#
+# create a python dictionary containing the Notification message FACT data
+# Create a FACT and insert the slot values for device, event-time, and event-type defined in ddr-facts 
+#
+                    fact1 = {"notification-not-found"} # return in error message if FACT is not generated
+
+                    try:
+                        try:
+                            template = self.env.find_template(str(trigger[3][4])) # get an empty template fact for event
+                        except Exception as e:
+                            self.print_log("\n%%%% DDR Error: Notification template not found: " + str(fact1) + " " + str(e))
+                            break
+
+                        fact1 = {}
+                        fact1["device"] = str(self.control["mgmt-device"][4])
+                        fact1["event-type"] = str(trigger[3][3]) # event type defined for this Syslog message
+                        fact1["event-time"] = str(timestamp)
+                        if self.control["debug-fact"] == 1:
+                            self.print_log("**** DDR Debug: notification fact initialization: " + str(fact1))
+
+                    except Exception as e:
+                        self.print_log("\n%%%% DDR Error: Notification FACT initialization error: " + str(fact1) + " " + str(e))
+                        break
+#
+# Insert the FACT slot values defined in ddr-facts for this notification
+#
+                    try:
+                        if results == None:
+                            self.print_log("\n%%%% DDR Error: No Notification match for fact slots in: " + str(message_content))
+                                                              
+                        group = results.groupdict() #dictionary contains key/values for parsed message slots
+                        try:
+                            keys = trigger[3][2] #get the slot names
+                            if self.control["debug-notify"] == 1:
+                                self.print_log("**** DDR Debug: Notification FACT keys: " + str(keys))
+                           
+                            for fact in keys:
+                                if fact[1] == "int":
+                                    fact1[fact[0]] = int(group[str(fact[0])])
+                                elif fact[1] == "flt":
+                                    fact1[fact[0]] = float(group[str(fact[0])])
+                                elif fact[1] == "str":
+                                    fact1[fact[0]] = str(group[str(fact[0])])
+                                else:
+                                    fact1[fact[0]] = group[str(fact[0])]
+
+                        except Exception as e:
+                            self.print_log("\n%%%% DDR Error: notification fact slots: " + str(fact) + " " + str(e))
+
+                        fact1["timestamp"] = datetime.now().strftime("%m-%d-%Y_%H:%M:%S.%f")
+                        result = template.assert_fact(**fact1)
+                        if self.control["debug-fact"] == 1:
+                            self.print_log("**** DDR Debug: notification fact dictionary: " + str(result))
+                            
+                    except Exception as e:
+                        if self.control["debug-fact"] == 1:
+                            self.print_log("\n%%%% DDR Error: Notification fact: " + str(e) + " " + str(fact1))
+                        pass
 
+            except Exception as e:
+                self.print_log("\n%%%% DDR Error: Processing notification fact: " + str(fact1) + " " + str(e))
+                break
 
-    #
-    # catch exception if using old FACT file without the "access-method" dictionary element
-    # Process show_and_assert using the python cli package
-    #
-        except:
-            try:
-                response = cli.cli(str(fact["command"]), "30")
-                if self.control["debug-fact"] == 1:
-                    self.print_log("\n*** DDR Debug: show_and_assert_fact cli response: \n" + str(response))
-                if "error" in response:
-                    self.print_log("\n%%%% DDR Error: show_and_assert show command response")
-                    return
+            if notification_trigger == True: break
+        return notification_trigger
 
-                parser = genie_str_to_class(fact["genie_parser"])
-                if parser == None:
-                    self.print_log("\n%%%% DDR Error: Exception in show_and_assert_fact: parser not found: \n" + str(fact["genie_parser"]) + " \n")
-                    return
+    #############################################################################
     #
-    # Parse data if the parser is available
+    # process_syslog - Test a syslog message against the syslog_triggers in ddr-facts and assert
+    #                  the FACTs for the first trigger matched by the message
     #
-                try:
-                    if self.control["debug-parser"] == 1:
-                        self.print_log("**** DDR Debug: show_and_assert_fact raw data: \n\n" + str(response) + "\n")
-                    parsed_genie_output = parser.parse(output=response, pversion=version, debug=self.control["debug-parser"])
-                except Exception as e:
-                    self.print_log("\n%%%% DDR Error: pException in show_and_assert_fact parser not found: " + str(fact["genie_parser"]))
-                    return
-                     
-                if self.control["debug-parser"] == 1:
-                    self.print_log("\n*** DDR Debug: show_and_assert_fact parsed genie output: " + str(parsed_genie_output))
-                if parsed_genie_output == {}:
-                    self.print_log("\n%%%% DDR Error: show_and_assert_fact no parser output: " + str(fact["genie_parser"]))
-                    return
+    # matched - trigger indexes already matched by the SyslogHub, None to match the message here
+    # Returns True if the syslog message matched a trigger
+    #
+    #############################################################################
+    def process_syslog(self, syslog, matched=None):
+        if self.control["debug-syslog"] == 1:
+            self.print_log("\n**** DDR Debug: Syslog Message Queued at: " + datetime.now().strftime("%m-%d-%Y_%H:%M:%S.%f"))
+            self.print_log(syslog)
+#
+# Loop through all match strings for the Syslog message.  All of the strings must be found
+# in the syslog or the trigger condition is not satisfied
+#
+#   element 0 - List containing strings that must all be matched
+#   element 1 - Optional statically defined FACTs with no parameters.  Each FACT in the list is asserted
+#   element 2 - 'True' if the FACT defined in element 3 should be asserted using content parsed from the Syslog message
+#   element 3[0] - Regular expression used to extract fields from the syslog message and insert into variables.
+#   element 3[1] - List variable names that will be used to populate the FACT
+#   element 3[2] - Prototype FACT template name
+#   element 3[3] - Syslog event-type
+#   element 3[4] - device name
+#
+# The example below will assert a "rule-step" FACT normally used to trigger usecase execution
+# A bgp-event FACT will also be generated
+#
+# ddr-fact content:
+#   syslog_triggers = 
+#    [['BGP-5-ADJCHANGE', 'Down'], 
+#     ['(rule-step (step bgp-adjacency-syslog-received))'], 
+#     'True', 
+#     ['.*neighbor.{1}(?P<neighbor>(\S+)).{1}(?P<state>(\S+)).*\(VRF\: (?P<vrf>(\S[^)]+)).*', 
+#      [['device', 'str'], ['event-time', 'str'], ['event-type', 'str'], ['neighbor', 'str'], ['state', 'str'], ['vrf', 'str']], 'bgp-event', 'NEIGHBOR-DOWN']]
+#
+        syslog_trigger = False
+#
+# The trigger matcher scans the syslog once and returns every trigger entry with all match strings
+# found in the syslog.  The first matching trigger in ddr-facts order is processed
+#
+        if matched is None:
+            matched = self.syslog_matcher.match(syslog)
+        if matched == []:
+            if self.control["debug-syslog"] == 1:
+                self.print_log("**** DDR Debug: Syslog did not match all triggering conditions :" + str(syslog))
+            return False
 
-                sub_dictionary_list = self.find(fact["assert_fact_for_each_item_in"], parsed_genie_output)
-                import copy
-                for sub_dictionary in sub_dictionary_list:
-                    for item in sub_dictionary:
-                        protofact = copy.deepcopy(fact["protofact"])
-                        for slot in protofact["slots"]:
-                            value = protofact["slots"][slot]
-	#
-	# insert the device name into the fact
-	#
-                            if value == "device":
-                                protofact["slots"][slot] = value.repla("device", str(self.control["device-list"][int(device_index)][4]))
-                            elif type(value) == str and "$" in value:
-                                protofact["slots"][slot] = value.replace("$", item)
-                        self.assert_template_fact(protofact, 'device', str(self.control["device-list"][int(device_index)][4]), sub_dictionary)
-                return
-            except Exception as e:
-                self.print_log("\n%%%% DDR Error: Exception in show_and_assert_fact: " + str(e))
-                return
+        for trigger_index in matched:
+            trigger = self.control["syslog-triggers"][trigger_index]
+            if self.control["debug-syslog"] == 1:
+                self.print_log("**** DDR Debug: Syslog trigger: " + str(trigger))
 
-##############################################################################
+            syslog_trigger = True
+            self.count_trigger("syslog", trigger_index)
+            if self.control["debug-syslog"] == 1:
+                self.print_log("**** DDR Debug: Syslog trigger strings matched: " + str(trigger[0]))
+            try:
+                if trigger[2] == 'True':
+                    if self.control["debug-syslog"] == 1:
+                        self.print_log("\n**** DDR Debug: Assert Syslog FACT")
+                    self.assert_syslog_fact(syslog)
 #
-# find - return nested dictionary value given a dictionary (j) and a string
-#		 element (element) in the form of "Garden.Flowers.White"
+#  If additional FACTs should be asserted assert each static FACT in the list
 #
-#############################################################################
-    def find(self, element, j):
-        if element == "":
-            return j
-        keys = element.split('+')
-        rv = j
-        for i, key in enumerate(keys):
-            if key == '*':
-                new_list = []
-                new_keys = copy.deepcopy(keys[i+1:]) # all the keys past the * entry
-                for entry in rv: # for each entry in the * dictionary
-                    new_rv = copy.deepcopy(rv[entry])
-                    for new_key in new_keys:
-                        new_rv = new_rv[new_key]
-                    for e in new_rv:
-                        new_rv[e]["upper_value"] = entry
-                    new_list.append(new_rv)
-                return new_list
-            else:
-    # normal stepping through dictionary
-                rv = rv[key]
-        return [rv]
-
-##############################################################################
+                if trigger[1] != []:
+                    try:
+                        for syslog_fact in trigger[1]:
+                            if self.control["debug-syslog"] == 1:
+                                self.print_log("**** DDR Debug: Assert static Syslog FACT: " + str(syslog_fact))
+                            self.env.assert_string(str(syslog_fact))
+                    except Exception as e:
+                        self.print_log("%%%% DDR Error: Asserting static Syslog fact: " + str(trigger[1]) + "\n" + str(e))
+                    break
+            except:
+                self.print_log("%%%% DDR Error: Asserting syslog fact for: " + str(syslog))
+                break
 #
-# assert_template_fact - given a protofact, assert the fact into the clips system
+# Extract FACTs from the notification message and assert a FACT in CLIPs
+# Process in a try clause for backward compatibility with older FACT files that do not have this option
 #
-# This function generates a python dictionary from the FACT data
-# The python dictionary contains all of the slots that are applied to a FACT template
-# The clipspy template.assert_fact method creates a CLIPs FACT using a python dictionary produced by this function
+            if trigger[3] != []:
+                mdata = trigger[3]
+                SlogClean = syslog.replace(',',' ')
+                if self.control["debug-syslog"] == 1:
+                    self.print_log("**** DDR Debug: Clean Syslog message: " + str(SlogClean) + "\nRegex: " + str(mdata[0]))
+                try:
+                    p1 = self.syslog_matcher.regex(trigger_index, 0) #regex object compiled when ddr-facts is loaded
+                except Exception as e:
+                    self.print_log("\n%%%% DDR Error: Syslog fact regex: " + str(mdata[0]) + "\n" +str(e))
+                    break
 #
-#############################################################################
-    def assert_template_fact(self, protofact, add_slot, slot_value, sub_dictionary=None):
-        try:
-            template = self.env.find_template(protofact["template"])
-            fact1 = {}
-            for slot, value in protofact["slots"].items():
-    #
-    # If the "value" is in a subdirectory, look up the final value in the sub_dictionary
-    #
-                if type(value) is str and "+" in value:
+# Build the notification FACT using data parsed from the notification text
+# This code supports selecting up to 6 values from the Syslog message to assert in the FACT
+# 
+                timestamp =  datetime.now().strftime("%m-%d-%Y_%H:%M:%S.%f")
+                try:
                     try:
-                        value = self.find(value, sub_dictionary)[0]
+                        results = p1.match(str(SlogClean)) #extract fields from message
+                        if str(results) == 'None':
+                            self.print_log("**** DDR Debug: Syslog no data found: " + str(mdata[0]) + "\nSyslog Message: " + str(SlogClean))
+                            break
+
+                        if self.control["debug-syslog"] == 1:
+                             self.print_log("**** DDR Debug: Syslog regex results: " + str(results))
+
+                    except Exception as e:
+                        self.print_log("\n%%%% DDR Error: Syslog parsing: " + str(SlogClean) + "\n" +str(e))
+                        break
+#
+# create a python dictionary containing the Syslog message FACT data - mdata
+#  ['.*', '.*Ethernet ring (?P<ring>\\S+).*', 'ASR903_4', [['ring', 'str']], 'PENDING-CHANGE', 'ring-event']
+#                                         
+                    if self.control["debug-syslog"] == 1:
+                         self.print_log("**** DDR Debug: Syslog match data: " + str(mdata))
+                    try:
+                        keys = mdata[3] #get the slot names
+                        template = self.env.find_template(str(mdata[5])) # get an empty template fact for event
+                        fact1 = {}
+                        fact1["device"] = str(mdata[2])
+                        fact1["event-type"] = str(mdata[4]) # event type defined for this Syslog message
+                        fact1["event-time"] = str(timestamp)
+                    except Exception as e:
+                        self.print_log("\n%%%% DDR Error: Syslog fact template: " + str(e))
+#  ['ring', 'str']
+
+                    try:
+                        results = self.syslog_matcher.regex(trigger_index, 1).search(str(SlogClean))
+                        group = results.groupdict() #dictionary contains key/values for parsed message slots
+
+                        for fact in mdata[3]:
+                            if fact[1] == 'str':
+                                fact1[str(fact[0])] = str(group[str(fact[0])])
+                            elif fact[1] == 'int':
+                                fact1[str(fact[0])] = int(group[str(fact[0])])
+                            elif fact[1] == 'flt':
+                                fact1[str(fact[0])] = float(group[str(fact[0])])
+                            elif fact[1] == 'none':
+                                fact1[str(fact[0])] = group[str(fact[0])]
                     except Exception as e:
+                        self.print_log("\n%%%% DDR Error: Syslog fact parameters: " + str(e) + " fact: " + str(fact) + " " + str(group[str(fact[0])]))
+
+                    try:
+                        fact1["timestamp"] = datetime.now().strftime("%m-%d-%Y_%H:%M:%S.%f")
+                        result = template.assert_fact(**fact1)
                         if self.control["debug-fact"] == 1:
-                            self.print_log("\n**** DDR Debug: assert_template_fact: No value found for slot: " + str(e))
-                        continue
-    #
-    # Use "types" in the protofact to determine the type to assert in the FACT
-    #
-                try:
-                    if protofact["types"][slot] == "int":
-                        fact1[slot] = int(value)
-                    elif protofact["types"][slot] == "flt":
-                        fact1[slot] = float(value)
-                    else:
-                        fact1[slot] = str(value)
+                            self.print_log("**** DDR Debug: syslog fact dictionary: " + str(result))
+
+                    except Exception as e:
+                        if self.control["debug-fact"] == 1:
+                            self.print_log("\n%%%% DDR Exception: syslog fact: " + str(e) + " " + str(fact1))
+                        pass
+
                 except Exception as e:
-                    self.print_log("\n%%%% DDR Error: Exception assert_template_fact: type error: " +  str(protofact["template"]) + " slot: "  + str(slot) + " " + str(e))
-    # 
-    # Append extra "slot" if there is a slot and slot_value passed in to the function
-    # The added slot will always be type string
-    #  
-            if add_slot != 'none':
-                fact1[add_slot] = str(slot_value)                
-    #
-    # Assert the FACT defined by a Python dictionary
-    #
-            try:
-                fact1["timestamp"] = datetime.now().strftime("%m-%d-%Y_%H:%M:%S.%f")
-                result = template.assert_fact(**fact1)
-                if self.control["debug-fact"] == 1:
-                    self.print_log("\n**** DDR Debug: assert_template_fact: " + str(result))
-            except Exception as e:
-                if self.control["debug-fact"] == 1:
-                    self.print_log("%%%% DDR Exception: assert_template_fact: " + str(e))
-                pass
-        except Exception as e:
-            self.print_log("\n%%%% DDR Error: Exception assert_template_fact: " + str(e))
+                        self.print_log("\n%%%% DDR Error: Syslog processing error :" + str(SlogClean) + " " + str(e))
+
+            if syslog_trigger == True: break
+        return syslog_trigger
 
     ##############################################################################
     #
@@ -3048,6 +4480,22 @@ class DDR:
     #
     #############################################################################
     def close_sessions(self):
+        try:
+            self.ssh_pool.close_all()
+        except Exception as e:
+            pass
+        try:
+            self.netconf_pool.stop()
+        except Exception as e:
+            pass
+        try:
+            self.telemetry_stop.set()
+        except Exception as e:
+            pass
+        try:
+            self.syslog_hub.unsubscribe(self.syslog_subscription)
+        except Exception as e:
+            pass
         try:
             self.netconf_connection.close_session()
             self.notify_conn.close_session()
@@ -3057,6 +4505,25 @@ class DDR:
             self.print_log("\n%%%% DDR Error: Closing NETCONF sessions: DDR Initialization Failed")
         return # Exit the DDR main loop
 
+    ##############################################################################
+    #
+    # ssh_command - Run a command on a device using a persistent SSH session from the session pool
+    #               device_info is a device-list or mgmt-device entry
+    #               Exceptions from the session are returned to the caller
+    #
+    #############################################################################
+    def ssh_command(self, device_info, command, timeout=60):
+        if self.control["debug-CLI"] == 1:
+            self.print_log("**** DDR Debug: ssh_command: " + str(device_info[0]) + " " + str(command) + "\n")
+        return self.ssh_pool.run_command(device_info[0], device_info[2], device_info[3], command, timeout)
+    #
+    # Run a command on a device using the SSH session pool and return an iterator over the response lines
+    #
+    def ssh_command_lines(self, device_info, command, timeout=60):
+        if self.control["debug-CLI"] == 1:
+            self.print_log("**** DDR Debug: ssh_command_lines: " + str(device_info[0]) + " " + str(command) + "\n")
+        return self.ssh_pool.run_command_lines(device_info[0], device_info[2], device_info[3], command, timeout)
+
     ##############################################################################
     #
     #  print_log - log message to debug control["log-file"] if enabled otherwise only display
@@ -3867,30 +5334,16 @@ class DDR:
         # Use mgmt-device if device_id is 0, otherwise use device selected from self
         #
                         try:
-                            device_ip = self.control["device-list"][int(device_id)][0]
-                            device_user = self.control["device-list"][int(device_id)][2]
-                            device_pass = self.control["device-list"][int(device_id)][3]
-                            
-                            options = '-q -oStrictHostKeyChecking=no -oUserKnownHostsFile=/dev/null -oPubkeyAuthentication=no'
-                            ssh_cmd = 'ssh %s@%s %s "%s"' % (device_user, device_ip, options, command)
+                            device_info = self.control["device-list"][int(device_id)]
                             if self.control["debug-CLI"] == 1:
-                                self.print_log("**** DDR Debug: run_decode_btrace_log SSH command: " + str(ssh_cmd) + "\n")
-                            child = pexpect.spawn(ssh_cmd, timeout= 60, encoding='utf-8')
-                            child.delaybeforesend = None
-                            if self.control["debug-CLI"] == 1:
-                                child.logfile = sys.stdout
-                            child.expect(['\r\nPassword: ', '\r\npassword: ', 'Password: ', 'password: '])
-                            child.sendline(device_pass)
-                            child.expect(pexpect.EOF)
-                            response = child.before
+                                self.print_log("**** DDR Debug: run_decode_btrace_log SSH command: " + str(device_info[0]) + " " + str(command) + "\n")
+                            response = self.ssh_command(device_info, command, 60)
                             if self.control["debug-CLI"] == 1:
                                 self.print_log("**** DDR Debug: run_decode_btrace_log: \n" + str(response))
 
                         except Exception as e:
-                            child.close()
-                            self.print_log("%%%% DDR run_decode_btrace_log SSH or timeout Error: " + str(ssh_cmd) + "\n")
+                            self.print_log("%%%% DDR run_decode_btrace_log SSH or timeout Error: " + str(command) + "\n")
                             return
-                        child.close()
 
     ##########################################################################################
     #
@@ -3924,23 +5377,9 @@ class DDR:
         # Get the starting point in the Python dictionary containing the parsed content
         #
                         sub_dictionary_list = self.find(fact["assert_fact_for_each_item_in"], parsed_genie_output)
-                        import copy
-                        for sub_dictionary in sub_dictionary_list:
-                            for item in sub_dictionary:
-                                protofact = copy.deepcopy(fact["protofact"])
-                                for slot in protofact["slots"]:
-                                    value = protofact["slots"][slot]
-	#
-	# insert the device name into the fact
-	#
-                                    if value == "device":
-                                        protofact["slots"][slot] = value.replace("device", str(self.control["device-list"][int(device_index)][4]))
-                                    elif type(value) == str and "$" in value:
-                                        protofact["slots"][slot] = value.replace("$", item)
-                                fact_found = True
-                                self.assert_template_fact(protofact, 'device', str(self.control["device-list"][int(device_index)][4]), sub_dictionary)
-
-                            return
+                        fact_found = True
+                        self.assert_protofact_items(fact, sub_dictionary_list, str(self.control["device-list"][int(device_index)][4]))
+                        return
 
                     except Exception as e:
                         self.print_log("\n%%%% DDR Error: Exception in run_decode_btrace_log response processing: " + str(e))
@@ -4147,27 +5586,15 @@ class DDR:
         #
                 else:
                     try:
-                        options = '-q -oStrictHostKeyChecking=no -oUserKnownHostsFile=/dev/null -oPubkeyAuthentication=no'
-                        ssh_cmd = 'ssh %s@%s %s "%s"' % (self.control["mgmt-device"][2], self.control["mgmt-device"][0], options, command)
-                        if self.control["debug-CLI"] == 1:
-                            self.print_log("**** DDR Debug: run_logging_trigger SSH command: " + str(ssh_cmd) + "\n")
-                        child = pexpect.spawn(ssh_cmd, timeout= 20, encoding='utf-8')
-                        child.delaybeforesend = None
                         if self.control["debug-CLI"] == 1:
-                            child.logfile = sys.stdout
-                        child.expect(['\r\nPassword: ', '\r\npassword: ', 'Password: ', 'password: '])
-                        child.sendline(self.control["mgmt-device"][3])
-                        child.expect(pexpect.EOF) #result contains the ping result
-                        response = child.before
+                            self.print_log("**** DDR Debug: run_logging_trigger SSH command: " + str(self.control["mgmt-device"][0]) + " " + str(command) + "\n")
+                        response = self.ssh_command(self.control["mgmt-device"], command, 20)
                         if self.control["debug-CLI"] == 1:
                             self.print_log("**** DDR Debug: run_logging_trigger ssh response: \n" + str(response))
 
                     except Exception as e:
-                        child.close()
-                        self.print_log("%%%% DDR run_logging_trigger SSH or timeout Error: " + str(ssh_cmd) + "\n")
+                        self.print_log("%%%% DDR run_logging_trigger SSH or timeout Error: " + str(command) + "\n")
                         return
-                        
-                    child.close()
          #
          # Assert the syslog logging facts using the response
          #
@@ -4199,20 +5626,7 @@ class DDR:
                     return
                
                 sub_dictionary_list = self.find(fact["assert_fact_for_each_item_in"], parsed_genie_output)
-                import copy
-                for sub_dictionary in sub_dictionary_list:
-                    for item in sub_dictionary:
-                        protofact = copy.deepcopy(fact["protofact"])
-                        for slot in protofact["slots"]:
-                            value = protofact["slots"][slot]
-	#
-	# insert the device name into the fact
-	#
-                            if value == "device":
-                                protofact["slots"][slot] = value.replace("device", str(self.control["device-list"][int(device_index)][4]))
-                            elif type(value) == str and "$" in value:
-                                protofact["slots"][slot] = value.replace("$", item)
-                        self.assert_template_fact(protofact, 'device', str(self.control["device-list"][int(device_index)][4]), sub_dictionary)
+                self.assert_protofact_items(fact, sub_dictionary_list, str(self.control["device-list"][int(device_index)][4]))
             except Exception as e:
                 self.print_log("\n%%%% DDR Error: Exception in run_logging_trigger assert_fact response processing: " + str(fact) + "\n" + str(e))
 
@@ -4389,7 +5803,7 @@ class DDR:
                 if sim_nc == 'TRUE':
                     self.get_template_multifacts_index(fact["data"], "device", device_id, device_index, sim_nc=True, simdata=self.nc_list[sim_nc_index]["content"])
                 else:
-                    self.get_template_multifacts_index(fact["data"], "device", device_id, device_index)
+                    self.get_template_multifacts_index(fact["data"], "device", device_id, device_index, cache=True)
 
             elif fact["fact_type"] == "multitemplate_protofact":
             #
@@ -4398,7 +5812,7 @@ class DDR:
                 if sim_nc == 'TRUE':
                     self.get_template_multifacts_protofact_index(fact, "device", device_id, device_index, sim_nc=True, simdata=self.nc_list[sim_nc_index]["content"])
                 else:
-                    self.get_template_multifacts_protofact_index(fact, "device", device_id, device_index)
+                    self.get_template_multifacts_protofact_index(fact, "device", device_id, device_index, cache=True)
 
             else:
                 self.print_log("\n%%%% DDR Error: run_nc_facts_index Error in ddr-facts definition: Invalid fact type: " + str(fact))
@@ -4406,6 +5820,35 @@ class DDR:
         except Exception as e:
             self.print_log("\n%%%% DDR Error: Exception in run_nc_fact_index: " + str(e))
 
+    def run_nc_fact_sweep(self, index):
+        """
+            Rule file function call: (run_nc_fact_sweep 2) ; get the nc_fact_list entry 2 data from all devices
+
+            Invoked in the "RHS" of a triggered rule.
+            This function runs the NETCONF get defined by an nc_fact_list entry on every device in the device_list
+            at the same time and asserts the FACTs for each reply in device_list order.  The "device" slot is set
+            to the device name as in run_nc_fact_index.  Devices that fail or time out are logged and do not
+            generate FACTs.  The nc_fact_list entry must not require parameters
+
+            :param index - Index into the nc_fact list in ddr-facts
+
+        Usage::
+
+              (run_nc_fact_sweep 2)
+
+            :raises none:
+
+        """
+        try:
+            fact = self.control["nc-fact-list"][int(index)]
+            device_indexes = list(range(len(self.control["device-list"])))
+            requests = [(device_index, self.netconf_fact_filter(fact)) for device_index in device_indexes]
+            for device_index, result in zip(device_indexes, self.netconf_get_many(requests)):
+                if result["xml"] is not None:
+                    self.assert_netconf_reply(fact, device_index, result["xml"], "device", result["device"])
+        except Exception as e:
+            self.print_log("\n%%%% DDR Error: Exception in run_nc_fact_sweep: " + str(e))
+
     def run_cancel_ping(self, neighbor):
         """
             Helper function to generate a ping-cancel FACT to allow usecase to continue if ping fails
@@ -4676,7 +6119,20 @@ class DDR:
             version = self.control["device-list"][int(device_index)][10]
             command_idx = int(file_fact_index)
             timestamp =  datetime.now().strftime("%m-%d-%Y_%H:%M:%S.%f")
-            
+        #
+        # FACT definitions using "stream": True parse the file one line at a time
+        #
+            try:
+                fact = self.control["file-fact-list"][command_idx]
+                parser = self.stream_parser(fact)
+                if parser is not None:
+                    with open(filename, "r") as fd:
+                        self.stream_and_assert_fact(fact, parser, fd, version, str(self.control["device-list"][int(device_index)][4]), filename)
+                    return
+            except Exception as e:
+                self.print_log("\n%%%% DDR Error: Exception in run_process_file streaming: " + str(filename) + "\n" + str(e))
+                return
+
         # Read the contents fo the file
         #
             try:
@@ -4709,21 +6165,7 @@ class DDR:
                     self.print_log("\n*** DDR Debug: run_process_file parsed output:\n" + str(parsed_genie_output))
 
                 sub_dictionary_list = self.find(fact["assert_fact_for_each_item_in"], parsed_genie_output)
-                import copy
-                for sub_dictionary in sub_dictionary_list:
-                    for item in sub_dictionary:
-                        protofact = copy.deepcopy(fact["protofact"])
-                        for slot in protofact["slots"]:
-                            value = protofact["slots"][slot]
-	#
-	# insert the device name into the fact using name in ddr-devices
-	#
-                            if value == "device":
-                                protofact["slots"][slot] = value.replace("device", str(self.control["device-list"][int(device_index)][4]))
-
-                            elif type(value) == str and "$" in value:
-                                protofact["slots"][slot] = value.replace("$", item)
-                        self.assert_template_fact(protofact, 'device', str(self.control["device-list"][int(device_index)][4]), sub_dictionary)
+                self.assert_protofact_items(fact, sub_dictionary_list, str(self.control["device-list"][int(device_index)][4]))
             except Exception as e:
                 self.print_log("\n%%%% DDR Error: Exception in run_process_file assert_fact response processing: " + str(fact) + "\n" + str(parsed_genie_output) + "\n" + str(e))
 
@@ -5017,6 +6459,7 @@ class DDR:
                     if self.control["debug-show"] == 1:
                         self.print_log("**** DDR Debug: run_show_parameter_index_version:  \n" + str(self.show_list[show_index]["content"]))
                     response = self.show_list[show_index]["content"]
+                    command = str(show_template)
                 except Exception as e:
                     self.print_log("\n%%%% DDR ERROR: run_show_parameter_index_version sim-show error: " + str(response) + "\n")
                     return
@@ -5052,7 +6495,7 @@ class DDR:
         #
                     if device_access == 'cli':
                         if device_index == 0:
-                            response = cli.cli(command, "30")
+                            response = self.cached_read("show", device_index, command, lambda: cli.cli(command, "30"), lambda response: "error" not in response)
                             if self.control["debug-CLI"] == 1:
                                 self.print_log("**** DDR Notice: run_show_parameter_index_version CLI Command Executed: " + str(command) + " at: " + str(timestamp))
                                 self.print_log("**** DDR Notice: run_show_parameter_index_sersion CLI Command Response: \n" + str(response))
@@ -5066,23 +6509,12 @@ class DDR:
         # Note: 60 seconds is default timeout for show command execution
         #
                         try:
-                            options = '-q -oStrictHostKeyChecking=no -oUserKnownHostsFile=/dev/null -oPubkeyAuthentication=no'
-
-                            ssh_cmd = 'ssh %s@%s %s "%s"' % (device_user, device_address, options, command)
-                            if self.control["debug-CLI"] == 1:
-                                self.print_log("**** DDR Debug: run_show_parameter_index SSH command: " + str(ssh_cmd) + "\n")
-                            child = pexpect.spawn(ssh_cmd, timeout= show_timeout, encoding='utf-8')
-                            child.delaybeforesend = None
                             if self.control["debug-CLI"] == 1:
-                                child.logfile = sys.stdout
-                            child.expect(['\r\nPassword: ', '\r\npassword: ', 'Password: ', 'password: '])
-                            child.sendline(device_pass)
-                            child.expect(pexpect.EOF) #result contains the ping result
-                            response = child.before
+                                self.print_log("**** DDR Debug: run_show_parameter_index SSH command: " + str(device_address) + " " + str(command) + "\n")
+                            response = self.cached_read("show", device_index, command, lambda: self.ssh_command(device_info, command, show_timeout), lambda response: "error" not in response)
 
                         except Exception as e:
-                            child.close()
-                            self.print_log("\n%%%% DDR ERROR: run_show_parameter_index_version SSH or timeout Error: " + str(ssh_cmd) + "\n")
+                            self.print_log("\n%%%% DDR ERROR: run_show_parameter_index_version SSH or timeout Error: " + str(device_address) + " " + str(command) + "\n")
                             return
                 except Exception as e:
                     self.print_log("\n%%%% DDR ERROR: run_show_parameter_index_version Error: Exception sending show command: " + str(e) + "\n")
@@ -5097,6 +6529,10 @@ class DDR:
                 if "error" in response:
                     self.print_log("\n%%%% DDR Error: error in run_show_parameter_index_version show command response: " +str(device_id) + " " + str(command) + " response: " + str(response))
                     return
+                stream = self.stream_parser(fact)
+                if stream is not None:
+                    self.stream_and_assert_fact(fact, stream, response.splitlines(), version, device_id, command)
+                    return
                 parser = genie_str_to_class(fact["genie_parser"])
 
                 if parser == None:
@@ -5108,7 +6544,10 @@ class DDR:
                 try:
                     if self.control["debug-parser"] == 1:
                         self.print_log("**** DDR Debug: run_show_parameter_index_version raw data: \n\n" + str(response) + "\n")
-                    parsed_genie_output = parser.parse(output=response, pversion=version, debug=self.control["debug-parser"])
+                    if self.use_event_watermark(parser):
+                        parsed_genie_output = records_to_dict(self.parse_event_records(fact, parser, response.splitlines(), version, device_id, command))
+                    else:
+                        parsed_genie_output = parser.parse(output=response, pversion=version, debug=self.control["debug-parser"])
                 except Exception as e:
                     self.print_log("\n%%%% DDR Error: Exception in run_show_parameter_index_version: parsing error: " + str(e))
                     return
@@ -5123,31 +6562,11 @@ class DDR:
         # Get the starting point in the Python dictionary containing the parsed content
         #
                 sub_dictionary_list = self.find(fact["assert_fact_for_each_item_in"], parsed_genie_output)
-                import copy
-                for sub_dictionary in sub_dictionary_list:
-                    for item in sub_dictionary:
-                        protofact = copy.deepcopy(fact["protofact"])
-                        for slot in protofact["slots"]:
-                            value = protofact["slots"][slot]
-	#
-	# insert the device name into the fact
-	#
-                            try:
-                                if value == "device":
-                                    protofact["slots"][slot] = value.replace("device", str(self.control["device-list"][int(device_index)][4]))
-                                elif type(value) == str and "$" in value:
-                                    if isinstance(value.replace("$", item), int):
-                                        protofact["slots"][slot] = int(value.replace("$", item))
-                                    else:                                      
-                                        protofact["slots"][slot] = str(value.replace("$", item))
-                            except Exception as e:
-                                self.print_log("\n%%%% DDR Error: Exception in run_show_parameter_index_version slot replace: " + str(protofact["slots"][slot]) + " " + str(e))
-
-                        fact_found = True
-                        self.assert_template_fact(protofact, 'device', str(self.control["device-list"][int(device_index)][4]), sub_dictionary)
+                fact_found = True
+                self.assert_protofact_items(fact, sub_dictionary_list, str(self.control["device-list"][int(device_index)][4]))
 
             except Exception as e:
-                self.print_log("\n%%%% DDR Error: Exception in run_show_parameter_index_version response processing: " + str(e) + " slot: " + str(slot))
+                self.print_log("\n%%%% DDR Error: Exception in run_show_parameter_index_version response processing: " + str(e))
                 return
 
     def run_suffix(self, fact_string, fact_prefix):
@@ -5591,5 +7010,5 @@ class DDR:
     #
     #################################################################################################
     def get_action_functions(self):
-        action_functions = [self.run_action, self.run_apply_config, self.run_assert_message, self.run_assert_message_syslog, self.run_assert_sim_fact, self.run_clear_selected_facts, self.run_cli_command, self.run_cli_parameter, self.run_copy_file, self.run_copy_from_device, self.run_command, self.run_ddr, self.run_decode_btrace_log, self.run_delay, self.run_delete_file, self.run_delete_remote_file, self.run_logging_trigger, self.run_nc_fact_index, self.run_cancel_ping, self.run_ping_action, self.run_process_file, self.run_read_control_file, self.run_rule_timer, self.run_set_rule_step, self.run_set_runmode, self.run_show_parameter_index_version, self.run_suffix, self.run_trace, self.run_cancel_trace, self.run_write_to_syslog, self.run_xr_send_syslog, self.run_split_string, self.run_get_timestamp, self.run_parse]
+        action_functions = [self.run_action, self.run_apply_config, self.run_assert_message, self.run_assert_message_syslog, self.run_assert_sim_fact, self.run_clear_selected_facts, self.run_cli_command, self.run_cli_parameter, self.run_copy_file, self.run_copy_from_device, self.run_command, self.run_ddr, self.run_decode_btrace_log, self.run_delay, self.run_delete_file, self.run_delete_remote_file, self.run_logging_trigger, self.run_nc_fact_index, self.run_nc_fact_sweep, self.run_cancel_ping, self.run_ping_action, self.run_process_file, self.run_read_control_file, self.run_rule_timer, self.run_set_rule_step, self.run_set_runmode, self.run_show_parameter_index_version, self.run_suffix, self.run_trace, self.run_cancel_trace, self.run_write_to_syslog, self.run_xr_send_syslog, self.run_split_string, self.run_get_timestamp, self.run_parse]
         return action_functions
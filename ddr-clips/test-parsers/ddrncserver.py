@@ -0,0 +1,560 @@
+##############################################################################
+#
+# ddrncserver - local NETCONF over SSH stand-in server for testing DDR NETCONF processing
+#
+# The server accepts ncclient sessions like a device so the DDR NETCONF paths, e.g.
+# get_template_multifacts_*, run_nc_fact_index, run_apply_config and the RFC5277
+# notification listener, can be run and load tested without a network or devices.
+#
+#   get, get-config - the subtree filter is applied to the server data and the selected data returned
+#   edit-config - the config is saved in NetconfStandInServer.configs and <ok/> returned
+#   create-subscription - RFC5277 notifications are sent at "notification_rate" per second
+#   close-session - <ok/> is returned and the session closed
+#   lock, unlock, commit, discard-changes, validate - <ok/> is returned
+#
+# The server data is one or more XML documents: get replies, <data> elements or top level
+# data nodes.  load_nc_file reads the replies in a ddr-nc file and synthetic_nve_data generates
+# an NX-OS VXLAN EVPN data set with any number of endpoints, peers and VNIs.
+#
+# Faults are injected for every RPC:
+#   latency, jitter - the reply is delayed latency + random(0, jitter) seconds
+#   error_rate - fraction of RPCs that return an rpc-error
+#   drop_rate - fraction of RPCs that close the SSH connection without a reply
+#
+# Example - serve 5000 peers and 200 VNIs with 50ms latency on port 8300:
+#
+#   python ddrncserver.py --port 8300 --peers 5000 --vnis 200 --latency 0.05
+#
+# YangPushPublisher is a stand-in for a device publishing YANG push telemetry updates that is
+# used in place of an ncclient manager by the telemetry subscriptions.
+#
+# Use "localhost" as the device-list address because DDR connects to '127.0.0.1' using the
+# local SSH configuration for on-box operation.
+#
+#############################################################################
+import argparse
+import random
+import runpy
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+
+import paramiko
+from lxml import etree
+
+from ddrparserlib import NETCONF_BASE_NS, SUBSCRIBED_NOTIFICATIONS_NS, YANG_PUSH_NS, filter_reply
+
+NOTIFICATION_NS = "urn:ietf:params:xml:ns:netconf:notification:1.0"
+NXOS_NS = "http://cisco.com/ns/yang/cisco-nx-os-device"
+
+CAPABILITIES = ["urn:ietf:params:netconf:base:1.0",
+                "urn:ietf:params:netconf:base:1.1",
+                "urn:ietf:params:netconf:capability:notification:1.0",
+                "urn:ietf:params:netconf:capability:interleave:1.0"]
+
+DEFAULT_NOTIFICATION = ('<clogMessageGenerated xmlns="urn:ddr:stand-in"><clogHistMsgText>'
+                        'DDR stand-in notification {sequence}</clogHistMsgText></clogMessageGenerated>')
+
+##############################################################################
+#
+# synthetic_nve_data - return a <data> document for the NX-OS device model with "eps" VXLAN
+#                      endpoints each with "peers" dynamic peers and "vnis" VNIs
+#
+#############################################################################
+def synthetic_nve_data(peers=100, vnis=10, eps=1):
+    entries = []
+    for ep in range(1, eps + 1):
+        peer_list = "".join("<DyPeer-list><ip>10.%d.%d.%d</ip><state>Up</state><mac>00:00:%02x:%02x:%02x:%02x</mac></DyPeer-list>"
+                            % (ep, peer // 256 % 256, peer % 256, ep % 256, peer // 65536 % 256, peer // 256 % 256, peer % 256)
+                            for peer in range(peers))
+        vni_list = "".join("<Nw-list><vni>%d</vni><state>Up</state><mcastGroup>239.1.%d.%d</mcastGroup></Nw-list>"
+                           % (10000 + vni, vni // 256 % 256, vni % 256)
+                           for vni in range(vnis))
+        entries.append("<Ep-list><epId>%d</epId><adminSt>enabled</adminSt><primaryIp>204.1.1.%d</primaryIp>"
+                       "<peers-items><dy_peer-items>%s</dy_peer-items></peers-items>"
+                       "<nws-items><vni-items>%s</vni-items></nws-items></Ep-list>" % (ep, ep % 256, peer_list, vni_list))
+    return ('<data xmlns="%s"><System xmlns="%s"><eps-items><epId-items>%s</epId-items></eps-items></System></data>'
+            % (NETCONF_BASE_NS, NXOS_NS, "".join(entries)))
+
+##############################################################################
+#
+# load_nc_file - return the simulated replies in the nc_list of a ddr-nc file
+#
+#############################################################################
+def load_nc_file(nc_file):
+    return [entry["content"] for entry in runpy.run_path(nc_file)["nc_list"]]
+
+##############################################################################
+#
+# NetconfFraming - send and receive NETCONF messages on an SSH channel
+#                  End of message framing is used until both hellos include base:1.1 then
+#                  chunked framing is used (RFC 6242)
+#
+#############################################################################
+class NetconfFraming():
+    def __init__(self, channel):
+        self.channel = channel
+        self.buffer = b""
+        self.chunked = False
+        self.lock = threading.Lock()
+
+    def send(self, message):
+        data = message.encode("utf-8")
+        if self.chunked:
+            data = b"\n#%d\n" % len(data) + data + b"\n##\n"
+        else:
+            data = data + b"]]>]]>"
+        with self.lock:
+            self.channel.sendall(data)
+
+    def read(self):
+        data = self.channel.recv(65536)
+        if not data:
+            raise EOFError("NETCONF session closed")
+        self.buffer = self.buffer + data
+
+    def receive(self):
+        if not self.chunked:
+            while b"]]>]]>" not in self.buffer:
+                self.read()
+            message, self.buffer = self.buffer.split(b"]]>]]>", 1)
+            return message.strip()
+        chunks = []
+        while True:
+            if self.buffer.startswith(b"\n##\n"):
+                self.buffer = self.buffer[4:]
+                return b"".join(chunks)
+            if self.buffer.startswith(b"\n#") and b"\n" in self.buffer[2:]:
+                header, rest = self.buffer[2:].split(b"\n", 1)
+                size = int(header)
+                if len(rest) >= size:
+                    chunks.append(rest[:size])
+                    self.buffer = rest[size:]
+                    continue
+            elif len(self.buffer) >= 2 and not self.buffer.startswith(b"\n#"):
+                raise ValueError("invalid NETCONF chunk framing")
+            self.read()
+
+##############################################################################
+#
+# NetconfStandInSession - one NETCONF session on an SSH channel
+#
+#############################################################################
+class NetconfStandInSession():
+    def __init__(self, server, transport, channel, session_id):
+        self.server = server
+        self.transport = transport
+        self.framing = NetconfFraming(channel)
+        self.session_id = session_id
+        self.closed = threading.Event()
+
+    def hello(self):
+        capabilities = "".join("<capability>%s</capability>" % capability for capability in CAPABILITIES)
+        self.framing.send('<?xml version="1.0" encoding="UTF-8"?><hello xmlns="%s"><capabilities>%s</capabilities>'
+                          '<session-id>%d</session-id></hello>' % (NETCONF_BASE_NS, capabilities, self.session_id))
+        client_hello = etree.fromstring(self.framing.receive())
+        client_capabilities = [capability.text.strip() for capability in client_hello.iter("{*}capability")]
+        self.framing.chunked = "urn:ietf:params:netconf:base:1.1" in client_capabilities
+
+    def reply(self, message_id, content):
+        self.framing.send('<rpc-reply xmlns="%s" message-id="%s">%s</rpc-reply>' % (NETCONF_BASE_NS, message_id, content))
+
+    def rpc_error(self, message_id, tag, message):
+        self.reply(message_id, '<rpc-error><error-type>application</error-type><error-tag>%s</error-tag>'
+                               '<error-severity>error</error-severity><error-message>%s</error-message></rpc-error>' % (tag, message))
+
+    def run(self):
+        try:
+            self.hello()
+            while not self.closed.is_set():
+                rpc = etree.fromstring(self.framing.receive())
+                self.handle(rpc)
+        except (EOFError, OSError, socket.error):
+            pass
+        except Exception as e:
+            self.server.log("%%%% DDR Error: stand-in session " + str(self.session_id) + ": " + str(e))
+        finally:
+            self.close()
+
+    def handle(self, rpc):
+        message_id = rpc.get("message-id", "0")
+        operations = [child for child in rpc if isinstance(child.tag, str)]
+        if operations == []:
+            self.rpc_error(message_id, "missing-element", "rpc has no operation")
+            return
+        operation = operations[0]
+        name = etree.QName(operation).localname
+        self.server.count(name)
+        fault = self.server.fault()
+        if fault == "drop":
+            self.close()
+            return
+        if fault == "error":
+            self.rpc_error(message_id, "operation-failed", "stand-in injected error")
+            return
+        if name in ["get", "get-config"]:
+            subtree = operation.find("{*}filter")
+            self.reply(message_id, self.server.get_data(subtree))
+        elif name == "edit-config":
+            config = operation.find("{*}config")
+            self.server.configs.append(etree.tostring(config, encoding="unicode") if config is not None else "")
+            self.reply(message_id, "<ok/>")
+        elif name == "create-subscription":
+            self.reply(message_id, "<ok/>")
+            threading.Thread(target=self.send_notifications, daemon=True).start()
+        elif name == "close-session":
+            self.reply(message_id, "<ok/>")
+            self.close()
+        elif name in ["lock", "unlock", "commit", "discard-changes", "validate"]:
+            self.reply(message_id, "<ok/>")
+        else:
+            self.rpc_error(message_id, "operation-not-supported", name + " is not supported by the stand-in server")
+
+    def send_notifications(self):
+        sequence = 0
+        while self.server.notification_rate > 0 and not self.closed.wait(1 / self.server.notification_rate):
+            templates = self.server.notifications
+            content = templates[sequence % len(templates)].format(sequence=sequence, session=self.session_id)
+            try:
+                self.framing.send('<notification xmlns="%s"><eventTime>%s</eventTime>%s</notification>'
+                                  % (NOTIFICATION_NS, datetime.now(timezone.utc).isoformat(), content))
+            except Exception:
+                self.close()
+                return
+            self.server.count("notification")
+            sequence = sequence + 1
+
+    def close(self):
+        if not self.closed.is_set():
+            self.closed.set()
+            self.transport.close()
+            self.server.remove_session(self)
+
+##############################################################################
+#
+# NetconfStandInInterface - paramiko server interface for password login and the netconf subsystem
+#
+#############################################################################
+class NetconfStandInInterface(paramiko.ServerInterface):
+    def __init__(self, server):
+        self.server = server
+        self.subsystem = threading.Event()
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_auth_password(self, username, password):
+        if username == self.server.username and password == self.server.password:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_subsystem_request(self, channel, name):
+        if name == "netconf":
+            self.subsystem.set()
+            return True
+        return False
+
+##############################################################################
+#
+# NetconfStandInServer - listen for NETCONF over SSH sessions
+#
+# data - XML document or list of XML documents served by get and get-config
+# notifications - RFC5277 notification content templates sent in turn, "{sequence}" is replaced
+#                 by the notification number in the session
+# start() returns the listening port.  port=0 selects a free port
+# counters counts the RPCs received by operation name and the notifications sent
+# sessions - open sessions, a session is removed when it is closed
+#
+#############################################################################
+class NetconfStandInServer():
+    def __init__(self, data=None, host="127.0.0.1", port=0, username="ddr", password="ddr", host_key=None,
+                 latency=0, jitter=0, error_rate=0, drop_rate=0, notifications=None, notification_rate=0,
+                 seed=None, log=None):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.host_key = host_key if host_key is not None else paramiko.RSAKey.generate(2048)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.notifications = notifications if notifications else [DEFAULT_NOTIFICATION]
+        self.notification_rate = notification_rate
+        self.random = random.Random(seed)
+        self.log_function = log
+        self.configs = []
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.sessions = []
+        self.next_session_id = 1
+        self.socket = None
+        self.stop_event = threading.Event()
+        self.set_data(data if data is not None else synthetic_nve_data())
+
+    def log(self, message):
+        if self.log_function is not None:
+            self.log_function(message)
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+    #
+    # Each document is stored as a <data> element so filter_reply can select from all documents
+    #
+    def set_data(self, data):
+        if isinstance(data, (str, bytes)):
+            data = [data]
+        documents = []
+        for document in data:
+            if isinstance(document, str):
+                document = document.encode("utf-8")
+            root = etree.fromstring(document)
+            if etree.QName(root).localname == "rpc-reply":
+                root = root.find("{*}data")
+            elif etree.QName(root).localname != "data":
+                wrapper = etree.Element("{%s}data" % NETCONF_BASE_NS, nsmap={None: NETCONF_BASE_NS})
+                wrapper.append(root)
+                root = wrapper
+            if root is not None:
+                documents.append(root)
+        self.documents = documents
+
+    def get_data(self, subtree):
+        result = etree.Element("{%s}data" % NETCONF_BASE_NS, nsmap={None: NETCONF_BASE_NS})
+        documents = self.documents
+        if subtree is None:
+            for document in documents:
+                result.extend(etree.fromstring(etree.tostring(child)) for child in document)
+        else:
+            subtree = "".join(etree.tostring(child, encoding="unicode") for child in subtree if isinstance(child.tag, str))
+            for document in documents:
+                result.extend(etree.fromstring(filter_reply(document, subtree).encode("utf-8")))
+        return etree.tostring(result, encoding="unicode")
+    #
+    # Delay the reply and return "drop", "error" or None for the fault injected for an RPC
+    #
+    def fault(self):
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter > 0 else 0)
+        if delay > 0:
+            time.sleep(delay)
+        draw = self.random.random()
+        if draw < self.drop_rate:
+            self.count("drop")
+            return "drop"
+        if draw < self.drop_rate + self.error_rate:
+            self.count("error")
+            return "error"
+        return None
+
+    def start(self):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((self.host, self.port))
+        self.socket.listen(100)
+        self.socket.settimeout(1)
+        self.port = self.socket.getsockname()[1]
+        threading.Thread(target=self.accept, daemon=True).start()
+        return self.port
+
+    def accept(self):
+        while not self.stop_event.is_set():
+            try:
+                client, address = self.socket.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            threading.Thread(target=self.connection, args=(client,), daemon=True).start()
+
+    def connection(self, client):
+        transport = paramiko.Transport(client)
+        try:
+            transport.add_server_key(self.host_key)
+            interface = NetconfStandInInterface(self)
+            transport.start_server(server=interface)
+            channel = transport.accept(10)
+            if channel is None or not interface.subsystem.wait(10):
+                transport.close()
+                return
+            with self.lock:
+                session = NetconfStandInSession(self, transport, channel, self.next_session_id)
+                self.next_session_id = self.next_session_id + 1
+                self.sessions.append(session)
+            session.run()
+        except Exception as e:
+            self.log("%%%% DDR Error: stand-in connection: " + str(e))
+            transport.close()
+
+    def remove_session(self, session):
+        with self.lock:
+            if session in self.sessions:
+                self.sessions.remove(session)
+
+    def stop(self):
+        self.stop_event.set()
+        for session in list(self.sessions):
+            session.close()
+        if self.socket is not None:
+            self.socket.close()
+
+##############################################################################
+#
+# YangPushPublisher - local stand-in for a device publishing YANG push updates
+#
+# Used in place of an ncclient manager to run telemetry subscriptions without a device.
+# The device data is an XML document set with set_data.  Each subscription selects data
+# using its subtree filter and publishes:
+#   periodic - a push-update with the selected data every period
+#   on_change - a push-update with the selected data when the subscription is established and a
+#               push-change-update when set_data changes the selected data
+#
+# dispatch(rpc) accepts an establish-subscription RPC and returns a reply with the subscription id
+# take_notification(block, timeout) returns the next notification, the notification XML is in notification_xml
+#
+#############################################################################
+class PublisherReply():
+    def __init__(self, xml):
+        self.xml = xml
+
+class PublisherNotification():
+    def __init__(self, xml):
+        self.notification_xml = xml
+
+class YangPushPublisher():
+    def __init__(self, data="<data/>", clock=time.monotonic):
+        self.data = data
+        self.clock = clock
+        self.connected = True
+        self.subscriptions = {}
+        self.next_id = 1
+        self.notifications = []
+        self.condition = threading.Condition()
+
+    def dispatch(self, rpc):
+        if not isinstance(rpc, (str, bytes)):
+            rpc = etree.tostring(rpc)
+        if isinstance(rpc, str):
+            rpc = rpc.encode("utf-8")
+        root = etree.fromstring(rpc)
+        subtree = root.find("{%s}datastore-subtree-filter" % YANG_PUSH_NS)
+        if subtree is None:
+            raise ValueError("YangPushPublisher supports datastore-subtree-filter subscriptions")
+        subtree = "".join(etree.tostring(element, encoding="unicode") for element in subtree if isinstance(element.tag, str))
+        period = root.findtext("{%s}periodic/{%s}period" % (YANG_PUSH_NS, YANG_PUSH_NS))
+        with self.condition:
+            sid = str(self.next_id)
+            self.next_id = self.next_id + 1
+            self.subscriptions[sid] = {"path": subtree,
+                                      "period": None if period is None else int(period) / 100,
+                                      "next_time": self.clock(),
+                                      "last": self.selected(subtree)}
+            if period is None:
+                self.notifications.append(self.push_update(sid, self.subscriptions[sid]["last"]))
+        return PublisherReply('<rpc-reply xmlns="urn:ietf:params:xml:ns:netconf:base:1.0"><id xmlns="%s">%s</id></rpc-reply>' % (SUBSCRIBED_NOTIFICATIONS_NS, sid))
+
+    def selected(self, subtree):
+        data = etree.fromstring(filter_reply(self.data, subtree).encode("utf-8"))
+        return "".join(etree.tostring(element, encoding="unicode") for element in data)
+
+    def set_data(self, data):
+        with self.condition:
+            self.data = data
+            for sid, subscription in self.subscriptions.items():
+                if subscription["period"] is None:
+                    selected = self.selected(subscription["path"])
+                    if selected != subscription["last"]:
+                        subscription["last"] = selected
+                        self.notifications.append(self.change_update(sid, selected))
+            self.condition.notify_all()
+
+    def notification(self, content):
+        return ('<notification xmlns="urn:ietf:params:xml:ns:netconf:notification:1.0"><eventTime>' +
+                datetime.now(timezone.utc).isoformat() + '</eventTime>' + content + '</notification>')
+
+    def push_update(self, sid, selected):
+        return self.notification('<push-update xmlns="%s"><id>%s</id><datastore-contents>%s</datastore-contents></push-update>' % (YANG_PUSH_NS, sid, selected))
+
+    def change_update(self, sid, selected):
+        return self.notification('<push-change-update xmlns="%s"><id>%s</id><datastore-changes><yang-patch xmlns="urn:ietf:params:xml:ns:yang:ietf-yang-patch">' % (YANG_PUSH_NS, sid) +
+                                 '<patch-id>%s</patch-id><edit><edit-id>1</edit-id><operation>replace</operation><target>/</target><value>%s</value></edit>' % (sid, selected) +
+                                 '</yang-patch></datastore-changes></push-change-update>')
+
+    def publish_periodic(self):
+        now = self.clock()
+        for sid, subscription in self.subscriptions.items():
+            if subscription["period"] is not None and now >= subscription["next_time"]:
+                subscription["next_time"] = now + subscription["period"]
+                self.notifications.append(self.push_update(sid, self.selected(subscription["path"])))
+
+    def next_wait(self):
+        periods = [subscription["next_time"] - self.clock() for subscription in self.subscriptions.values() if subscription["period"] is not None]
+        if periods == []:
+            return None
+        return max(0, min(periods))
+
+    def take_notification(self, block=True, timeout=None):
+        end_time = None if timeout is None else self.clock() + timeout
+        with self.condition:
+            while True:
+                self.publish_periodic()
+                if self.notifications != []:
+                    return PublisherNotification(self.notifications.pop(0))
+                if not block or not self.connected:
+                    return None
+                wait = self.next_wait()
+                if end_time is not None:
+                    remaining = end_time - self.clock()
+                    if remaining <= 0:
+                        return None
+                    wait = remaining if wait is None else min(wait, remaining)
+                self.condition.wait(wait)
+
+    def close_session(self):
+        with self.condition:
+            self.connected = False
+            self.condition.notify_all()
+
+def main():
+    parser = argparse.ArgumentParser(description="Local NETCONF over SSH stand-in server for DDR testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8300)
+    parser.add_argument("--username", default="ddr")
+    parser.add_argument("--password", default="ddr")
+    parser.add_argument("--nc-file", help="serve the replies in a ddr-nc file")
+    parser.add_argument("--eps", type=int, default=1, help="synthetic VXLAN endpoints")
+    parser.add_argument("--peers", type=int, default=100, help="synthetic peers for each endpoint")
+    parser.add_argument("--vnis", type=int, default=10, help="synthetic VNIs for each endpoint")
+    parser.add_argument("--notification", action="append", help="notification content template, may be repeated")
+    parser.add_argument("--notification-rate", type=float, default=0, help="notifications per second for each subscription")
+    parser.add_argument("--latency", type=float, default=0, help="seconds added to each reply")
+    parser.add_argument("--jitter", type=float, default=0, help="maximum random seconds added to the latency")
+    parser.add_argument("--error-rate", type=float, default=0, help="fraction of RPCs returning rpc-error")
+    parser.add_argument("--drop-rate", type=float, default=0, help="fraction of RPCs closing the connection")
+    args = parser.parse_args()
+
+    if args.nc_file:
+        data = load_nc_file(args.nc_file)
+    else:
+        data = synthetic_nve_data(args.peers, args.vnis, args.eps)
+    server = NetconfStandInServer(data, args.host, args.port, args.username, args.password,
+                                  latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                                  drop_rate=args.drop_rate, notifications=args.notification,
+                                  notification_rate=args.notification_rate, log=print)
+    port = server.start()
+    print("**** DDR Notice: NETCONF stand-in server listening on " + args.host + ":" + str(port))
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        server.stop()
+        print("**** DDR Notice: NETCONF stand-in server counters: " + str(server.counters))
+
+if __name__ == "__main__":
+    main()
@@ -1,81 +1,13 @@
 from pprint import pprint as pp
 import copy
+import io
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
 import clips
-
-def get_netconf_fact(fact, test_rpc, env, deftemplate):
-
-            get_result = test_rpc
-            instances = xml.dom.minidom.parseString(get_result.xml).getElementsByTagName(key)
-    #
-    # Filter entries in multitemplate list if a filter is specified to limit fact collection
-    #
-            if element_list != []:
-                filtered_elements = []
-                filtered_instances = []
-                for each in instances:
-                    instance = []
-                    fact = facts[0]
-                    if fact[1] == 'str':
-                        for node in each.getElementsByTagName(fact[0]):
-                            if str(node.firstChild.nodeValue).replace(" ", "") in element_list:
-                                filtered_elements.append(str(node.firstChild.nodeValue).replace(" ", ""))
-                                filtered_instances.append(each)
-                    if fact[1] == 'int':
-                        for node in each.getElementsByTagName(fact[0]):
-                            if int(node.firstChild.nodeValue) in element_list:
-                                filtered_elements.append(int(node.firstChild.nodeValue))
-                                filtered_instances.append(each)
-                element_list = filtered_elements
-                instances = filtered_instances
-
-            instance_list = []
-            for each in instances:
-                instance = []
-                for leaf in leafs:
-                    for node in each.getElementsByTagName(leaf):
-                        instance.append(node.firstChild.nodeValue)
-                if instance != []:
-                    instance_list.append(instance)
-                instance = []
-    #
-    # For each instance in the instance_list assert the information read as facts
-    # Create a python dictionary with each key:value pair where the key is the slot
-    # and value is the slot value
-    # Template facts may specify the type of the value stored into the slot
-    #  [["five-seconds", "int"], ["one-minute", "int"], ["five-minutes", "int"]]
-    #
-            for each in instance_list:
-                template = env.find_template(str(deftemplate))
-                fact1 = {}
-                fact1["device"] = str(device_name)
-                j = 0
-                for fact in facts:
-                    if len(fact) == 2:
-                        if fact[1] == "int":
-                            fact1[str(fact[0])] = int(each[j])
-                        elif fact[1] == "str":
-                            fact1[str(fact[0])] = str(each[j]).replace(" ", "_")
-                        elif fact[1] == "flt":
-                            fact1[str(fact[0])] = float(each[j])
-                        else:
-                            break
-                        j = j + 1
-                        
-                    else:
-                        if isinstance(each[j], int):
-                            fact1[str(fact)] = int(each[j])
-                        else:
-                            fact1[str(fact)] = str(each[j]).replace(" ", "_")
-                            j = j + 1                       
-    #
-    # Assert the FACT defined by a Python dictionary
-    #
-                try:
-                    template.assert_fact(**fact1)
-                except Exception as e:
-                    pass
-
-            return
+from lxml import etree
 
 ##############################################################################
 #
@@ -114,6 +46,8 @@ def get_netconf_fact(fact, test_rpc, env, deftemplate):
 #############################################################################
 def show_and_assert_fact(env, template, fact, response):
     print("\n********** Parsed response data translated into dictionary **************")
+    protofact = fact["protofact"]
+    sub_dictionary = None
     try:
         #
         # use the parsed output of a show command that will be in the form of a python dictionary
@@ -122,7 +56,6 @@ def show_and_assert_fact(env, template, fact, response):
         #
         parsed_genie_output = response
         sub_dictionary_list = find(fact["assert_fact_for_each_item_in"], parsed_genie_output)
-        import copy
         #
         # If there are multiple sets of data in the parsed response, each will be in a sub_dictionary
         # A FACT is generated for each sub_dictionary
@@ -131,6 +64,8 @@ def show_and_assert_fact(env, template, fact, response):
             print("\n%%%% DDR Error: show_and_assert exception: No subdictionary present: check the fact_list value name in 'assert_fact_for_each_item_in' for incorrect name.  Verify - and _ are correct in the name and match the names defined in the parser definition")
             return
 
+        plan = compile_protofact(protofact)
+        records = []
         for sub_dictionary in sub_dictionary_list:
             print(f"sub_dictionary entry: {sub_dictionary}")
             #
@@ -138,23 +73,824 @@ def show_and_assert_fact(env, template, fact, response):
             # Addeded to a dictionary in the form required to generate a CLIPs FACT
             #
             for item in sub_dictionary:
-                protofact = copy.deepcopy(fact["protofact"])
-                for slot in protofact["slots"]:
-                    value = protofact["slots"][slot]
-                    #
-                    # insert the device name into the fact
-                    #
-                    if value == "device":
-                        protofact["slots"][slot] = value.replace("device", fact["device"])
-                    elif type(value) == str and "$" in value:
-                        protofact["slots"][slot] = value.replace("$", item)
-
-                assert_template_fact(env, template, protofact, sub_dictionary)
+                fact1, errors = plan.materialize(item, sub_dictionary, fact.get("device"))
+                if report_plan_errors(errors, fact1, protofact, sub_dictionary):
+                    continue
+                records.append((plan.template, fact1))
+
+        for error in assert_facts_bulk(env, records):
+            print("%%%% DDR Exception: template.assert_fact: " + str(error["error"]) + "\n\nfact1: " + str(error["slots"]) + "\n\nProtofact: " + str(protofact))
+            print("$$$$$$$$$ Verify keys in parser definition match the keys in the subdictionary $$$$$$$$$")
     except Exception as e:
         print("\n%%%% DDR Error: show_and_assert exception: \n" + str(e))
         print("$$$$$$$$$$$ Verify that the 'template' name in the fact_list is correct and matches the name in the ddr-rules.  Verify correct - and _ in names $$$$$$$$$$$$$")
         print("\n\nProtofact: " + str(protofact) + "\n\nsub_dictionary: " + str(sub_dictionary))
 
+##############################################################################
+#
+# stream_and_assert_fact - assert FACTs from the records generated by a streaming parser
+#
+# records - iterable of (dictionary name, key, entry) tuples from parser.parse_iter
+#
+# A FACT is asserted for each record in the "assert_fact_for_each_item_in" dictionary as the
+# record is generated so the parsed output is never held in memory.  The protofact is applied
+# to each entry as if the entry was the only item in the sub_dictionary.  Records with
+# the same key generate separate FACTs, they are not merged as in the dictionary returned by parse
+#
+# Returns the number of FACTs asserted
+#
+#############################################################################
+def stream_and_assert_fact(env, fact, records, template_cache=None):
+    protofact = fact["protofact"]
+    plan = compile_protofact(protofact)
+    name = fact["assert_fact_for_each_item_in"]
+    count = [0]
+
+    def fact_records():
+        for record_name, key, entry in records:
+            if record_name != name:
+                continue
+            sub_dictionary = {key: entry}
+            fact1, errors = plan.materialize(key, sub_dictionary, fact.get("device"))
+            if report_plan_errors(errors, fact1, protofact, sub_dictionary):
+                continue
+            count[0] += 1
+            yield plan.template, fact1
+
+    try:
+        errors = assert_facts_bulk(env, fact_records(), template_cache)
+    except Exception as e:
+        print("\n%%%% DDR Error: stream_and_assert exception: \n" + str(e))
+        print("\n\nProtofact: " + str(protofact))
+        return 0
+    for error in errors:
+        print("%%%% DDR Exception: template.assert_fact: " + str(error["error"]) + "\n\nfact1: " + str(error["slots"]) + "\n\nProtofact: " + str(protofact))
+    return count[0] - len(errors)
+
+##############################################################################
+#
+# report_plan_errors - print the errors returned by ProtofactPlan.materialize
+#                      Returns True if the FACT should not be asserted because a
+#                      slot value was not found in the sub_dictionary
+#
+#############################################################################
+def report_plan_errors(errors, fact1, protofact, sub_dictionary):
+    skip_fact = False
+    for error_type, slot, e in errors:
+        if error_type == "lookup":
+            print("\n%%%% DDR Error: Exception assert_template_fact: " + str(e))
+            print("$$$$$$$$$ Verify keys in parser definition match the keys in the subdictionary $$$$$$$$$")
+            print("\n\nfact1: " + str(fact1) + "\n\nProtofact: " + str(protofact) + "\n\nsub_dictionary: " + str(sub_dictionary))
+            skip_fact = True
+        else:
+            print("\n%%%% DDR Error: Exception assert_template_fact: type error: " + str(e) + "\n\nfact1: " + str(fact1) + "\n\nProtofact: " + str(protofact) + "\n\nsub_dictionary: " + str(sub_dictionary))
+            print("$$$$$$$$$ Verify types definied in parser definition match the slot type in the deftemplate $$$$$$$$$")
+    return skip_fact
+
+##############################################################################
+#
+# compile_protofact - translate a protofact into a ProtofactPlan
+#
+# A protofact is compiled once when the FACT definitions are loaded.  The plan
+# records for each slot how the value is found and the type conversion so
+# FACTs can be generated for each item in parsed data without copying and
+# rescanning the protofact for every item
+#
+#   "device"        - the device name
+#   "$"             - the key of the item in the sub_dictionary
+#   "$+name+name"   - the value at the path below the item in the sub_dictionary
+#   "name+name"     - the value at the path in the sub_dictionary
+#   other values    - used as a constant
+#
+# replace_spaces - replace spaces with '_' in "str" slot values
+#
+#############################################################################
+SLOT_CONSTANT = 0
+SLOT_DEVICE = 1
+SLOT_ITEM = 2
+SLOT_ITEM_PATH = 3
+SLOT_PATH = 4
+SLOT_FIND = 5
+
+class ProtofactPlan():
+    def __init__(self, protofact, replace_spaces=True):
+        self.template = protofact["template"]
+        self.replace_spaces = replace_spaces
+        self.slots = []
+        types = protofact.get("types")
+        for slot, value in protofact["slots"].items():
+            if types is None:
+                slot_type = None
+            else:
+                slot_type = types.get(slot)
+            if value == "device":
+                kind, arg = SLOT_DEVICE, None
+            elif type(value) == str and "$" in value:
+                if value == "$":
+                    kind, arg = SLOT_ITEM, None
+                elif value.startswith("$+") and value.count("$") == 1 and "*" not in value:
+                    kind, arg = SLOT_ITEM_PATH, tuple(value[2:].split("+"))
+                else:
+                    kind, arg = SLOT_FIND, value
+            elif type(value) == str and "+" in value:
+                if "*" in value:
+                    kind, arg = SLOT_FIND, value
+                else:
+                    kind, arg = SLOT_PATH, tuple(value.split("+"))
+            else:
+                kind, arg = SLOT_CONSTANT, value
+            self.slots.append((slot, kind, arg, slot_type))
+
+    def __repr__(self):
+        return "ProtofactPlan(" + str(self.template) + ", " + str(self.slots) + ")"
+    #
+    # Generate the slot values for one item in the sub_dictionary
+    # Returns the slot dictionary and a list of errors [("lookup" or "type", slot, exception)]
+    # Slots with errors are not included in the slot dictionary
+    #
+    def materialize(self, item, sub_dictionary, device=None):
+        fact1 = {}
+        errors = []
+        for slot, kind, arg, slot_type in self.slots:
+            try:
+                if kind == SLOT_ITEM_PATH:
+                    value = sub_dictionary[item]
+                    for key in arg:
+                        value = value[key]
+                elif kind == SLOT_ITEM:
+                    value = item
+                elif kind == SLOT_DEVICE:
+                    value = device
+                elif kind == SLOT_PATH:
+                    value = sub_dictionary
+                    for key in arg:
+                        value = value[key]
+                elif kind == SLOT_FIND:
+                    value = arg.replace("$", str(item))
+                    if "+" in value:
+                        value = find(value, sub_dictionary)[0]
+                else:
+                    value = arg
+            except Exception as e:
+                errors.append(("lookup", slot, e))
+                continue
+            try:
+                if slot_type == "int":
+                    fact1[slot] = int(value)
+                elif slot_type == "flt":
+                    fact1[slot] = float(value)
+                elif slot_type is None:
+                    raise KeyError(slot)
+                elif self.replace_spaces:
+                    fact1[slot] = str(value).replace(" ", "_")
+                else:
+                    fact1[slot] = str(value)
+            except Exception as e:
+                errors.append(("type", slot, e))
+        return fact1, errors
+
+def compile_protofact(protofact, replace_spaces=True):
+    return ProtofactPlan(protofact, replace_spaces)
+
+##############################################################################
+#
+# element_filter - compile an element_list into a frozenset so each instance is selected with one lookup
+#
+# normalize_element - normalize a value from the element_list or from a device reply before the lookup
+#                     Spaces are removed and values for "int" slots are converted to int
+#                     Returns None for an "int" value that is not an integer so it never matches
+#
+#############################################################################
+def normalize_element(value, slot_type="str"):
+    value = str(value).replace(" ", "")
+    if slot_type == "int":
+        try:
+            return int(value)
+        except ValueError:
+            return None
+    return value
+
+def element_filter(values, slot_type="str"):
+    return frozenset(normalize_element(value, slot_type) for value in values) - {None}
+
+##############################################################################
+#
+# TemplateCache - deftemplate objects for a CLIPs environment looked up by name
+#                 find_template is only called the first time a template is used
+#
+#############################################################################
+class TemplateCache(dict):
+    def __init__(self, env):
+        super().__init__()
+        self.env = env
+
+    def __missing__(self, name):
+        template = self.env.find_template(name)
+        self[name] = template
+        return template
+
+##############################################################################
+#
+# ResponseCache - device responses kept in memory so identical reads are not sent to the device again
+#
+# size - maximum number of responses kept, the least recently used response is removed first
+# ttl - seconds a response is used after it is read, 0 keeps the response until it is removed
+# per_cycle - True removes all responses when new_cycle is called at the start of each inference engine run
+#
+# get returns (True, response) for a cached response and (False, None) otherwise
+# hits and misses count the get results since the last new_cycle
+#
+#############################################################################
+class ResponseCache():
+    def __init__(self, size=256, ttl=0, per_cycle=True, clock=time.monotonic):
+        self.size = size
+        self.ttl = ttl
+        self.per_cycle = per_cycle
+        self.clock = clock
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        with self.lock:
+            if key in self.entries:
+                read_time, response = self.entries[key]
+                if self.ttl <= 0 or self.clock() - read_time < self.ttl:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return True, response
+                del self.entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, response):
+        with self.lock:
+            self.entries[key] = (self.clock(), response)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def new_cycle(self):
+        with self.lock:
+            if self.per_cycle:
+                self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+##############################################################################
+#
+# assert_facts_bulk - assert a collection of FACTs into a CLIPs environment
+#
+# records - iterable of (template name, slot dictionary) tuples
+# template_cache - optional TemplateCache for the environment to reuse across calls
+#
+# Returns a list with an entry for each FACT that could not be asserted:
+#   {"index": position in records, "template": template name, "slots": slot dictionary, "error": error message}
+#
+#############################################################################
+def assert_facts_bulk(env, records, template_cache=None):
+    if template_cache is None:
+        template_cache = TemplateCache(env)
+    errors = []
+    for index, (template_name, slots) in enumerate(records):
+        try:
+            template_cache[template_name].assert_fact(**slots)
+        except Exception as e:
+            errors.append({"index": index, "template": template_name, "slots": slots, "error": str(e)})
+    return errors
+
+##############################################################################
+#
+# NETCONF get reply processing for multitemplate and multitemplate_protofact FACT definitions
+#
+# netconf_xpath - return the compiled XPath expression for a protofact slot path
+#                 Expressions are evaluated relative to an "assert_fact_for_each" element and
+#                 element names are matched without the namespace
+#
+#   'ip'            - the first element named ip below the element
+#   'Ep-list/epId'  - the first epId element in the nearest enclosing Ep-list element
+#
+# first=False returns all of the elements named ip below the element
+# Each expression is compiled once and shared by all FACT definitions
+#
+#############################################################################
+NETCONF_XPATHS = {}
+
+def netconf_xpath(path, first=True):
+    xpath = NETCONF_XPATHS.get((path, first))
+    if xpath is None:
+        if "/" in path:
+            upper_tag, key = path.split("/")[:2]
+            expression = "ancestor-or-self::*[local-name()='" + upper_tag + "'][1]/descendant::*[local-name()='" + key + "']"
+        else:
+            expression = "descendant::*[local-name()='" + path + "']"
+        if first:
+            expression = expression + "[1]"
+        xpath = etree.XPath(expression)
+        NETCONF_XPATHS[(path, first)] = xpath
+    return xpath
+
+##############################################################################
+#
+# netconf_instances - yield the elements named tag in a NETCONF get reply
+#
+# source - reply XML as a string, bytes or a file object
+# upper_tags - names of enclosing list elements that contain key values used by the protofact
+#
+# The reply is read with lxml iterparse and each element is cleared after it is processed
+# so the complete reply tree is never built.  If upper_tags are used the elements are yielded
+# when the outermost enclosing list entry has been read so the key values are available.
+# The yielded elements are only valid until the next element is requested.
+#
+#############################################################################
+def netconf_instances(source, tag, upper_tags=()):
+    if isinstance(source, str):
+        source = source.encode("utf-8")
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    if upper_tags:
+        upper_names = ["{*}" + upper_tag for upper_tag in set(upper_tags)]
+        events = etree.iterparse(source, events=("end",), tag=upper_names)
+    else:
+        events = etree.iterparse(source, events=("end",), tag="{*}" + tag)
+    for event, elem in events:
+        if upper_tags:
+            if next(elem.iterancestors(*upper_names), None) is not None:
+                continue
+            for instance in elem.iter("{*}" + tag):
+                yield instance
+        else:
+            yield elem
+        elem.clear(keep_tail=True)
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+##############################################################################
+#
+# compile_netconf_fact - translate a multitemplate_protofact FACT definition into a NetconfFactPlan
+#
+# The path for each protofact slot is compiled into an XPath expression when the FACT
+# definition is loaded.  The slot named in hardcoded_list[0] is set to the value passed to
+# extract, e.g. the device name.  A slot with no value in the reply has the value "nil"
+#
+# If "element_list" is in the FACT definition a FACT is only generated for an instance if
+# the value of one of the slots in the element_list, with spaces removed, is in the list for the slot
+#
+#   "element_list": {"peer-ip": ["1.2.3.5", "201.1.1.1"]}
+#
+# The element_list for each slot is compiled into a frozenset of normalized values, see element_filter
+#
+# extract yields (slot dictionary, errors) for each instance in the reply
+# errors is a list of ("type", slot, exception), slots with errors are not included in the slot dictionary
+#
+#############################################################################
+class NetconfFactPlan():
+    def __init__(self, fact):
+        protofact = fact["protofact"]
+        self.template = protofact["template"]
+        self.tag = fact["assert_fact_for_each"]
+        hardcoded_list = fact.get("hardcoded_list", [])
+        self.upper_tags = set()
+        self.upper_slots = {}
+        self.slots = []
+        for slot, path in protofact["slots"].items():
+            slot_type = protofact["types"][slot]
+            if hardcoded_list and slot == hardcoded_list[0]:
+                self.slots.append((slot, None, slot_type))
+                continue
+            path = str(path)
+            if "/" in path:
+                upper_tag, key = path.split("/")[:2]
+                self.upper_tags.add(upper_tag)
+                self.upper_slots.setdefault(upper_tag, []).append((slot, netconf_xpath(key)))
+            self.slots.append((slot, netconf_xpath(path), slot_type))
+        self.upper_slot_names = set(slot for slots in self.upper_slots.values() for slot, xpath in slots)
+        if "element_list" in fact:
+            self.element_list = [(slot, protofact["types"][slot], element_filter(values, protofact["types"][slot]))
+                                 for slot, values in fact["element_list"].items()
+                                 if slot in protofact["slots"] and slot not in hardcoded_list]
+        else:
+            self.element_list = None
+
+    def __repr__(self):
+        return "NetconfFactPlan(" + str(self.template) + ", " + str(self.tag) + ", " + str([slot for slot, xpath, slot_type in self.slots]) + ")"
+    #
+    # Return the text of the element selected by each slot path, None if the slot has no value
+    # The values of "list/key" slots are read from the enclosing list entry by context
+    #
+    def values(self, instance, contexts=None):
+        values = {}
+        for slot, xpath, slot_type in self.slots:
+            if xpath is None or slot in self.upper_slot_names:
+                continue
+            nodes = xpath(instance)
+            if nodes:
+                values[slot] = nodes[0].text
+            else:
+                values[slot] = None
+        if self.upper_slots:
+            if contexts is None:
+                contexts = {}
+            for upper_tag, slots in self.upper_slots.items():
+                values.update(self.context(instance, upper_tag, slots, contexts))
+        return values
+    #
+    # Return the values of the "upper_tag/key" slots for the nearest enclosing upper_tag list entry
+    # Instances are read in document order so the instances in one list entry follow each other.
+    # contexts keeps the list entry and values last read for each upper_tag so the values are read
+    # once for each list entry instead of once for each instance
+    #
+    def context(self, instance, upper_tag, slots, contexts):
+        if upper_tag == self.tag:
+            ancestor = instance
+        else:
+            ancestor = next(instance.iterancestors("{*}" + upper_tag), None)
+        last = contexts.get(upper_tag)
+        if last is not None and last[0] is ancestor:
+            return last[1]
+        upper_values = {}
+        for slot, xpath in slots:
+            nodes = [] if ancestor is None else xpath(ancestor)
+            if nodes:
+                upper_values[slot] = nodes[0].text
+            else:
+                upper_values[slot] = None
+        contexts[upper_tag] = (ancestor, upper_values)
+        return upper_values
+
+    def selected(self, values):
+        if self.element_list is None:
+            return True
+        for slot, slot_type, element_list in self.element_list:
+            value = values[slot]
+            if value is not None and normalize_element(value, slot_type) in element_list:
+                return True
+        return False
+
+    def materialize(self, values, hardcoded_value=None):
+        fact1 = {}
+        errors = []
+        for slot, xpath, slot_type in self.slots:
+            if xpath is None:
+                value = hardcoded_value
+            else:
+                value = values[slot]
+                if value is None:
+                    value = "nil"
+            try:
+                if slot_type == "int":
+                    fact1[slot] = int(value)
+                elif slot_type == "flt":
+                    fact1[slot] = float(value)
+                else:
+                    fact1[slot] = str(value)
+            except Exception as e:
+                errors.append(("type", slot, e))
+        return fact1, errors
+
+    def extract(self, source, hardcoded_value=None):
+        contexts = {}
+        for instance in netconf_instances(source, self.tag, self.upper_tags):
+            values = self.values(instance, contexts)
+            if self.selected(values):
+                yield self.materialize(values, hardcoded_value)
+
+def compile_netconf_fact(fact):
+    return NetconfFactPlan(fact)
+
+##############################################################################
+#
+# MultitemplatePlan - compiled "multitemplate" FACT definition
+#
+# fact is the "data" list from the FACT definition:
+#
+#   ["multitemplate", 0, "CAT9K-24", subtree filter, "interface-stats", "interface",
+#    ["name", "in-errors"], [["name", "str"], ["in-errors", "int"]], [], ["GigabitEthernet1"]]
+#
+#   [4] template name, [5] list element for each FACT, [6] leaf names read for each list element,
+#   [7] slot names and types in the order of the leaf values, [9] element_list of key values
+#
+# An instance is included once for each element named by the first slot in [7] with a value in the element_list.
+# Every element matching a leaf adds a value, a missing leaf adds "nil"
+#
+# extract yields (slot dictionary, errors) for each instance in the reply.  The "device" slot is set
+# to device_name.  Slot conversion stops at the first error, errors is a list of ("type", slot, error)
+#
+#############################################################################
+class MultitemplatePlan():
+    def __init__(self, fact):
+        self.template = str(fact[4])
+        self.tag = fact[5]
+        self.leaf_xpaths = [netconf_xpath(str(leaf), first=False) for leaf in fact[6]]
+        self.facts = fact[7]
+        key_fact = fact[7][0]
+        if isinstance(key_fact, (list, tuple)):
+            key_name, self.key_type = str(key_fact[0]), key_fact[1]
+        else:
+            key_name, self.key_type = str(key_fact), "str"
+        self.key_xpath = netconf_xpath(key_name, first=False)
+        if fact[9] == []:
+            self.element_list = None
+        elif self.key_type in ["str", "int"]:
+            self.element_list = element_filter(fact[9], self.key_type)
+        else:
+            self.element_list = frozenset()
+
+    def __repr__(self):
+        return "MultitemplatePlan(" + str(self.template) + ", " + str(self.tag) + ", " + str(self.facts) + ")"
+
+    def matches(self, instance):
+        if self.element_list is None:
+            return 1
+        return sum(1 for node in self.key_xpath(instance) if normalize_element(node.text, self.key_type) in self.element_list)
+
+    def values(self, instance):
+        values = []
+        for leaf_xpath in self.leaf_xpaths:
+            nodes = leaf_xpath(instance)
+            if len(nodes) == 0:
+                values.append('nil')
+            else:
+                for node in nodes:
+                    values.append(node.text)
+        return values
+
+    def materialize(self, values, device_name=None):
+        fact1 = {"device": str(device_name)}
+        errors = []
+        j = 0
+        try:
+            for fact in self.facts:
+                if isinstance(fact, (list, tuple)) and len(fact) == 2:
+                    if fact[1] == "int":
+                        fact1[str(fact[0])] = int(values[j])
+                    elif fact[1] == "str":
+                        fact1[str(fact[0])] = str(values[j])
+                    elif fact[1] == "flt":
+                        fact1[str(fact[0])] = float(values[j])
+                    else:
+                        errors.append(("type", str(fact), "Invalid fact type"))
+                        break
+                else:
+                    fact1[str(fact)] = str(values[j])
+                j = j + 1
+        except Exception as e:
+            errors.append(("type", str(fact), e))
+        return fact1, errors
+
+    def extract(self, source, device_name=None):
+        for instance in netconf_instances(source, self.tag):
+            matches = self.matches(instance)
+            if matches == 0:
+                continue
+            values = self.values(instance)
+            if values == []:
+                continue
+            for match in range(matches):
+                yield self.materialize(values, device_name)
+
+def compile_multitemplate_fact(fact):
+    return MultitemplatePlan(fact)
+
+##############################################################################
+#
+# Batch conversion of captured NETCONF get replies to FACTs
+#
+# Uses the same compiled extraction as DDR so captured replies can be replayed or benchmarked
+# without device sessions or a DDR instance.
+#
+# fact - nc-fact-list/fact-list entry: a multitemplate_protofact FACT definition, a multitemplate
+#        FACT definition {"fact_type": "multitemplate", "data": [...]}, or the multitemplate "data" list
+# paths - a reply file, a directory or a list of files and directories.  Every file in a directory is
+#         read in name order.  Each file contains one get reply
+# device_name - value for the hardcoded slot of a protofact and the "device" slot of a multitemplate
+# timestamp - optional value added to each FACT as the "timestamp" slot
+#
+# compile_nc_fact - return the compiled plan for any of the NETCONF FACT definition forms
+#
+# netconf_reply_files - yield the reply files for paths
+#
+# netconf_fact_records - yield a (template name, slot dictionary) record for each FACT in the replies
+#               The replies are parsed incrementally so one file is never held in memory as a tree
+#               Slot conversion errors are passed to on_error(file, error) if it is provided
+#
+# assert_netconf_files - assert the FACTs from the replies into a CLIPs environment in batches
+#               Returns (number of FACTs asserted, list of assert errors from assert_facts_bulk)
+#
+# get_netconf_fact - assert the FACTs for a multitemplate FACT definition from one get reply
+#               test_rpc is the ncclient reply or the reply XML, deftemplate overrides the template name
+#
+#############################################################################
+def compile_nc_fact(fact):
+    if isinstance(fact, dict):
+        if fact.get("fact_type") == "multitemplate":
+            return MultitemplatePlan(fact["data"])
+        return NetconfFactPlan(fact)
+    return MultitemplatePlan(fact)
+
+def netconf_reply_files(paths):
+    if isinstance(paths, (str, bytes, os.PathLike)):
+        paths = [paths]
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                file = os.path.join(path, name)
+                if os.path.isfile(file):
+                    yield file
+        else:
+            yield path
+
+def netconf_fact_records(fact, paths, device_name=None, timestamp=None, on_error=None):
+    plan = compile_nc_fact(fact)
+    for file in netconf_reply_files(paths):
+        with open(file, "rb") as source:
+            for fact1, errors in plan.extract(source, device_name):
+                if errors and on_error is not None:
+                    for error in errors:
+                        on_error(file, error)
+                if timestamp is not None:
+                    fact1["timestamp"] = timestamp
+                yield (plan.template, fact1)
+
+def assert_netconf_files(env, fact, paths, device_name=None, timestamp=None, template_cache=None, batch_size=500):
+    if template_cache is None:
+        template_cache = TemplateCache(env)
+    count = 0
+    errors = []
+    batch = []
+    for record in netconf_fact_records(fact, paths, device_name, timestamp):
+        batch.append(record)
+        if len(batch) >= batch_size:
+            batch_errors = assert_facts_bulk(env, batch, template_cache)
+            count = count + len(batch) - len(batch_errors)
+            errors.extend(batch_errors)
+            batch = []
+    if batch != []:
+        batch_errors = assert_facts_bulk(env, batch, template_cache)
+        count = count + len(batch) - len(batch_errors)
+        errors.extend(batch_errors)
+    return count, errors
+
+def get_netconf_fact(fact, test_rpc, env, deftemplate=None):
+    plan = MultitemplatePlan(fact)
+    if deftemplate is not None:
+        plan.template = str(deftemplate)
+    get_result = getattr(test_rpc, "xml", test_rpc)
+    return assert_facts_bulk(env, [(plan.template, fact1) for fact1, errors in plan.extract(get_result, fact[2])])
+
+##############################################################################
+#
+# Subtree filter merging - combine the NETCONF get subtree filters for one device into one get
+#
+# merge_subtree_filters - merge the subtree filter strings that select data from the same model
+#               Returns a list of (merged filter string, [indexes of the filters in the merged filter])
+#               Filters are grouped by the namespace of their top level element.  Elements with the
+#               same name are merged if they select the same list entries, i.e. they have the same
+#               content match nodes, otherwise both elements are kept as siblings in the merged filter.
+#               A selection node, or an element with only content match nodes, selects the complete
+#               subtree so it replaces the elements it is merged with
+#
+# filter_reply - apply a subtree filter to a get reply as the device would (RFC 6241 section 6)
+#               The reply is XML or a parsed lxml element
+#               Used to return the data for each of the merged filters from the merged get reply
+#               Returns the selected data in a <data> element as an XML string
+#
+# split_reply - apply each of a list of subtree filters to a get reply
+#               The reply is parsed once and each top level data element is visited once for all of the filters
+#               Returns a list with the selected data for each filter as filter_reply would return it
+#
+#############################################################################
+NETCONF_BASE_NS = "urn:ietf:params:xml:ns:netconf:base:1.0"
+
+def filter_elements(subtree):
+    root = etree.fromstring("<filter>" + str(subtree) + "</filter>")
+    return [child for child in root if isinstance(child.tag, str)]
+
+def filter_children(node):
+    return [child for child in node if isinstance(child.tag, str)]
+
+def is_content_match(node):
+    return filter_children(node) == [] and (node.text or "").strip() != ""
+
+def content_matches(node):
+    return sorted((child.tag, child.text.strip()) for child in filter_children(node) if is_content_match(child))
+
+def selects_subtree(node):
+    return all(is_content_match(child) for child in filter_children(node)) and not is_content_match(node)
+
+def merge_filter_nodes(first, second):
+    if is_content_match(first) or is_content_match(second):
+        if is_content_match(first) and is_content_match(second) and first.text.strip() == second.text.strip():
+            return first
+        return None
+    if content_matches(first) != content_matches(second):
+        return None
+    if selects_subtree(first):
+        return first
+    if selects_subtree(second):
+        return second
+    merged = copy.deepcopy(first)
+    for child in filter_children(second):
+        if is_content_match(child):
+            continue
+        merge_child(merged, child)
+    return merged
+
+def merge_child(parent, child):
+    for index, existing in enumerate(parent):
+        if existing.tag == child.tag:
+            merged = merge_filter_nodes(existing, child)
+            if merged is not None:
+                if merged is not existing:
+                    parent[index] = copy.deepcopy(merged)
+                return
+    parent.append(copy.deepcopy(child))
+
+def merge_subtree_filters(filters):
+    groups = {}
+    for index, subtree in enumerate(filters):
+        elements = filter_elements(subtree)
+        if elements == []:
+            namespace = None
+        else:
+            namespace = etree.QName(elements[0]).namespace
+        groups.setdefault(namespace, []).append((index, elements))
+
+    merged_filters = []
+    for namespace, members in groups.items():
+        merged = etree.Element("filter")
+        for index, elements in members:
+            for element in elements:
+                merge_child(merged, element)
+        merged_filters.append(("".join(etree.tostring(child, encoding="unicode") for child in merged),
+                               [index for index, elements in members]))
+    return merged_filters
+
+def tag_matches(data_tag, filter_tag):
+    if data_tag == filter_tag:
+        return True
+    return filter_tag[0] != "{" and etree.QName(data_tag).localname == filter_tag
+
+def apply_filter(data, node):
+    children = filter_children(node)
+    if children == []:
+        text = (node.text or "").strip()
+        if text == "" or (data.text or "").strip() == text:
+            return copy.deepcopy(data)
+        return None
+    content = [child for child in children if is_content_match(child)]
+    for child in content:
+        if not any(tag_matches(data_child.tag, child.tag) and (data_child.text or "").strip() == child.text.strip()
+                   for data_child in data if isinstance(data_child.tag, str)):
+            return None
+    others = [child for child in children if not is_content_match(child)]
+    if others == []:
+        return copy.deepcopy(data)
+    result = etree.Element(data.tag, nsmap=data.nsmap)
+    for data_child in data:
+        if not isinstance(data_child.tag, str):
+            continue
+        if any(tag_matches(data_child.tag, child.tag) for child in content):
+            result.append(copy.deepcopy(data_child))
+            continue
+        for child in others:
+            if tag_matches(data_child.tag, child.tag):
+                selected = apply_filter(data_child, child)
+                if selected is not None:
+                    result.append(selected)
+                    break
+    return result
+
+def filter_reply(reply, subtree):
+    return split_reply(reply, [subtree])[0]
+
+def split_reply(reply, subtrees):
+    if isinstance(reply, str):
+        reply = reply.encode("utf-8")
+    if isinstance(reply, bytes):
+        root = etree.fromstring(reply)
+    else:
+        root = reply
+    data = root.find("{" + NETCONF_BASE_NS + "}data")
+    if data is None:
+        data = root
+    filters = [filter_elements(subtree) for subtree in subtrees]
+    results = [etree.Element("{" + NETCONF_BASE_NS + "}data", nsmap={None: NETCONF_BASE_NS}) for subtree in subtrees]
+    for data_child in data:
+        if not isinstance(data_child.tag, str):
+            continue
+        for nodes, result in zip(filters, results):
+            for node in nodes:
+                if tag_matches(data_child.tag, node.tag):
+                    selected = apply_filter(data_child, node)
+                    if selected is not None:
+                        result.append(selected)
+    return [etree.tostring(result, encoding="unicode") for result in results]
+
 
 ##############################################################################
 #
@@ -238,3 +974,276 @@ def assert_template_fact(env, template, protofact, sub_dictionary):
             print("$$$$$$$$$ Verify keys in parser definition match the keys in the subdictionary $$$$$$$$$")
             print("\n\nfact1: " + str(fact1) + "\n\nProtofact: " + str(protofact) + "\n\nsub_dictionary: " + str(sub_dictionary))
 
+##############################################################################
+#
+# YANG push telemetry - RFC 8639 subscriptions to RFC 8641 periodic and on-change datastore updates
+#
+# yang_push_subscription - return the establish-subscription RPC for a telem_list entry
+#   "xpath": XPath filter or "path": subtree filter selecting the datastore content
+#   "period": time between periodic updates in centiseconds, or
+#   "on_change": True with optional "dampening_period" in centiseconds for on-change updates
+#   "datastore": optional datastore, default "ds:operational"
+#
+# subscription_id - return the subscription id from the establish-subscription reply
+#
+# push_updates - yield (subscription id, content XML) for each update in a notification
+#   push-update yields the datastore-contents, push-change-update yields the value of each yang-patch edit
+#   Edits without a value, e.g. delete, are not returned
+#
+#############################################################################
+SUBSCRIBED_NOTIFICATIONS_NS = "urn:ietf:params:xml:ns:yang:ietf-subscribed-notifications"
+YANG_PUSH_NS = "urn:ietf:params:xml:ns:yang:ietf-yang-push"
+
+def yang_push_subscription(entry):
+    rpc = etree.Element("{%s}establish-subscription" % SUBSCRIBED_NOTIFICATIONS_NS,
+                        nsmap={None: SUBSCRIBED_NOTIFICATIONS_NS, "yp": YANG_PUSH_NS})
+    datastore = etree.SubElement(rpc, "{%s}datastore" % YANG_PUSH_NS, nsmap={"ds": "urn:ietf:params:xml:ns:yang:ietf-datastores"})
+    datastore.text = entry.get("datastore", "ds:operational")
+    if "xpath" in entry:
+        etree.SubElement(rpc, "{%s}datastore-xpath-filter" % YANG_PUSH_NS).text = str(entry["xpath"])
+    else:
+        subtree = etree.SubElement(rpc, "{%s}datastore-subtree-filter" % YANG_PUSH_NS)
+        for element in filter_elements(entry["path"]):
+            subtree.append(element)
+    if entry.get("on_change", False):
+        on_change = etree.SubElement(rpc, "{%s}on-change" % YANG_PUSH_NS)
+        etree.SubElement(on_change, "{%s}dampening-period" % YANG_PUSH_NS).text = str(entry.get("dampening_period", 0))
+    else:
+        periodic = etree.SubElement(rpc, "{%s}periodic" % YANG_PUSH_NS)
+        etree.SubElement(periodic, "{%s}period" % YANG_PUSH_NS).text = str(entry.get("period", 1000))
+    return etree.tostring(rpc, encoding="unicode")
+
+def subscription_id(reply):
+    if isinstance(reply, str):
+        reply = reply.encode("utf-8")
+    for element in etree.fromstring(reply).iter("{%s}id" % SUBSCRIBED_NOTIFICATIONS_NS):
+        return element.text.strip()
+    raise ValueError("establish-subscription reply has no subscription id")
+
+def push_updates(notification):
+    if isinstance(notification, str):
+        notification = notification.encode("utf-8")
+    root = etree.fromstring(notification)
+    for update in root.iter("{%s}push-update" % YANG_PUSH_NS):
+        contents = update.find("{%s}datastore-contents" % YANG_PUSH_NS)
+        if contents is not None:
+            yield update.findtext("{%s}id" % YANG_PUSH_NS).strip(), etree.tostring(contents)
+    for update in root.iter("{%s}push-change-update" % YANG_PUSH_NS):
+        for value in update.iter("{*}value"):
+            yield update.findtext("{%s}id" % YANG_PUSH_NS).strip(), etree.tostring(value)
+
+##############################################################################
+#
+# TriggerMatcher - syslog_triggers or notification_triggers compiled when ddr-facts is loaded
+#
+# triggers - trigger entries, element 0 of each entry is the list of strings that must all be found in a message
+# regex_fields - positions in element 3 of each entry that contain a regular expression
+#
+# match returns the indexes of every trigger with all strings found in the message, in ddr-facts order
+# A trigger with no strings matches every message
+#
+# All of the strings in all of the triggers are compiled into one alternation regex.  Most messages
+# do not contain any trigger string and are rejected by one search of the regex.  A message that
+# contains a trigger string is tested with substring checks for each trigger when there are fewer
+# than automaton_triggers triggers, otherwise the strings are found in one walk of an Aho-Corasick
+# automaton.  The automaton walk costs more than the substring checks below about 25 triggers
+#
+# regex returns the compiled regular expression for a trigger and raises the compile error
+# for a regular expression that is not valid when the trigger is used
+#
+#############################################################################
+class TriggerMatcher():
+    automaton_triggers = 25
+
+    def __init__(self, triggers, regex_fields=()):
+        self.triggers = triggers
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        self.required = []
+        self.strings = []
+        self.pattern_triggers = []
+        self.always = []
+        patterns = {}
+        for index, trigger in enumerate(triggers):
+            strings = list(dict.fromkeys(str(val) for val in trigger[0]))
+            self.strings.append(strings)
+            self.required.append(len(strings))
+            if len(strings) == 0:
+                self.always.append(index)
+            for val in strings:
+                if val not in patterns:
+                    patterns[val] = len(patterns)
+                    self.pattern_triggers.append([])
+                    self.add_pattern(val, patterns[val])
+                self.pattern_triggers[patterns[val]].append(index)
+        self.build_fail()
+        self.search = None
+        if patterns:
+            self.search = re.compile("|".join(map(re.escape, sorted(patterns, key=len, reverse=True)))).search
+        self.regexes = []
+        for trigger in triggers:
+            compiled = {}
+            for field in regex_fields:
+                try:
+                    compiled[field] = re.compile(str(trigger[3][field]))
+                except (IndexError, KeyError, TypeError):
+                    pass
+                except re.error as e:
+                    compiled[field] = e
+            self.regexes.append(compiled)
+
+    def add_pattern(self, val, pattern):
+        state = 0
+        for char in val:
+            if char not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[state][char] = len(self.goto) - 1
+            state = self.goto[state][char]
+        self.output[state].append(pattern)
+    #
+    # Breadth first walk setting the failure state of each node to the longest proper suffix
+    # that is also in the automaton and merging the output of the failure state
+    #
+    def build_fail(self):
+        level = list(self.goto[0].values())
+        while level != []:
+            next_level = []
+            for state in level:
+                for char, child in self.goto[state].items():
+                    fail = self.fail[state]
+                    while fail != 0 and char not in self.goto[fail]:
+                        fail = self.fail[fail]
+                    if state != 0:
+                        self.fail[child] = self.goto[fail].get(char, 0)
+                    self.output[child] = self.output[child] + self.output[self.fail[child]]
+                    next_level.append(child)
+            level = next_level
+
+    def found(self, message):
+        goto = self.goto
+        fail = self.fail
+        output = self.output
+        found = set()
+        state = 0
+        for char in str(message):
+            while state != 0 and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+    def match(self, message):
+        message = str(message)
+        if self.search is None or self.search(message) is None:
+            return list(self.always)
+        if len(self.triggers) < self.automaton_triggers:
+            return [index for index, strings in enumerate(self.strings) if all(val in message for val in strings)]
+        counts = {}
+        for pattern in self.found(message):
+            for index in self.pattern_triggers[pattern]:
+                counts[index] = counts.get(index, 0) + 1
+        matched = [index for index, count in counts.items() if count == self.required[index]]
+        return sorted(matched + self.always)
+
+    def regex(self, index, field):
+        compiled = self.regexes[index][field]
+        if isinstance(compiled, re.error):
+            raise compiled
+        return compiled
+
+##############################################################################
+#
+# parse_syslog_5424 - parse the header and structured data of an RFC5424 syslog message
+#
+# Returns None if the message is not an RFC5424 message, otherwise a dictionary:
+#   {"pri", "facility", "severity", "version", "timestamp", "hostname", "app-name", "procid", "msgid",
+#    "structured-data": {sd-id: {param-name: param-value}}, "msg"}
+# Header fields with the NILVALUE '-' are None
+#
+#############################################################################
+SYSLOG_5424_HEADER = re.compile(r'<(\d{1,3})>([1-9]\d?) (\S+) (\S+) (\S+) (\S+) (\S+) ')
+SYSLOG_5424_SD_ID = re.compile(r'[^= \]"]+')
+SYSLOG_5424_PARAM = re.compile(r' ([^= \]"]+)="((?:[^"\\]|\\.)*)"')
+SYSLOG_5424_ESCAPE = re.compile(r'\\(["\\\]])')
+
+def parse_syslog_5424(message):
+    header = SYSLOG_5424_HEADER.match(message)
+    if header is None:
+        return None
+    pri = int(header.group(1))
+    fields = [None if value == "-" else value for value in header.groups()[2:]]
+    result = {"pri": pri, "facility": pri // 8, "severity": pri % 8, "version": int(header.group(2)),
+              "timestamp": fields[0], "hostname": fields[1], "app-name": fields[2], "procid": fields[3], "msgid": fields[4],
+              "structured-data": {}, "msg": ""}
+    position = header.end()
+    if message.startswith("-", position):
+        position += 1
+    elif message.startswith("[", position):
+        while message.startswith("[", position):
+            sd_id = SYSLOG_5424_SD_ID.match(message, position + 1)
+            if sd_id is None:
+                return None
+            params = {}
+            position = sd_id.end()
+            param = SYSLOG_5424_PARAM.match(message, position)
+            while param is not None:
+                params[param.group(1)] = SYSLOG_5424_ESCAPE.sub(r"\1", param.group(2))
+                position = param.end()
+                param = SYSLOG_5424_PARAM.match(message, position)
+            if not message.startswith("]", position):
+                return None
+            result["structured-data"][sd_id.group(0)] = params
+            position += 1
+    else:
+        return None
+    if message.startswith(" ", position):
+        result["msg"] = message[position + 1:].lstrip("\ufeff")
+    return result
+
+##############################################################################
+#
+# syslog_frames - remove the complete RFC6587 syslog frames from a TCP stream buffer
+#
+# buffer - bytearray containing the data received on the connection, the frames are removed from the buffer
+# max_message - maximum frame length in bytes
+#
+# Frames starting with a digit use octet-counting framing "MSG-LEN SP SYSLOG-MSG", other frames
+# use non-transparent framing and end with LF.  CR and NUL before the LF are removed and empty frames are skipped
+# Returns the list of frames.  Raises ValueError when a frame is longer than max_message or the length is not valid
+#
+#############################################################################
+def syslog_frames(buffer, max_message=65536):
+    frames = []
+    position = 0
+    end = len(buffer)
+    while position < end:
+        if 48 <= buffer[position] <= 57:
+            space = buffer.find(b" ", position, position + 11)
+            if space == -1:
+                if end - position > 10:
+                    raise ValueError("syslog frame length not valid: " + repr(bytes(buffer[position:position + 11])))
+                break
+            length = bytes(buffer[position:space])
+            if not length.isdigit() or int(length) > max_message:
+                raise ValueError("syslog frame length not valid: " + repr(length))
+            frame_end = space + 1 + int(length)
+            if frame_end > end:
+                break
+            frames.append(bytes(buffer[space + 1:frame_end]))
+            position = frame_end
+        else:
+            newline = buffer.find(b"\n", position)
+            if newline == -1:
+                if end - position > max_message:
+                    raise ValueError("syslog frame longer than " + str(max_message) + " bytes")
+                break
+            frame = bytes(buffer[position:newline]).rstrip(b"\r\x00")
+            if frame != b"":
+                frames.append(frame)
+            position = newline + 1
+    del buffer[:position]
+    return frames
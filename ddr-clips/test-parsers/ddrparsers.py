@@ -1,21 +1,266 @@
 import re
 import sys
+import collections
+import concurrent.futures
 from lxml import etree
 import xml.dom.minidom
 import xml.etree.ElementTree as ET
 
+#
+# Return the parser instance for the parser class name in a ddr-facts definition
+# Parsers do not keep state between calls so one instance of each class is created and reused
+#
+PARSER_INSTANCES = {}
+
 def genie_str_to_class(classname):
+    try:
+        return PARSER_INSTANCES[classname]
+    except KeyError:
+        pass
     try:
         module = getattr(sys.modules[__name__], classname)
-        return module()
+        parser = module()
     except Exception as e:
         return None
+    PARSER_INSTANCES[classname] = parser
+    return parser
+
+# ================================
+# Version registry for the regular expressions used by the parsers
+#
+# Each parser class declares the pattern sets for the NX-OS versions it supports in a class
+# attribute so the patterns are compiled once when the module is imported
+#
+#    patterns = VersionPatterns({('9.3(6)', '9.3(12)'): PatternSet('9', p1=r'...'),
+#                                ('10.4(1)',): PatternSet('10', p1=r'...')})
+#
+# The parser selects the pattern set for the pversion passed to parse with a dictionary lookup.
+# The PatternSet format selects the processing used for the lines matched by the patterns.
+# A version that is not listed uses the closest earlier listed release in the same major.minor
+# release train, e.g. 9.3(8) uses 9.3(6), or the first listed release in the train if the version
+# is earlier.  The result of the lookup is saved so each version is only resolved once.
+# ================================
+class PatternSet():
+    def __init__(self, format, **patterns):
+        self.format = format
+        for name, pattern in patterns.items():
+            setattr(self, name, re.compile(pattern))
+
+NXOS_VERSION = re.compile(r'(\d+)\.(\d+)(?:\((\d+)\))?')
+
+def version_key(pversion):
+    m = NXOS_VERSION.match(str(pversion))
+    if m is None:
+        return None
+    return int(m.group(1)), int(m.group(2)), int(m.group(3) or 0)
+
+class VersionPatterns():
+    def __init__(self, versions):
+        self.versions = {}
+        for version_list, pattern_set in versions.items():
+            for version in version_list:
+                self.versions[version] = pattern_set
+        self.releases = sorted((version_key(version), version) for version in self.versions)
+    #
+    # Return the PatternSet for pversion or None if the release train is not supported
+    #
+    def get(self, pversion):
+        try:
+            return self.versions[pversion]
+        except KeyError:
+            pass
+        key = version_key(pversion)
+        pattern_set = None
+        if key is not None:
+            for release_key, release in self.releases:
+                if release_key[:2] == key[:2] and (pattern_set is None or release_key <= key):
+                    pattern_set = self.versions[release]
+        self.versions[pversion] = pattern_set
+        return pattern_set
+
+# ================================
+# Base class for the parsers in this file
+#
+# parse_iter reads the show command output one line at a time from any iterable
+# of lines, e.g. a list, an open file or lines read from an SSH session, and yields
+# a (dictionary name, key, entry) record as soon as each entry is complete
+#
+#    ('nve_peer_l2vpn', '204.1.1.1', {'nve-peer': '204.1.1.1', 'producer': 'BGP', 'type': 'IMET', 'vni': 1002})
+#
+# parse collects the records into the nested dictionary used by ddr-facts definitions
+#
+#    {'nve_peer_l2vpn': {'204.1.1.1': {'nve-peer': '204.1.1.1', 'producer': 'BGP', 'type': 'IMET', 'vni': 1002}}}
+# ================================
+class StreamingParser():
+    patterns = None
+    newest_first = False
+
+    def parse(self, output=None, pversion=None, debug=None):
+        return records_to_dict(self.parse_iter(output.splitlines(), pversion, debug))
+
+    def parse_iter(self, lines, pversion=None, debug=None):
+        return iter(())
+    #
+    # Return the PatternSet from the parser patterns for pversion
+    # None is returned if pversion is None or the version is not supported
+    #
+    def version_patterns(self, pversion):
+        if pversion == None:
+            return None
+        patterns = self.patterns.get(pversion)
+        if patterns is None:
+            print("%%%% DDR-error: " + type(self).__name__ + ": Unsupported Version: " + str(pversion))
+        return patterns
+
+def records_to_dict(records):
+    parsed_dict = {}
+    for name, key, entry in records:
+        parsed_dict.setdefault(name, {}).setdefault(key, {}).update(entry)
+    return parsed_dict
+
+# ================================
+# Event-history watermarks
+#
+# The event-history parsers set newest_first because NX-OS displays the event-history buffer with the
+# newest event first.  The caller keeps the newest event time seen for each device and event-history
+# command and passes it to records_newer_than.  The records are read until an event that is not newer than
+# the watermark is found so only the lines for new events are parsed.
+#
+# event_time_key converts the timestamp formats used by the NX-OS releases to a string that sorts in time order
+#
+#    2023 Feb 13 17:54:49.625302            -> '2023-02-13 17:54:49.625302000'
+#    2023-03-30T14:07:01.292307             -> '2023-03-30 14:07:01.292307000'
+#
+# None is returned for a timestamp that is not recognized
+# ================================
+EVENT_TIME = re.compile(r'(\d{4})[-_ ](\w{3}|\d{2})[-_ ](\d{2})[T_ ](\d{2}:\d{2}:\d{2})(?:\.(\d*))?')
+EVENT_MONTHS = {'Jan': '01', 'Feb': '02', 'Mar': '03', 'Apr': '04', 'May': '05', 'Jun': '06',
+                'Jul': '07', 'Aug': '08', 'Sep': '09', 'Oct': '10', 'Nov': '11', 'Dec': '12'}
+
+def event_time_key(timestamp):
+    m = EVENT_TIME.match(timestamp.strip())
+    if m is None:
+        return None
+    year, month, day, time, fraction = m.groups()
+    month = EVENT_MONTHS.get(month, month)
+    return year + '-' + month + '-' + day + ' ' + time + '.' + (fraction or '').ljust(9, '0')[:9]
+#
+# Yield the records from a newest_first parser that are newer than watermark
+# marks[key] is updated with the newest event time key read so the watermark is kept when the
+# caller stops reading before the end of the records
+#
+def records_newer_than(records, marks, key):
+    watermark = marks.get(key)
+    for record in records:
+        time_key = event_time_key(record[1])
+        if time_key is not None:
+            if watermark is not None and time_key <= watermark:
+                return
+            if marks.get(key) is None or time_key > marks[key]:
+                marks[key] = time_key
+        yield record
+
+# ================================
+# FixedWidthTable - parse the rows of the fixed width tables in NX-OS show command output
+#
+# The tables have a header line followed by a ruler line of dashes for each column
+#
+#    Topology    Mac Address    Prod   Flags         Seq No     Next-Hops
+#    ----------- -------------- ------ ------------- ---------- ---------------------------------------
+#    1001        0001.abba.edda BGP    Stt,SplRcv    0          204.1.1.1 (Label: 1001)
+#
+# The column offsets are found from the ruler line once for each table section and each
+# row is sliced at the offsets.  A column extends to the start of the next column so values
+# wider than the ruler are kept.  A blank line ends a table section and a header line starts
+# a new section so output with several tables is parsed.  A row with a value that the column
+# converter does not accept is reported and not returned.
+#
+# The ruler of some tables is narrower than the column values, e.g. the Flags ruler of
+# 'show l2route evpn mac-ip all' is narrower than "Stt,SplRcv,Ps".  The columns from split_from
+# to the last column are read by splitting the rest of the row on whitespace instead of at
+# the ruler offsets.  The last column is the remaining text of the row.
+#
+# header - compiled regular expression matching the stripped header line
+# columns - (name, converter) for each column in the ruler line
+#           The converter is called with the column text including the padding spaces.
+#           int, float and first_word ignore the padding, str columns are stripped.
+#           Columns with the name None are not converted or returned
+# split_from - name of the first column read by splitting on whitespace, None uses the ruler offsets for all columns
+#
+# rows() yields a tuple with the converted values of the named columns for each row
+# ================================
+class FixedWidthTable():
+    def __init__(self, header, columns, split_from=None):
+        self.header = header
+        self.columns = columns
+        self.split_from = split_from
+        self.names = tuple(name for name, converter in columns if name is not None)
+    #
+    # Return ([(converter, start, end)], split) for the named columns using the column offsets in a
+    # ruler line or None if the line is not a ruler line for the table
+    # split is None or (start, [converter]) for the columns read by splitting on whitespace
+    #
+    def ruler_slices(self, line):
+        starts = [m.start() for m in RULER_COLUMN.finditer(line)]
+        if len(starts) < len(self.columns) or line.replace('-', '').strip() != '':
+            return None
+        starts = starts[:len(self.columns)] + [None]
+        slices = []
+        split = None
+        for i, (name, converter) in enumerate(self.columns):
+            if name is not None and name == self.split_from:
+                split = (starts[i], [str.strip if column[1] is str else column[1] for column in self.columns[i:]])
+                break
+            if converter is str:
+                converter = str.strip
+            if name is None:
+                continue
+            slices.append((converter, starts[i], starts[i + 1]))
+        return slices, split
+
+    def convert(self, line, slices, split):
+        row = [converter(line[start:end]) for converter, start, end in slices]
+        if split is not None:
+            start, converters = split
+            values = line[start:].split(None, len(converters) - 1)
+            if len(values) < len(converters):
+                raise ValueError("expected " + str(len(converters)) + " values after column " + str(start))
+            row.extend(converter(value) for converter, value in zip(converters, values))
+        return tuple(row)
+
+    def rows(self, lines):
+        ruler = None
+        ruler_next = False
+        for line in lines:
+            if ruler_next:
+                ruler_next = False
+                ruler = self.ruler_slices(line.rstrip())
+                continue
+            stripped = line.strip()
+            if stripped == '':
+                ruler = None
+            elif self.header.match(stripped):
+                ruler_next = True
+            elif ruler is not None:
+                try:
+                    row = self.convert(line, *ruler)
+                except (ValueError, IndexError) as e:
+                    print("%%%% DDR-error: Table row not parsed: " + stripped + ": " + str(e))
+                    continue
+                yield row
+
+RULER_COLUMN = re.compile(r'-+')
+#
+# Column converter for the first word of a column value, e.g. "204.1.1.1" from "204.1.1.1 (Label: 1001)"
+#
+def first_word(value):
+    return value.split(None, 1)[0]
 
 # ================================
 # Parser for 'show l2route evpn mac-ip all'
 # ================================
 
-class NXShowL2RouteEvpnMacIpAll():
+class NXShowL2RouteEvpnMacIpAll(StreamingParser):
     """Parser for 'show l2route evpn mac-ip all'
 
        The response from the show command is passed as an argument
@@ -78,53 +323,32 @@ Topology    Mac Address    Host IP                                 Prod   Flags
       (host-ip "") (type "MACIP") (producer "HMM") (flags ""))
 
     """
-    def parse(self, output=None, pversion=None, debug=None):
-        out = output
-
-        # Init dictionary
-        parsed_dict = {} # Contains the parsed Python dictionary
-        af_dict = {} # Used as intermediate dictionary to build instances
-     
-        #
-        # Precompile the regular expressions used to select data from specific lines
-        # These definitions started with the genie_parser "ShowBgpL2vpnEvpn"
-        
-        p1 = re.compile(r'Topology    Mac Address    Host IP                                 Prod   Flags         Seq No     Next-Hops.*')
-        p2 = re.compile(r'^(?P<topology>\d+)\s+(?P<mac>\S+)\s+(?P<host_ip>\S+)\s+(?P<producer>\S+)\s+(?P<flags>\S+)\s+(?P<sequence>\d+)\s+(?P<peer>\S+)\s+.*')
-       
-        found_line = False  
-        found_count = 0         
-        for line in out.splitlines():
-            line = line.strip()
-            if found_line:
-                if found_count == 0:
-                    found_count = found_count + 1 # skip one line
-                    continue
-                    
-            # Look for line defined in p1 as a marker to find peers learned using BGP
-            m = p1.match(line)
-            if m:
-                # Marker line found
-                found_line = True
+    table = FixedWidthTable(re.compile(r'^Topology\s+Mac Address\s+Host IP\s+Prod\s+Flags\s+Seq No\s+Next-Hops'),
+                            [('topology', int), ('mac', str), ('host_ip', str), ('producer', str), ('flags', str), ('sequence', int), ('next_hops', str)],
+                            split_from='flags')
+    #
+    # Only rows with a remote next-hop and label, e.g. "204.1.1.1 (Label: 1001)", are returned.
+    # Locally learned rows with the next-hop "Local" are not returned
+    #
+    def parse_iter(self, lines, pversion=None, debug=None):
+        for topology, mac, host_ip, producer, flags, sequence, next_hops in self.table.rows(lines):
+            next_hops = next_hops.split()
+            if len(next_hops) < 2:
                 continue
-          
-            m = p2.match(line)
-            if m:
-                af_dict = parsed_dict.setdefault('nve_peer_mac_ip', {}).setdefault(m.groupdict()['mac'], {})
-                af_dict['peer-ip'] = str(m.groupdict()['peer'])
-                af_dict['vni'] = int(m.groupdict()['topology'])
-                af_dict['mac'] = str(m.groupdict()['mac'])
-                af_dict['host-ip'] = str(m.groupdict()['host_ip'])
-                af_dict['type'] = 'MACIP'
-                af_dict['producer'] = str(m.groupdict()['producer'])
-                af_dict['flags'] = str(m.groupdict()['flags'])
-            continue
-        return parsed_dict
+            af_dict = {}
+            af_dict['peer-ip'] = next_hops[0]
+            af_dict['vni'] = topology
+            af_dict['mac'] = mac
+            af_dict['host-ip'] = host_ip
+            af_dict['type'] = 'MACIP'
+            af_dict['producer'] = producer
+            af_dict['flags'] = flags
+            yield 'nve_peer_mac_ip', mac, af_dict
 # ================================
 # Parser for 'show l2route evpn imet all'
 # ================================
 
-class NXShowL2RouteEvpnImetAll():
+class NXShowL2RouteEvpnImetAll(StreamingParser):
     """Parser for 'show l2route evpn imet all'
       
     Sample Show Command Output:
@@ -173,52 +397,24 @@ class NXShowL2RouteEvpnImetAll():
                  (direction "internal") (path "path_sourced_internal_to_AS") (destinations 0))
 
     """
-    def parse(self, output=None, pversion=None, debug=None):
-        out = output
-        # Init dictionary
-        parsed_dict = {} # Contains the parsed Python dictionary
-        af_dict = {} # Used as intermediate dictionary to build instances
-    
-        #
-        # Precompile the regular expressions used to select data from specific lines
-        # These definitions started with the genie_parser "ShowBgpL2vpnEvpn"
-        
-        p1 = re.compile(r'^Topology ID VNI         Prod  IP Addr.*')
-        p2 = re.compile(r'^(?P<topology>\d+)\s+(?P<vni>\d+)\s+(?P<producer>\S+)\s+(?P<peer>\S+).*')
-        
-        found_line = False  
-        found_count = 0         
-        for line in out.splitlines():
-            line = line.strip()
-            if found_line:
-                if found_count == 0:
-                    found_count = found_count + 1 # skip one line
-                    continue
-                    
-            # Look for line defined in p1 as a marker to find peers learned using BGP
-            m = p1.match(line)
-            if m:
-                # Marker line found
-                found_line = True
-                continue
+    table = FixedWidthTable(re.compile(r'^Topology ID\s+VNI\s+Prod\s+IP Addr'),
+                            [('topology', int), ('vni', int), ('producer', str), ('peer', first_word), (None, None)])
+
+    def parse_iter(self, lines, pversion=None, debug=None):
+        for topology, vni, producer, peer in self.table.rows(lines):
+            af_dict = {}
+            af_dict['producer'] = producer
+            af_dict['nve-peer'] = peer
+            af_dict['vni'] = vni
+            af_dict['type'] = 'IMET'
+            yield 'nve_peer_l2vpn', peer, af_dict
 
-            m = p2.match(line)
-            if m:
-                af_dict = parsed_dict.setdefault('nve_peer_l2vpn', {}).setdefault(m.groupdict()['peer'], {})
-                af_dict['producer'] = (m.groupdict()['producer'])
-                af_dict['nve-peer'] = str(m.groupdict()['peer'])
-                af_dict['vni'] = int(m.groupdict()['vni'])
-                af_dict['type'] = 'IMET'
-                af_dict['producer'] = str(m.groupdict()['producer'])
-            continue
-
-        return parsed_dict
         
 # ================================
 # Parser for 'show l2route evpn mac all'
 # ================================
 
-class NXShowL2RouteEvpnMacAll():
+class NXShowL2RouteEvpnMacAll(StreamingParser):
     """Parser for 'show l2route evpn mac all'
 
        The response from the show command is passed as an argument
@@ -269,54 +465,134 @@ Topology    Mac Address    Prod   Flags         Seq No     Next-Hops
     (nve-peer-mac (peer-ip "5.1.1.1") (mac '0002.abba.edda') (type "MAC") 
                  (topology 1001) (producer "BGP"))
     """
-    def parse(self, output=None, pversion=None, debug=None):
-        out = output
-
-        # Init dictionary
-        parsed_dict = {} # Contains the parsed Python dictionary
-        af_dict = {} # Used as intermediate dictionary to build instances
-     
-        #
-        # Precompile the regular expressions used to select data from specific lines
-        # These definitions started with the genie_parser "ShowBgpL2vpnEvpn"
-        
-        p1 = re.compile(r'Topology    Mac Address    Prod   Flags         Seq No     Next-Hops.*')
-        p2 = re.compile(r'(?P<topology>\d+)\s+(?P<mac>\S+)\s+(?P<producer>\S+)\s+(?P<flags>\S+)\s+(?P<sequence>\d+)\s+(?P<peer_ip>\S+).*')
-       
-        found_line = False  
-        found_count = 0         
-        for line in out.splitlines():
-            line = line.strip()
-            if found_line:
-                if found_count == 0:
-                    found_count = found_count + 1 # skip one line
-                    continue
-                    
-            # Look for line defined in p1 as a marker to find peers learned using BGP
-            m = p1.match(line)
-            if m:
-                # Marker line found
-                found_line = True
-                continue
+    table = FixedWidthTable(re.compile(r'^Topology\s+Mac Address\s+Prod\s+Flags\s+Seq No\s+Next-Hops'),
+                            [('topology', int), ('mac', str), ('producer', str), ('flags', str), ('sequence', int), ('peer', first_word)],
+                            split_from='flags')
+
+    def parse_iter(self, lines, pversion=None, debug=None):
+        for topology, mac, producer, flags, sequence, peer in self.table.rows(lines):
+            af_dict = {}
+            af_dict['vni'] = topology
+            af_dict['peer-ip'] = peer
+            af_dict['type'] = 'MAC'
+            af_dict['producer'] = producer
+            af_dict['flags'] = flags
+            af_dict['mac'] = mac
+            yield 'nve_peer_mac', mac, af_dict
 
-            # Check for peers learned using BGP
-           
-            m = p2.match(line)
+# ================================
+# BGP EVPN route parsing for 'show bgp l2vpn evpn' output
+#
+# The route output has a block for each path of each route.  The fields for a route are
+# read from the lines before the "Path type:" line of the path and a record is generated
+# when the "Path type:" line is found.  The L2VNI from the last "Route Distinguisher:" line
+# is used for the following routes, other fields only apply to the next path.
+#
+# bgp_evpn_records groups the show command lines into blocks that end with a "Path type:" line
+# and scans each block once with re.finditer for the keywords that start the route fields.
+# Lines without a keyword are skipped by the regular expression engine and the field values
+# are taken from the remainder of each keyword line.  The blocks are independent except for
+# the L2VNI so blocks can be parsed by a pool of worker processes when workers is greater than 1.
+# The records are generated in show command order.
+# ================================
+BGP_EVPN_KEYWORDS = re.compile(r'(BGP routing table entry for |Route Distinguisher: |Imported from |Imported to |Path type: )([^\n]*)')
+BGP_EVPN_ROUTE = re.compile(r'(.*?), version \d+')
+BGP_EVPN_RD = re.compile(r'(\S+).*\(L2VNI (\d+)')
+BGP_EVPN_DEST_COUNT = re.compile(r'(\d+)')
+
+def bgp_evpn_records(lines, route_type, workers=1, block_lines=2000):
+    blocks = bgp_evpn_blocks(lines, block_lines)
+    if workers > 1:
+        results = bgp_evpn_pool_records(blocks, route_type, workers)
+    else:
+        results = (bgp_evpn_block_records(block, route_type) for block in blocks)
+    vni = 0
+    for records in results:
+        for route_distinguisher, af_dict in records:
+            if af_dict['vni'] is None:
+                af_dict['vni'] = vni
+            else:
+                vni = af_dict['vni']
+            yield 'route_distinguisher', route_distinguisher, af_dict
+#
+# Join the lines into blocks of about block_lines lines that end with a "Path type:" line
+#
+def bgp_evpn_blocks(lines, block_lines):
+    block = []
+    for line in lines:
+        block.append(line)
+        if len(block) >= block_lines and 'Path type:' in line:
+            m = BGP_EVPN_KEYWORDS.search(line)
+            if m.group(1) == 'Path type: ' and ',' in m.group(2):
+                yield '\n'.join(block)
+                block = []
+    if block:
+        yield '\n'.join(block)
+#
+# Return the (route distinguisher, route dictionary) records for the paths in one block
+# 'vni' is None for paths before the first "Route Distinguisher:" line in the block
+#
+def bgp_evpn_block_records(block, route_type):
+    records = []
+    route = ""
+    route_distinguisher = ""
+    vni = None
+    imported_from = ""
+    dest_count = 0
+    for keyword, value in BGP_EVPN_KEYWORDS.findall(block):
+        if keyword == 'Path type: ':
+            # Path type: internal, path is valid, is best path, no labeled nexthop
+            if ',' not in value:
+                continue
+            af_dict = {}
+            af_dict['route'] = route
+            af_dict['vni'] = vni
+            af_dict['imported'] = imported_from
+            af_dict['path_type'] = value.split(',', 1)[0]
+            af_dict['destinations'] = dest_count
+            af_dict['route_type'] = route_type
+            records.append((route_distinguisher, af_dict))
+            route = ""
+            route_distinguisher = ""
+            imported_from = ""
+            dest_count = 0
+        elif keyword == 'Imported from ':
+            # Imported from 204.1.1.1:33769:[3]:[0]:[32]:[204.1.1.1]/88
+            imported_from = value.strip()
+        elif keyword == 'BGP routing table entry for ':
+            # BGP routing table entry for [3]:[0]:[32]:[204.1.1.1]/88, version 18
+            m = BGP_EVPN_ROUTE.match(value)
+            if m:
+                route = m.group(1)
+        elif keyword == 'Route Distinguisher: ':
+            # Route Distinguisher: 201.1.1.1:33769    (L2VNI 1002)
+            m = BGP_EVPN_RD.match(value)
+            if m:
+                route_distinguisher = m.group(1)
+                vni = int(m.group(2))
+        else:
+            # Imported to 1 destination(s)
+            m = BGP_EVPN_DEST_COUNT.match(value)
             if m:
-                af_dict = parsed_dict.setdefault('nve_peer_mac', {}).setdefault(m.groupdict()['mac'], {})
-                af_dict['vni'] = int(m.groupdict()['topology'])
-                af_dict['peer-ip'] = str(m.groupdict()['peer_ip'])
-                af_dict['type'] = 'MAC'
-                af_dict['producer'] = str(m.groupdict()['producer'])
-                af_dict['flags'] = str(m.groupdict()['flags'])
-                af_dict['mac'] = str(m.groupdict()['mac'])
-            continue
-        return parsed_dict
+                dest_count = int(m.group(1))
+    return records
+#
+# Parse the blocks in a pool of worker processes keeping at most 2 blocks per worker in progress
+#
+def bgp_evpn_pool_records(blocks, route_type, workers):
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        for block in blocks:
+            pending.append(executor.submit(bgp_evpn_block_records, block, route_type))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
 
 # ================================
 # Parser for 'show bgp l2vpn evpn route-type 3
 # ================================
-class NXShowBgpL2vpnEvpnRT3():
+class NXShowBgpL2vpnEvpnRT3(StreamingParser):
     """Parser for 'show bgp l2vpn evpn 204.1.1.1'
        Where 204.1.1.1 is the evpn peer identifier
 
@@ -413,118 +689,16 @@ class NXShowBgpL2vpnEvpnRT3():
                  (direction "internal") (path "path_sourced_internal_to_AS") (destinations 0))
 
     """
-    def parse(self, output=None, pversion=None, debug=None):
-        out = output
-
-        # Init dictionary
-        parsed_dict = {} # Contains the parsed Python dictionary
-        af_dict = {} # Used as intermediate dictionary to build instances
-
-        # Initialize variables reused in parser to default values that are used
-        # when no data is included in the show response for the data item
-        # The ddr-facts processing for the parser output expects that there will\
-        # be a dictionary entry for every  field in the FACT definition
-        
-        vrf_name = 'default'
-        route = ""
-        vni = 0
-        route_distinguisher = ""
-        imported_from = ""
-        dest_count = 0
-        path_type = ""
-        
-        #
-        # Precompile the regular expressions used to select data from specific lines
-        # These definitions started with the genie_parser "ShowBgpL2vpnEvpn"
-        
-        p1 = re.compile(r'^\s*BGP +routing +table +information +for +VRF'
-                            ' +(?P<vrf_name>\S+), +address +family'
-                            ' +(?P<address_family>[\w\s\-\_]+)$')
-        p2 = re.compile(r'^BGP routing table entry for (?P<route>.*?), version (?P<version>\d+)') 
-        p3 = re.compile(r'.*Route Distinguisher: (?P<route_distinguisher>(\S+)).*\(L2VNI (?P<vni>\d+).*')
-        p4 = re.compile(r'.*Imported from (?P<imported>.*)')
-        p5 = re.compile(r'.*Imported to (?P<dest_count>\d+)')
-        p6 = re.compile(r'.*Path type: (?P<path_type>.*?),') 
-        p7 = re.compile(r'.*AS-Path: .*?, (?P<as_path>.*)') 
-
-        # Iterate through each line in the show command output to select required fields
-        # Fields are collected by matching content in multiple show output lines
-        # When all required fields are available, a parser sub-dictionary is added to
-        # parser_dict {}  
-           
-        for line in out.splitlines():
-            line = line.strip()
-            # BGP routing table information for VRF default, address family L2VPN EVPN
-            m = p1.match(line)
-            if m:
-                # Get the vrf_name from the show command
-                vrf_name = m.groupdict()['vrf_name']
-                continue
-
-            # BGP routing table entry for [3]:[0]:[32]:[204.1.1.1]/88
-            m = p2.match(line)
-            if m:
-                route = m.groupdict()['route']
-                continue
-
-            # Route Distinguisher: 201.1.1.1:33769
-            m = p3.match(line)
-            if m:
-                route_distinguisher = m.groupdict()['route_distinguisher']
-                vni = int(m.groupdict()['vni'])
-                continue
-
-            # Imported from 204.1.1.1:33769:[3]:[0]:[32]:[204.1.1.1]/88
-            # If the RD "Path Type" section includes "Imported from" generate a dictionary entry
-            m = p4.match(line)
-            if m:
-                imported_from = m.groupdict()['imported']
-                continue               
-
-            # Imported to 1 destination(s)
-            m = p5.match(line)
-            if m:
-                dest_count = int(m.groupdict()['dest_count'])
-                continue
+    workers = 1
 
-            # Path type: internal (from routing protocol)       Path type: local (generated by this peer device)
-            # If the "Path Type" is not local (this device is a receiver) generate dictionary entry
-            # The AS-Path is the last field that needs to be read to complete the FACT
-            # af_dict is used to create an instance of the 'route_distinquisher' and the
-            # required members are added to the dictionary using the update method.
-            #
-            # After the parsed_dict is updated, the variables used to collect the fields from
-            # the show command are re-initialized
-
-            # {'route_distinguisher': {'201.1.1.1:33769': {'route': '[3]:[0]:[32]:[204.1.1.1]/88',
-            #  'imported': '204.1.1.1:33769:[3]:[0]:[32]:[204.1.1.1]/88',
-            #  'path-type': 'internal', 
-            #  'destinations': 0}}}
-            
-            m = p6.match(line)
-            if m:
-                path = m.groupdict()['path_type']
-                af_dict = parsed_dict.setdefault('route_distinguisher', {}).setdefault(route_distinguisher, {})
-                af_dict.update({'route': route})
-                af_dict.update({'vni': vni})
-                af_dict.update({'imported': imported_from})
-                af_dict.update({'path_type': path})
-                af_dict.update({'destinations': dest_count})
-                af_dict.update({'route_type': 3})               
-                route = ""
-                route_distinguisher = ""
-                imported_from = ""
-                dest_count = 0
-                direction = ""
-                path = ""
-                continue
+    def parse_iter(self, lines, pversion=None, debug=None):
+        return bgp_evpn_records(lines, 3, self.workers)
 
-        return parsed_dict
                         
 # ================================
 # Parser for 'show bgp l2vpn evpn route-type 2
 # ================================
-class NXShowBgpL2vpnEvpnRT2():
+class NXShowBgpL2vpnEvpnRT2(StreamingParser):
     """Parser for 'show bgp l2vpn evpn route-type 2'
 
        The response from the show command is passed as an argument
@@ -600,30 +774,17 @@ class NXShowBgpL2vpnEvpnRT2():
                  (direction "internal") (path "path_sourced_internal_to_AS") (destinations 0))
 
     """
-    def parse(self, output=None, pversion=None, debug=None):
-        out = output
-
-        # Init dictionary
-        parsed_dict = {} # Contains the parsed Python dictionary
-        af_dict = {} # Used as intermediate dictionary to build instances
+    workers = 1
+    patterns = VersionPatterns({
+        ('9.3(6)', '9.3(12)'): PatternSet('9'),
+        ('10.2(1)', '10.4(1)'): PatternSet('10')})
 
-        # Initialize variables reused in parser to default values that are used
-        # when no data is included in the show response for the data item
-        # The ddr-facts processing for the parser output expects that there will\
-        # be a dictionary entry for every  field in the FACT definition
-        
-        vrf_name = 'default'
-        route = ""
-        vni = 0
-        route_distinguisher = ""
-        imported_from = ""
-        dest_count = 0
-        path_type = ""
+    def parse_iter(self, lines, pversion=None, debug=None):
 
     # Select parser logic based on the NX-OS version
-        parsed_dict = {}
-        if pversion == None:
-            return parsed_dict
+        patterns = self.version_patterns(pversion)
+        if patterns == None:
+            return iter(())
 
     # NX-OS version '9'
     #   Route Distinguisher: 204.1.1.1:33768    (L2VNI 1001)
@@ -642,84 +803,9 @@ class NXShowBgpL2vpnEvpnRT2():
     #     Path-id 1 advertised to peers:
     #       204.1.1.2      
                 
-        elif pversion in ['9.3(6)', '9.3(12)']:     
-        #
-        # Precompile the regular expressions used to select data from specific lines
-        # These definitions started with the genie_parser "ShowBgpL2vpnEvpn"
-        
-            p2 = re.compile(r'.*Route Distinguisher: (?P<route_distinguisher>(\S+)).*\(L2VNI (?P<vni>\d+).*')
-            p3 = re.compile(r'^BGP routing table entry for (?P<route>.*?), version (?P<version>\d+)') 
-            p4 = re.compile(r'.*Imported from (?P<imported>.*)')
-            p5 = re.compile(r'.*Imported to (?P<dest_count>\d+)')
-            p6 = re.compile(r'.*Path type: (?P<path_type>.*?),') 
-            p7 = re.compile(r'.*AS-Path: .*?, (?P<as_path>.*)') 
-
-        # Iterate through each line in the show command output to select required fields
-        # Fields are collected by matching content in multiple show output lines
-        # When all required fields are available, a parser sub-dictionary is added to
-        # parser_dict {}  
-           
-            for line in out.splitlines():
-                line = line.strip()
-                # Route Distinguisher: 201.1.1.1:33769
-                m = p2.match(line)
-                if m:
-                    route_distinguisher = m.groupdict()['route_distinguisher']
-                    vni = int(m.groupdict()['vni'])
-                    continue
+        elif patterns.format == '9':
+            return bgp_evpn_records(lines, 2, self.workers)
 
-                # BGP routing table entry for [3]:[0]:[32]:[204.1.1.1]/88
-                m = p3.match(line)
-                if m:
-                    route = m.groupdict()['route']
-                    continue
-
-                # Imported from 204.1.1.1:33769:[3]:[0]:[32]:[204.1.1.1]/88
-                # If the RD "Path Type" section includes "Imported from" generate a dictionary entry
-                m = p4.match(line)
-                if m:
-                    imported_from = m.groupdict()['imported']
-                    continue               
-
-                # Imported to 1 destination(s)
-                m = p5.match(line)
-                if m:
-                    dest_count = int(m.groupdict()['dest_count'])
-                    continue
-
-            # Path type: internal (from routing protocol)       Path type: local (generated by this peer device)
-            # If the "Path Type" is not local (this device is a receiver) generate dictionary entry
-            # The AS-Path is the last field that needs to be read to complete the FACT
-            # af_dict is used to create an instance of the 'route_distinquisher' and the
-            # required members are added to the dictionary using the update method.
-            #
-            # After the parsed_dict is updated, the variables used to collect the fields from
-            # the show command are re-initialized
-
-            # {'route_distinguisher': {'201.1.1.1:33769': {'route': '[3]:[0]:[32]:[204.1.1.1]/88',
-            #  'imported': '204.1.1.1:33769:[3]:[0]:[32]:[204.1.1.1]/88',
-            #  'path-type': 'internal', 
-            #  'destinations': 0}}}
-            
-                m = p6.match(line)
-                if m:
-                    path = m.groupdict()['path_type']
-                    af_dict = parsed_dict.setdefault('route_distinguisher', {}).setdefault(route_distinguisher, {})
-                    af_dict.update({'route': route})
-                    af_dict.update({'vni': vni})
-                    af_dict.update({'imported': imported_from})
-                    af_dict.update({'path_type': path})
-                    af_dict.update({'destinations': dest_count})
-                    af_dict.update({'route_type': 2})               
-                    route = ""
-                    route_distinguisher = ""
-                    imported_from = ""
-                    dest_count = 0
-                    direction = ""
-                    path = ""
-                    continue
-            return parsed_dict
-#PVH
     # NX-OS version 10.2(1) or 10.4(1)
     #   Route Distinguisher: 201.1.1.1:33768    (L2VNI 1001)
     #   BGP routing table entry for [2]:[0]:[0]:[48]:[0001.abba.edda]:[32]:[5.1.1.1]/272, version 171
@@ -739,104 +825,26 @@ class NXShowBgpL2vpnEvpnRT2():
     #   
     #     Path-id 1 not advertised to any peer
 
-        elif pversion in ['10.2(1)', '10.4(1)']:
-        #
-        # Precompile the regular expressions used to select data from specific lines
-        # These definitions started with the genie_parser "ShowBgpL2vpnEvpn"
-        
-            p1 = re.compile(r'^\s*BGP +routing +table +information +for +VRF'
-                            ' +(?P<vrf_name>\S+), +address +family'
-                            ' +(?P<address_family>[\w\s\-\_]+)$')
-            p2 = re.compile(r'^BGP routing table entry for (?P<route>.*?), version (?P<version>\d+)') 
-            p3 = re.compile(r'.*Route Distinguisher: (?P<route_distinguisher>(\S+)).*\(L2VNI (?P<vni>\d+).*')
-            p4 = re.compile(r'.*Imported from (?P<imported>.*)')
-            p5 = re.compile(r'.*Imported to (?P<dest_count>\d+)')
-            p6 = re.compile(r'.*Path type: (?P<path_type>.*?),') 
-            p7 = re.compile(r'.*AS-Path: .*?, (?P<as_path>.*)') 
-
-        # Iterate through each line in the show command output to select required fields
-        # Fields are collected by matching content in multiple show output lines
-        # When all required fields are available, a parser sub-dictionary is added to
-        # parser_dict {}  
-           
-            for line in out.splitlines():
-                line = line.strip()
-                # BGP routing table information for VRF default, address family L2VPN EVPN
-                m = p1.match(line)
-                if m:
-                # Get the vrf_name from the show command
-                    vrf_name = m.groupdict()['vrf_name']
-                    continue
-
-                # BGP routing table entry for [3]:[0]:[32]:[204.1.1.1]/88
-                m = p2.match(line)
-                if m:
-                    route = m.groupdict()['route']
-                    continue
-
-                # Route Distinguisher: 201.1.1.1:33769
-                m = p3.match(line)
-                if m:
-                    route_distinguisher = m.groupdict()['route_distinguisher']
-                    vni = int(m.groupdict()['vni'])
-                    continue
-
-                # Imported from 204.1.1.1:33769:[3]:[0]:[32]:[204.1.1.1]/88
-                # If the RD "Path Type" section includes "Imported from" generate a dictionary entry
-                m = p4.match(line)
-                if m:
-                    imported_from = m.groupdict()['imported']
-                    continue               
-
-                # Imported to 1 destination(s)
-                m = p5.match(line)
-                if m:
-                    dest_count = int(m.groupdict()['dest_count'])
-                    continue
-
-            # Path type: internal (from routing protocol)       Path type: local (generated by this peer device)
-            # If the "Path Type" is not local (this device is a receiver) generate dictionary entry
-            # The AS-Path is the last field that needs to be read to complete the FACT
-            # af_dict is used to create an instance of the 'route_distinquisher' and the
-            # required members are added to the dictionary using the update method.
-            #
-            # After the parsed_dict is updated, the variables used to collect the fields from
-            # the show command are re-initialized
-
-            # {'route_distinguisher': {'201.1.1.1:33769': {'route': '[3]:[0]:[32]:[204.1.1.1]/88',
-            #  'imported': '204.1.1.1:33769:[3]:[0]:[32]:[204.1.1.1]/88',
-            #  'path-type': 'internal', 
-            #  'destinations': 0}}}
-            
-                m = p6.match(line)
-                if m:
-                    path = m.groupdict()['path_type']
-                    af_dict = parsed_dict.setdefault('route_distinguisher', {}).setdefault(route_distinguisher, {})
-                    af_dict.update({'route': route})
-                    af_dict.update({'vni': vni})
-                    af_dict.update({'imported': imported_from})
-                    af_dict.update({'path_type': path})
-                    af_dict.update({'destinations': dest_count})
-                    af_dict.update({'route_type': 2})               
-                    route = ""
-                    route_distinguisher = ""
-                    imported_from = ""
-                    dest_count = 0
-                    direction = ""
-                    path = ""
-                    continue
-            return parsed_dict
-            
-        else:
-            print("%%%% DDR-error: NXShowBgpL2vpnEvpnRT2: Unsupported Version: " + str(pversion))
-            return {}
+        elif patterns.format == '10':
+            return bgp_evpn_records(lines, 2, self.workers)
         
 # ==================================================
 # Parser for 'show nve internal event-history peer'
 # ==================================================
-class NXShowNveInternalPeer():
-
-    def parse(self, output=None, pversion=None, debug=None):
+class NXShowNveInternalPeer(StreamingParser):
+    newest_first = True
+    patterns = VersionPatterns({
+        ('9.3(6)', '9.3(12)'): PatternSet('9',
+            p1=r'(?P<timestamp>([^E]*))E_DEBUG\s+(?P<component>(\S+))[^\]]*\]: \[(?P<tag>([^:]*)): (?P<peer>([^]]*))] \[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))](?P<message>(.*))',
+            p2=r'(?P<timestamp>([^E]*))E_DEBUG\s+(?P<component>(\S+))[^\]]*\]: \[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))] (?P<message>(.*))'),
+        ('10.4(1)',): PatternSet('10',
+            p1=r'(?P<timestamp>(\S+)) \[[^\]]*\].\[(?P<component>([^\]]*))\] E_DEBUG \[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))](?P<message>(.*))',
+            p2=r'(?P<timestamp>(\S+)) \[[^\]]*\].\[(?P<component>([^\]]*))\] E_DEBUG \[[^:]*: (?P<interface>([^]]\S+))] \[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))] (?P<message>(.*))'),
+        ('10.2(1)',): PatternSet('10',
+            p1=r'\[\d+\] (?P<timestamp>([^\[]*)).\[(?P<component>([^\]]*))\] E_DEBUG\s+\[\d+\]:\[Peer: (?P<peer>([^]]\S+))] \[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))] (?P<message>(.*))',
+            p2=r'(?P<timestamp>(\S+)) \[[^\]]*\].\[(?P<component>([^\]]*))\] E_DEBUG \[[^:]*: (?P<interface>([^]]\S+))] \[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))] (?P<message>(.*))')})
+
+    def parse_iter(self, lines, pversion=None, debug=None):
     #
     # Sample log messages NX-OS version '9.3'
     #
@@ -859,18 +867,17 @@ class NXShowNveInternalPeer():
         '''{'event_record': {'2023 Jun 15 19:35:47.087249': {'component': 'nve', 'type': 'peer', 'peer': '204.1.1.1', 'interface': 'none', 'function': 'nve_peer_info_update', 'line_num': 3237, 'message': 'Filled in delPeerTree', 'version': '9.3(6)'}, '2023 Jun 15 19:35:47.086464': {'component': 'nve', 'type': 'peer', 'peer': '204.1.1.1', 'interface': 'none', 'function': 'nve_peer_process_transition_values', 'line_num': 2090, 'message': 'Peer is in state: peer-add-complete, not processing transition values', 'version': '9.3(6)'}}}'''
 
     # Select parser logic based on the NX-OS version
-        parsed_dict = {}
-        if pversion == None:
-            return parsed_dict
+        patterns = self.version_patterns(pversion)
+        if patterns == None:
+            return
 
     # NX-OS version '9.3(6)'
-                
-        elif pversion in ['9.3(6)', '9.3(12)']:     
 
-            p1 = re.compile(r'(?P<timestamp>([^E]*))E_DEBUG\s+(?P<component>(\S+))[^\]]*\]: \[(?P<tag>([^:]*)): (?P<peer>([^]]*))] \[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))](?P<message>(.*))')
-            p2 = re.compile(r'(?P<timestamp>([^E]*))E_DEBUG\s+(?P<component>(\S+))[^\]]*\]: \[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))] (?P<message>(.*))')
+        elif patterns.format == '9':
+            p1 = patterns.p1
+            p2 = patterns.p2
 
-            for line in output.splitlines():
+            for line in lines:
                 line = line.strip()
     #
     #    2023 Feb 13 17:54:49.625302: E_DEBUG    nve [5065]: [Peer: 204.1.1.1] [nve_process_peer_add_req:692] Peer add request on VNI: 1002, egressVni: 1002 rnhMAC: 00:00:00:00:00:00 learnSrc: BGP flags: FABRIC  nveIf: nve1 tunnelID: 0x0
@@ -880,7 +887,7 @@ class NXShowNveInternalPeer():
                     group = m.groupdict()
                     timestamp = m.groupdict()['timestamp'].rstrip().rstrip(':')
                     message_string = m.groupdict()['message'].lstrip()
-                    af_dict = parsed_dict.setdefault('event_record', {}).setdefault(timestamp, {})
+                    af_dict = {}
                     af_dict.update({'component': m.groupdict()['component']})
                     af_dict.update({'type': 'peer'})
                     af_dict.update({'peer': m.groupdict()['peer']})
@@ -889,6 +896,7 @@ class NXShowNveInternalPeer():
                     af_dict.update({'line_num': int(m.groupdict()['line_num'])})
                     af_dict.update({'message': message_string})
                     af_dict.update({'version': pversion})
+                    yield 'event_record', timestamp, af_dict
                     continue
     #
     #     2023 Feb 13 17:54:49.624801: E_DEBUG    nve [5065]: [nve_handle_bgp_peer_msg:5579] 1 peers TXID: 1 flags: 0
@@ -898,7 +906,7 @@ class NXShowNveInternalPeer():
                     group = m2.groupdict()
                     timestamp = m2.groupdict()['timestamp'].rstrip().rstrip(':')
                     message_string = m2.groupdict()['message'].lstrip()
-                    af_dict = parsed_dict.setdefault('event_record', {}).setdefault(timestamp, {})
+                    af_dict = {}
                     af_dict.update({'component': m2.groupdict()['component']})
                     af_dict.update({'type': 'peer'})
                     af_dict.update({'peer': 'none'})
@@ -907,24 +915,18 @@ class NXShowNveInternalPeer():
                     af_dict.update({'line_num': int(m2.groupdict()['line_num'])})
                     af_dict.update({'message': message_string})
                     af_dict.update({'version': pversion})
+                    yield 'event_record', timestamp, af_dict
                     continue
-            return parsed_dict
+            return
 
 #PVH
     # NX-OS version 10.2(1) or 10.4(1)
 
-        elif pversion in ['10.2(1)', '10.4(1)']:
-            if pversion == '10.4(1)':
-                p1 = re.compile(r'(?P<timestamp>(\S+)) \[[^\]]*\].\[(?P<component>([^\]]*))\] E_DEBUG \[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))](?P<message>(.*))')
-                p2 = re.compile(r'(?P<timestamp>(\S+)) \[[^\]]*\].\[(?P<component>([^\]]*))\] E_DEBUG \[[^:]*: (?P<interface>([^]]\S+))] \[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))] (?P<message>(.*))')
-            elif pversion == '10.2(1)':
-                p1 = re.compile(r'\[\d+\] (?P<timestamp>([^\[]*)).\[(?P<component>([^\]]*))\] E_DEBUG\s+\[\d+\]:\[Peer: (?P<peer>([^]]\S+))] \[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))] (?P<message>(.*))')
-                p2 = re.compile(r'(?P<timestamp>(\S+)) \[[^\]]*\].\[(?P<component>([^\]]*))\] E_DEBUG \[[^:]*: (?P<interface>([^]]\S+))] \[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))] (?P<message>(.*))')
-            else:
-                print("%%%% DDR-error: NXShowNveInternalPeer: Unsupported Version: " + str(pversion))
-                return {}
+        elif patterns.format == '10':
+            p1 = patterns.p1
+            p2 = patterns.p2
 
-            for line in output.splitlines():
+            for line in lines:
                 line = line.strip()
     #
     # 2023-03-30T14:07:01.292307000+00:00 [M 27] [nve] E_DEBUG [nve_cmn_l2rib_send_all_peer_obj:675] Replaying all peer objects to L2RIB
@@ -934,7 +936,7 @@ class NXShowNveInternalPeer():
                     group = m.groupdict()
                     timestamp = m.groupdict()['timestamp'].rstrip().rstrip('+00:00')
                     message_string = m.groupdict()['message'].lstrip()
-                    af_dict = parsed_dict.setdefault('event_record', {}).setdefault(timestamp, {})
+                    af_dict = {}
                     af_dict.update({'component': m.groupdict()['component']})
                     af_dict.update({'type': 'peer'})
                     af_dict.update({'peer':  m.groupdict()['peer']})
@@ -943,6 +945,7 @@ class NXShowNveInternalPeer():
                     af_dict.update({'line_num': int(m.groupdict()['line_num'])})
                     af_dict.update({'message': message_string})
                     af_dict.update({'version': pversion})
+                    yield 'event_record', timestamp, af_dict
                     continue
     #
     # 2023-03-30T14:08:39.035656000+00:00 [M 27] [nve] E_DEBUG [Interface: port-channel213] [nve_handle_l3_proto_state_change:3816] L3 protocol state change portState: up
@@ -952,7 +955,7 @@ class NXShowNveInternalPeer():
                     group = m2.groupdict()
                     timestamp = m2.groupdict()['timestamp'].rstrip().rstrip('+00:00')
                     message_string = m2.groupdict()['message'].lstrip()
-                    af_dict = parsed_dict.setdefault('event_record', {}).setdefault(timestamp, {})
+                    af_dict = {}
                     af_dict.update({'component': m2.groupdict()['component']})
                     af_dict.update({'type': 'peer'})
                     af_dict.update({'peer': 'none'})
@@ -961,21 +964,18 @@ class NXShowNveInternalPeer():
                     af_dict.update({'line_num': int(m2.groupdict()['line_num'])})
                     af_dict.update({'message': message_string})
                     af_dict.update({'version': pversion})
+                    yield 'event_record', timestamp, af_dict
                     continue
-            return parsed_dict
-
-    # Unsupported OS version
-    
-        else:
-            print("%%%% DDR-error: NXShowNveInternalPeer: Unsupported Version: " + str(pversion))
-            return {} 
+            return
        
 # ==================================================
 # Parser for 'show nve internal event-history multicast'
 # ==================================================
-class NXShowNveInternalMulticast():
+class NXShowNveInternalMulticast(StreamingParser):
+    newest_first = True
+    p1 = re.compile(r'(?P<timestamp>([^E]*))E_DEBUG\s+(?P<component>(\S+))[^\]]*\]: \[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))](?P<message>(.*))')
 
-    def parse(self, output=None, pversion=None, debug=None):
+    def parse_iter(self, lines, pversion=None, debug=None):
     #
     # Sample log messages
     #
@@ -987,11 +987,9 @@ class NXShowNveInternalMulticast():
     #
         '''{'event_record': {'2023_Feb_11_00:36:45.431250': {'component': 'nve', 'type': 'multicast', 'function': 'nve_write_mrib_info_to_buffer', 'line_num': 180, 'message': 'Filled_MRIB_buffer_with_source:_201.1.1.1,_group:_225.1.1.1,_vrfContext:_default_nveIOD:_123,_srcIOD:_124,_vxlanEncap:_TRUE,_vxlanDecap:_FALSE_add:_TRUE,_IOD:_0'}, '2023_Feb_11_00:36:45.431227': {'component': 'nve', 'type': 'multicast', 'function': 'nve_write_mrib_info_to_buffer', 'line_num': 154, 'message': 'IPv4_multicast_group_225.1.1.1_is_SSM'}}}'''
 
-        # Init vars
-        parsed_dict = {}
-        p1 = re.compile(r'(?P<timestamp>([^E]*))E_DEBUG\s+(?P<component>(\S+))[^\]]*\]: \[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))](?P<message>(.*))')
+        p1 = self.p1
 
-        for line in output.splitlines():
+        for line in lines:
             line = line.strip()
             m = p1.match(line)
 
@@ -999,21 +997,29 @@ class NXShowNveInternalMulticast():
                 group = m.groupdict()
                 timestamp = m.groupdict()['timestamp'].rstrip().rstrip(':')
                 message_string = m.groupdict()['message'].lstrip()
-                af_dict = parsed_dict.setdefault('event_record', {}).setdefault(timestamp, {})
+                af_dict = {}
                 af_dict.update({'component': m.groupdict()['component']})
                 af_dict.update({'type': 'multicast'})
                 af_dict.update({'function': m.groupdict()['function']})
                 af_dict.update({'line_num': int(m.groupdict()['line_num'])})
                 af_dict.update({'message': message_string})
+                yield 'event_record', timestamp, af_dict
                 continue
-        return parsed_dict
 
 # ==================================================
 # Parser for 'show nve internal event-history events'
 # ==================================================
-class NXShowNveInternalEvents():
-
-    def parse(self, output=None, pversion=None, debug=None):
+class NXShowNveInternalEvents(StreamingParser):
+    newest_first = True
+    patterns = VersionPatterns({
+        ('9.3(6)', '9.3(12)'): PatternSet('9',
+            p1=r'(?P<timestamp>([^E]*))E_DEBUG\s+(?P<component>(\S+))[^\]]*\]: \[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))](?P<message>(.*))'),
+        ('10.4(1)',): PatternSet('10',
+            p1=r'(?P<timestamp>(\S+)) \[[^\]]*\].\[(?P<component>([^\]]*))\] [^\]]*\[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))](?P<message>(.*))'),
+        ('10.2(1)',): PatternSet('10',
+            p1=r'\[\d+\] (?P<timestamp>(.{27})).\[(?P<component>([^\]]*))\] E_DEBUG\s+\[\d+\]:\[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))](?P<message>(.*))')})
+
+    def parse_iter(self, lines, pversion=None, debug=None):
         if debug == 1:
             print("**** DDR Parser NXShowNveInternalEventsAll Debug: message: " + str(pversion))        
     #
@@ -1032,15 +1038,15 @@ class NXShowNveInternalEvents():
         '''{'event_record': {'2023_Feb_13_17:54:48.960231': {'component': 'nve', 'type': 'event', 'function': 'nve_overlay_peer_vni_add_done_batch_cb', 'line_num': 1007, 'message': 'Received_peer_VNI_add_callback,_numberOfPeerVNIs:_1'}, '2023_Feb_13_17:54:48.960045': {'component': 'nve', 'type': 'event', 'function': 'nve_vni_fl_update_sdb', 'line_num': 3926, 'message': 'Existing_FL_peerIP:_204.1.1.1_for_VNI:_1002'}, '2023_Feb_13_17:54:48.960039': {'component': 'nve', 'type': 'event', 'function': 'nve_send_heartbeat', 'line_num': 10627, 'message': 'Sending_a_heartbeat_to_system_manager'}, '2023_Feb_13_17:54:48.959838': {'component': 'nve', 'type': 'event', 'function': 'nve_vni_fl_update_sdb', 'line_num': 3987, 'message': 'Adding_FL_peerIP:_204.1.1.1_in_position:_0_to_VNI:_1002'}}}'''
 
     # Select parser logic based on the NX-OS version
-        parsed_dict = {}
-        if pversion == None:
-            return parsed_dict
+        patterns = self.version_patterns(pversion)
+        if patterns == None:
+            return
 
     # NX-OS version '9.3(6)'
-                
-        elif pversion in ['9.3(6)', '9.3(12)']:     
-            p1 = re.compile(r'(?P<timestamp>([^E]*))E_DEBUG\s+(?P<component>(\S+))[^\]]*\]: \[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))](?P<message>(.*))')
-            for line in output.splitlines():
+
+        elif patterns.format == '9':
+            p1 = patterns.p1
+            for line in lines:
                 line = line.strip()
                 m = p1.match(line)
 
@@ -1048,28 +1054,23 @@ class NXShowNveInternalEvents():
                     group = m.groupdict()
                     timestamp = m.groupdict()['timestamp'].rstrip().rstrip(':')
                     message_string = m.groupdict()['message'].lstrip()
-                    af_dict = parsed_dict.setdefault('event_record', {}).setdefault(timestamp, {})
+                    af_dict = {}
                     af_dict.update({'component': m.groupdict()['component']})
                     af_dict.update({'type': 'event'})
                     af_dict.update({'function': m.groupdict()['function']})
                     af_dict.update({'line_num': int(m.groupdict()['line_num'])})
                     af_dict.update({'message': message_string})
                     af_dict.update({'version': pversion})
+                    yield 'event_record', timestamp, af_dict
                     continue
-            return parsed_dict
+            return
 
     # NX-OS version 10.2.(1) or 10.4(1)
 
-        elif pversion in ['10.2(1)', '10.4(1)']:
-            if pversion == '10.4(1)':
-                p1 = re.compile(r'(?P<timestamp>(\S+)) \[[^\]]*\].\[(?P<component>([^\]]*))\] [^\]]*\[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))](?P<message>(.*))')
-            elif pversion == '10.2(1)':
-                p1 = re.compile(r'\[\d+\] (?P<timestamp>(.{27})).\[(?P<component>([^\]]*))\] E_DEBUG\s+\[\d+\]:\[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))](?P<message>(.*))')
-            else:
-                print("%%%% DDR-error: NXShowNveInternalTrigger: Unsupported Version: " + str(pversion))
-                return {}
+        elif patterns.format == '10':
+            p1 = patterns.p1
 
-            for line in output.splitlines():
+            for line in lines:
                 line = line.strip()
                 m = p1.match(line)
 
@@ -1077,28 +1078,33 @@ class NXShowNveInternalEvents():
                     group = m.groupdict()
                     timestamp = m.groupdict()['timestamp'].rstrip('+00:00')
                     message_string = m.groupdict()['message'].lstrip()
-                    af_dict = parsed_dict.setdefault('event_record', {}).setdefault(timestamp, {})
+                    af_dict = {}
                     af_dict.update({'component': m.groupdict()['component']})
                     af_dict.update({'type': 'event'})
                     af_dict.update({'function': m.groupdict()['function']})
                     af_dict.update({'line_num': int(m.groupdict()['line_num'])})
                     af_dict.update({'message': message_string})
                     af_dict.update({'version': pversion})
+                    yield 'event_record', timestamp, af_dict
                     continue
-            return parsed_dict        
-
-    # Unsupported OS version
-    
-        else:
-            print("%%%% DDR-error: NXShowNveInternalEventsAll: Unsupported Version: " + str(pversion))
-            return {} 
+            return
                        
 # ==================================================
 # Parser for 'show nve internal event-history triggers'
 # ==================================================
-class NXShowNveInternalTrigger():
-
-    def parse(self, output=None, pversion=None, debug=None):
+class NXShowNveInternalTrigger(StreamingParser):
+    newest_first = True
+    patterns = VersionPatterns({
+        ('9.3(12)',): PatternSet('9',
+            p1=r'.*(?P<timestamp>(.{27})): E_DEBUG\s+(?P<component>(\S+)) \[\d+\]: \[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))] nve_populate_urib_update_rnh_batch:(?P<message>(.*))'),
+        ('9.3(6)',): PatternSet('9',
+            p1=r'(?P<timestamp>([^E]*))E_DEBUG\s+(?P<component>(\S+))[^\]]*\]: \[nve_populate_urib_update_rnh_batch:(?P<line_num>([^]]\d+))](?P<message>(.*))'),
+        ('10.4(1)',): PatternSet('10',
+            p1=r'(?P<timestamp>(\S+)) \[[^\]]*\].\[(?P<component>([^\]]*))\] E_DEBUG \[[^V](?P<function>([^:]*)):(?P<line_num>([^]]\d+))] (?P<message>(.*))'),
+        ('10.2(1)',): PatternSet('10',
+            p1=r'\[\d+\] (?P<timestamp>([^\[]*)).\[(?P<component>([^\]]*))\] E_DEBUG\s+\[\d+\]:\[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))] (?P<message>(.*))')})
+
+    def parse_iter(self, lines, pversion=None, debug=None):
     #
     # Sample log messages NX OS 9
     #
@@ -1118,64 +1124,40 @@ class NXShowNveInternalTrigger():
         '''{'event_record': {'2023 Jun 15 19:35:00.528915': {'component': 'nve', 'type': 'trigger', 'function': 'nve_populate_urib_update_rnh_batch', 'line_num': 357, 'message': 'nve_populate_urib_update_rnh_batch: ADD peer:204.1.1.1 vrf:1', 'version': '9.3(6)'}}}'''
 
     # Select parser logic based on the NX-OS version
-        parsed_dict = {}
-        if pversion == None:
-            return parsed_dict
+        patterns = self.version_patterns(pversion)
+        if patterns == None:
+            return
 
     # NX-OS version '9'
     #  2023 Jul 17 19:58:45.177944: E_DEBUG    nve [24647]: [nve_populate_urib_update_rnh_batch:358] nve_populate_urib_update_rnh_batch: ADD peer:201.1.1.1 vrf:1 
 
-        elif pversion in ['9.3(12)']:
-            p1 = re.compile(r'.*(?P<timestamp>(.{27})): E_DEBUG\s+(?P<component>(\S+)) \[\d+\]: \[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))] nve_populate_urib_update_rnh_batch:(?P<message>(.*))')
-            for line in output.splitlines():
-                line = line.strip()
-                m = p1.match(line)
-                if m:
-                    group = m.groupdict()
-                    timestamp = m.groupdict()['timestamp'].rstrip().rstrip(':')
-                    message_string = m.groupdict()['message'].lstrip()
-                    af_dict = parsed_dict.setdefault('event_record', {}).setdefault(timestamp, {})
-                    af_dict.update({'component': m.groupdict()['component']})
-                    af_dict.update({'type': 'trigger'})
-                    af_dict.update({'function': 'nve_populate_urib_update_rnh_batch'})
-                    af_dict.update({'line_num': int(m.groupdict()['line_num'])})
-                    af_dict.update({'message': message_string})
-                    af_dict.update({'version': pversion})
-                    continue
-            return parsed_dict           
-                
-        elif pversion in ['9.3(6)']:     
-            p1 = re.compile(r'(?P<timestamp>([^E]*))E_DEBUG\s+(?P<component>(\S+))[^\]]*\]: \[nve_populate_urib_update_rnh_batch:(?P<line_num>([^]]\d+))](?P<message>(.*))')
-            for line in output.splitlines():
+        elif patterns.format == '9':
+            p1 = patterns.p1
+            for line in lines:
                 line = line.strip()
                 m = p1.match(line)
                 if m:
                     group = m.groupdict()
                     timestamp = m.groupdict()['timestamp'].rstrip().rstrip(':')
                     message_string = m.groupdict()['message'].lstrip()
-                    af_dict = parsed_dict.setdefault('event_record', {}).setdefault(timestamp, {})
+                    af_dict = {}
                     af_dict.update({'component': m.groupdict()['component']})
                     af_dict.update({'type': 'trigger'})
                     af_dict.update({'function': 'nve_populate_urib_update_rnh_batch'})
                     af_dict.update({'line_num': int(m.groupdict()['line_num'])})
                     af_dict.update({'message': message_string})
                     af_dict.update({'version': pversion})
+                    yield 'event_record', timestamp, af_dict
                     continue
-            return parsed_dict           
+            return
 
 #PVH
     # NX-OS version 10.2(1) or 10.4(1)
 
-        elif pversion in ['10.2(1)', '10.4(1)']:
-            if pversion == '10.4(1)':
-                p1 = re.compile(r'(?P<timestamp>(\S+)) \[[^\]]*\].\[(?P<component>([^\]]*))\] E_DEBUG \[[^V](?P<function>([^:]*)):(?P<line_num>([^]]\d+))] (?P<message>(.*))')
-            elif pversion == '10.2(1)':
-                p1 = re.compile(r'\[\d+\] (?P<timestamp>([^\[]*)).\[(?P<component>([^\]]*))\] E_DEBUG\s+\[\d+\]:\[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))] (?P<message>(.*))')
-            else:
-                print("%%%% DDR-error: NXShowNveInternalTrigger: Unsupported Version: " + str(pversion))
-                return {}
+        elif patterns.format == '10':
+            p1 = patterns.p1
 
-            for line in output.splitlines():
+            for line in lines:
                 line = line.strip()
                 m = p1.match(line)
 
@@ -1183,28 +1165,31 @@ class NXShowNveInternalTrigger():
                     group = m.groupdict()
                     timestamp = m.groupdict()['timestamp'].rstrip().rstrip(':').rstrip('+00:00')
                     message_string = m.groupdict()['message'].lstrip()
-                    af_dict = parsed_dict.setdefault('event_record', {}).setdefault(timestamp, {})
+                    af_dict = {}
                     af_dict.update({'component': m.groupdict()['component']})
                     af_dict.update({'type': 'trigger'})
                     af_dict.update({'function': m.groupdict()['function']})
                     af_dict.update({'line_num': int(m.groupdict()['line_num'])})
                     af_dict.update({'message': message_string})
                     af_dict.update({'version': pversion})
+                    yield 'event_record', timestamp, af_dict
                     continue
-            return parsed_dict           
-
-    # Unsupported OS version
-    
-        else:
-            print("%%%% DDR-error: NXShowNveInternalTrigger: Unsupported Version: " + str(pversion))
-            return {} 
+            return
                    
 # ==================================================
 # Parser for 'show nve internal event-history vni'
 # ==================================================
-class NXShowNveInternalVni():
-
-    def parse(self, output=None, pversion=None, debug=None):
+class NXShowNveInternalVni(StreamingParser):
+    newest_first = True
+    patterns = VersionPatterns({
+        ('9.3(6)', '9.3(12)'): PatternSet('9',
+            p1=r'(?P<timestamp>([^+]*)).*VNI: (?P<vni>(\d+))\] \[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))](?P<message>(.*))'),
+        ('10.4(1)',): PatternSet('10',
+            p2=r'(?P<timestamp>(\S+)) \[[^\]]*\].\[(?P<component>([^\]]*))\] E_DEBUG \[[^:]*: (?P<vni>([^]]\d+))] \[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))] (?P<message>(.*))'),
+        ('10.2(1)',): PatternSet('10',
+            p2=r'\[\d+\] (?P<timestamp>([^\[]*)).\[(?P<component>([^\]]*))\] E_DEBUG\s+\[\d+\]:\[VNI\: (?P<vni>([^]]\d+))] \[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))] (?P<message>(.*))')})
+
+    def parse_iter(self, lines, pversion=None, debug=None):
     #
     # Sample log messages NX OX version 9
     #
@@ -1225,16 +1210,16 @@ class NXShowNveInternalVni():
         '''{'event_record': {'2023_May_04_19:07:23.114968': {'component': 'nve', 'type': 'vni', 'function': 'nve_vni_to_sw_bd', 'line_num': 2075, 'message': 'Before_update_SW_BD:_0,_xconnect_FALSE:'}, '2023_May_04_19:02:00.522951': {'component': 'nve', 'type': 'vni', 'function': 'nve_vni_to_sw_bd', 'line_num': 2075, 'message': 'Before_update_SW_BD:_0,_xconnect_FALSE:'}}}'''
 
     # Select parser logic based on the NX-OS version
-        parsed_dict = {}
-        if pversion == None:
-            return parsed_dict
+        patterns = self.version_patterns(pversion)
+        if patterns == None:
+            return
 
     # NX-OS version '9.3(6)'
-                
-        elif pversion in ['9.3(6)', '9.3(12)']:     
-            p1 = re.compile(r'(?P<timestamp>([^+]*)).*VNI: (?P<vni>(\d+))\] \[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))](?P<message>(.*))')
 
-            for line in output.splitlines():
+        elif patterns.format == '9':
+            p1 = patterns.p1
+
+            for line in lines:
                 line = line.strip()
                 m = p1.match(line)
 
@@ -1242,7 +1227,7 @@ class NXShowNveInternalVni():
                     group = m.groupdict()
                     timestamp = m.groupdict()['timestamp'].rstrip().rstrip(':')
                     message_string = m.groupdict()['message'].lstrip()
-                    af_dict = parsed_dict.setdefault('event_record', {}).setdefault(timestamp, {})
+                    af_dict = {}
                     af_dict.update({'component': 'nve'})
                     af_dict.update({'type': 'vni'})
                     af_dict.update({'vni': m.groupdict()['vni']})
@@ -1250,23 +1235,18 @@ class NXShowNveInternalVni():
                     af_dict.update({'line_num': int(m.groupdict()['line_num'])})
                     af_dict.update({'message': message_string})
                     af_dict.update({'version': pversion})
+                    yield 'event_record', timestamp, af_dict
                     continue
-            return parsed_dict                
+            return
 #PVH
     # NX-OS version 10.2(1) or 10.4(1)
 
-        elif pversion in ['10.2(1)', '10.4(1)']:
-            if pversion == '10.4(1)':
-                p2 = re.compile(r'(?P<timestamp>(\S+)) \[[^\]]*\].\[(?P<component>([^\]]*))\] E_DEBUG \[[^:]*: (?P<vni>([^]]\d+))] \[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))] (?P<message>(.*))')
-            elif pversion == '10.2(1)':
-                p2 = re.compile(r'\[\d+\] (?P<timestamp>([^\[]*)).\[(?P<component>([^\]]*))\] E_DEBUG\s+\[\d+\]:\[VNI\: (?P<vni>([^]]\d+))] \[(?P<function>([^:]*)):(?P<line_num>([^]]\d+))] (?P<message>(.*))')
-            else:
-                print("%%%% DDR-error: NXShowNveInternalVni: Unsupported Version: " + str(pversion))
-                return {}
+        elif patterns.format == '10':
+            p2 = patterns.p2
     #
     # Process show command output
     #
-            for line in output.splitlines():
+            for line in lines:
                 line = line.strip()
 
                 m = p2.match(line)
@@ -1275,7 +1255,7 @@ class NXShowNveInternalVni():
                     group = m.groupdict()
                     timestamp = m.groupdict()['timestamp'].rstrip().rstrip(':').rstrip('+00:00')
                     message_string = m.groupdict()['message'].lstrip()
-                    af_dict = parsed_dict.setdefault('event_record', {}).setdefault(timestamp, {})
+                    af_dict = {}
                     af_dict.update({'component': m.groupdict()['component']})
                     af_dict.update({'type': 'vni'})
                     af_dict.update({'vni': int(m.groupdict()['vni'])})
@@ -1283,12 +1263,7 @@ class NXShowNveInternalVni():
                     af_dict.update({'line_num': int(m.groupdict()['line_num'])})
                     af_dict.update({'message': message_string})
                     af_dict.update({'version': pversion})
+                    yield 'event_record', timestamp, af_dict
                     continue
 
-            return parsed_dict                
-
-    # Unsupported OS version
-    
-        else:
-            print("%%%% DDR-error: NXShowNveInternalVni: Unsupported Version: " + str(pversion))
-            return {}
+            return
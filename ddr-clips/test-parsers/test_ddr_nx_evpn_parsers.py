@@ -14,13 +14,35 @@
 from ddrparsers import *
 from ddrparserlib import *
 from ddrclass import *
+from ddrncserver import *
 from io import StringIO
 import pytest
+import queue
+import re
+import socket
+import time
 import threading
 import os
 import sys
 sys.path.insert(0, '../')
 
+def ddr_engine(**control):
+#
+# Return a DDR instance with the control flags used by the methods under test and no devices or files
+#
+    engine = DDR()
+    engine.control = {"debug-logging": 0, "debug-fact": 0, "debug-parser": 0, "debug-CLI": 0, "debug-syslog": 0,
+                      "debug-notify": 0, "actions": 1, "rule-read-cache": 0, "event-history-watermark": 1,
+                      "show-response-cache": 0, "show-response-cache-keep-facts": 1}
+    engine.control.update(control)
+    engine.env = clips.Environment()
+    engine.template_cache = TemplateCache(engine.env)
+    engine.protofact_plans = {}
+    engine.event_watermarks = {}
+    engine.response_cache = {}
+    engine.response_cache_hits = 0
+    return engine
+
 def test_NXShowL2RouteEvpnImetAll():
 
     test_message = '''
@@ -692,3 +714,1030 @@ def test_NXShowNveInternalVni():
             print("fact_read: ", fact_read)
             assert fact_read == expected_facts[i]
             i = i + 1
+
+def test_compile_protofact():
+#
+# Verify that a compiled protofact generates the same slot values as the protofact
+# definitions used by show_and_assert_fact
+#
+    protofact = {"template": "nve-peer-imet",
+                 "slots": {"device": "device",
+                           "nve-peer": "$",
+                           "vni": "$+vni",
+                           "producer": "$+producer",
+                           "upper": "$+upper_value",
+                           "type": "IMET"
+                           },
+                 "types": {"device": "str",
+                           "nve-peer": "str",
+                           "vni": "int",
+                           "producer": "str",
+                           "upper": "str",
+                           "type": "str"
+                           }
+                }
+    sub_dictionary = {'204.1.1.1': {'producer': 'BGP 1', 'vni': '1002'}}
+
+    plan = compile_protofact(protofact)
+    fact1, errors = plan.materialize('204.1.1.1', sub_dictionary, 'leaf-1')
+    assert fact1 == {'device': 'leaf-1', 'nve-peer': '204.1.1.1', 'vni': 1002, 'producer': 'BGP_1', 'type': 'IMET'}
+    assert [(error_type, slot) for error_type, slot, e in errors] == [('lookup', 'upper')]
+
+    plan = compile_protofact(protofact, replace_spaces=False)
+    fact1, errors = plan.materialize('204.1.1.1', sub_dictionary, 'leaf-1')
+    assert fact1["producer"] == 'BGP 1'
+
+def test_assert_facts_bulk():
+#
+# Verify FACTs are asserted in order and an error result is returned for each FACT that can't be asserted
+#
+    env = clips.Environment()
+    env.load(os.path.join(os.path.dirname(__file__), "NXShowL2RouteEvpnImetAll_rules.clp"))
+
+    records = [("nve-peer-imet", {"nve-peer": "204.1.1.1", "type": "IMET", "vni": 1002, "producer": "BGP"}),
+               ("no-such-template", {"nve-peer": "201.1.1.1"}),
+               ("nve-peer-imet", {"nve-peer": "201.1.1.1", "no-such-slot": 1}),
+               ("nve-peer-imet", {"nve-peer": "201.1.1.1", "type": "IMET", "vni": 1001, "producer": "VXLAN"})]
+
+    errors = assert_facts_bulk(env, records, TemplateCache(env))
+    assert [(error["index"], error["template"]) for error in errors] == [(1, "no-such-template"), (2, "nve-peer-imet")]
+
+    facts = [str(fact) for fact in env.facts()]
+    assert facts == ['(nve-peer-imet (device "") (nve-peer "204.1.1.1") (type "IMET") (vni 1002) (producer "BGP"))',
+                     '(nve-peer-imet (device "") (nve-peer "201.1.1.1") (type "IMET") (vni 1001) (producer "VXLAN"))']
+
+def test_stream_and_assert_fact():
+#
+# Verify parse_iter records match the parse dictionary and FACTs are asserted as records are generated
+#
+    test_message = '''
+Flags- (F): Originated From Fabric, (W): Originated from WAN
+
+Topology ID VNI         Prod  IP Addr                                 Flags  
+----------- ----------- ----- --------------------------------------- -------
+1002        1002        BGP   204.1.1.1                               -                                  -        
+1001        1001        VXLAN 201.1.1.1                               -                                  -        
+    '''
+
+    fact = {"fact_type": "show_and_assert",
+            "device": "DUMMY",
+            "stream": True,
+            "genie_parser": "NXShowL2RouteEvpnImetAll",
+            "assert_fact_for_each_item_in": "nve_peer_l2vpn",
+            "protofact": {"template": "nve-peer-imet",
+                          "slots": {"device": "device", "nve-peer": "$", "vni": "$+vni", "type": "$+type", "producer": "$+producer"},
+                          "types": {"device": "str", "nve-peer": "str", "vni": "int", "type": "str", "producer": "str"}
+                         }
+           }
+
+    parser = genie_str_to_class(fact["genie_parser"])
+    records = list(parser.parse_iter(iter(test_message.splitlines())))
+    assert [(name, key) for name, key, entry in records] == [("nve_peer_l2vpn", "204.1.1.1"), ("nve_peer_l2vpn", "201.1.1.1")]
+    assert records_to_dict(records) == parser.parse(output=test_message)
+
+    env = clips.Environment()
+    env.load(os.path.join(os.path.dirname(__file__), "NXShowL2RouteEvpnImetAll_rules.clp"))
+    assert stream_and_assert_fact(env, fact, parser.parse_iter(StringIO(test_message))) == 2
+
+    facts = [str(fact) for fact in env.facts()]
+    assert facts == ['(nve-peer-imet (device "DUMMY") (nve-peer "204.1.1.1") (type "IMET") (vni 1002) (producer "BGP"))',
+                     '(nve-peer-imet (device "DUMMY") (nve-peer "201.1.1.1") (type "IMET") (vni 1001) (producer "VXLAN"))']
+
+def test_fixed_width_table():
+#
+# Verify the column offsets are taken from the ruler line of each table section and legend lines are not returned
+#
+    test_message = '''
+Topology    Mac Address    Host IP                                 Prod   Flags         Seq No     Next-Hops                              
+----------- -------------- --------------------------------------- ------ ---------- ---------- ---------------------------------------
+1001        0001.abba.edda 5.1.1.1                                 BGP    --            0         204.1.1.1 (Label: 1001)   
+
+(R):Remote (V):vPC link 
+Topology    Mac Address    Host IP                                 Prod   Flags         Seq No     Next-Hops
+----------- -------------- --------------------------------------- ------ ---------- ----------  ------------
+1002        0002.abba.edda 2.2.2.2                                 BGP    --            3          201.1.1.1 (Label: 1002)
+(Ps):Peer Sync (Ro):Re-Originated (Orp):Orphan 
+1003        0003.abba.edda 3.3.3.3                                 HMM    L,            0          Local
+    '''
+
+    parser = NXShowL2RouteEvpnMacIpAll()
+    rows = list(parser.table.rows(test_message.splitlines()))
+    assert parser.table.names == ('topology', 'mac', 'host_ip', 'producer', 'flags', 'sequence', 'next_hops')
+    assert rows == [(1001, '0001.abba.edda', '5.1.1.1', 'BGP', '--', 0, '204.1.1.1 (Label: 1001)'),
+                    (1002, '0002.abba.edda', '2.2.2.2', 'BGP', '--', 3, '201.1.1.1 (Label: 1002)'),
+                    (1003, '0003.abba.edda', '3.3.3.3', 'HMM', 'L,', 0, 'Local')]
+
+def test_mac_ip_long_flags():
+#
+# Verify Flags values wider than the Flags ruler are parsed and the result is the same as the regular expression parser
+# Locally learned rows with the next-hop "Local" are not returned
+#
+    test_message = '''
+Flags -(Rmac):Router MAC (Stt):Static (L):Local (R):Remote (V):vPC link 
+(Dup):Duplicate (Spl):Split (Rcv):Recv(D):Del Pending (S):Stale (C):Clear
+(Ps):Peer Sync (Ro):Re-Originated (Orp):Orphan 
+Topology    Mac Address    Host IP                                 Prod   Flags         Seq No     Next-Hops                              
+----------- -------------- --------------------------------------- ------ ---------- ---------- ---------------------------------------
+1001        0001.abba.edda 5.1.1.1                                 BGP    --            0         204.1.1.1 (Label: 1001)   
+1001        0002.abba.edda 2.2.2.2                                 BGP    Stt,SplRcv,Ps 0         201.1.1.1 (Label: 1001)   
+1001        0004.abba.edda 4.4.4.4                                 BGP    Stt,SplRcv,Ps 12        202.1.1.1 (Label: 1001)   
+
+Topology    Mac Address    Host IP                                 Prod   Flags         Seq No     Next-Hops                            
+----------- -------------- --------------------------------------- ------ ---------- ---------- -----------------------------------
+1001        0001.abba.edda 5.1.1.1                                 HMM    L,            0         Local                               
+    '''
+    result = NXShowL2RouteEvpnMacIpAll().parse(output=test_message)
+    assert result == {'nve_peer_mac_ip': {
+        '0001.abba.edda': {'peer-ip': '204.1.1.1', 'vni': 1001, 'mac': '0001.abba.edda', 'host-ip': '5.1.1.1', 'type': 'MACIP', 'producer': 'BGP', 'flags': '--'},
+        '0002.abba.edda': {'peer-ip': '201.1.1.1', 'vni': 1001, 'mac': '0002.abba.edda', 'host-ip': '2.2.2.2', 'type': 'MACIP', 'producer': 'BGP', 'flags': 'Stt,SplRcv,Ps'},
+        '0004.abba.edda': {'peer-ip': '202.1.1.1', 'vni': 1001, 'mac': '0004.abba.edda', 'host-ip': '4.4.4.4', 'type': 'MACIP', 'producer': 'BGP', 'flags': 'Stt,SplRcv,Ps'}}}
+
+def test_bgp_evpn_blocks():
+#
+# Verify routes parsed in separate blocks and in worker processes use the L2VNI from the preceding Route Distinguisher
+#
+    test_message = '''
+Route Distinguisher: 201.1.1.1:33768    (L2VNI 1001)
+BGP routing table entry for [2]:[0]:[0]:[48]:[0001.abba.edda]:[32]:[5.1.1.1]/272, version 171
+  Path type: internal, path is valid, is best path, no labeled nexthop, in rib
+             Imported from 204.1.1.1:33768:[2]:[0]:[0]:[48]:[0001.abba.edda]:[32]:[5.1.1.1]/272 
+BGP routing table entry for [2]:[0]:[0]:[48]:[0002.abba.edda]:[32]:[5.1.1.2]/272, version 172
+  Path type: local, path is valid, is best path, no labeled nexthop
+             Imported to 2 destination(s)
+Route Distinguisher: 201.1.1.1:33769    (L2VNI 1002)
+BGP routing table entry for [2]:[0]:[0]:[48]:[0003.abba.edda]:[32]:[5.1.1.3]/272, version 173
+  Path type: internal, path is valid, is best path, no labeled nexthop, in rib
+    '''
+
+    expected = [('route_distinguisher', '201.1.1.1:33768', {'route': '[2]:[0]:[0]:[48]:[0001.abba.edda]:[32]:[5.1.1.1]/272', 'vni': 1001, 'imported': '', 'path_type': 'internal', 'destinations': 0, 'route_type': 2}),
+                ('route_distinguisher', '', {'route': '[2]:[0]:[0]:[48]:[0002.abba.edda]:[32]:[5.1.1.2]/272', 'vni': 1001, 'imported': '204.1.1.1:33768:[2]:[0]:[0]:[48]:[0001.abba.edda]:[32]:[5.1.1.1]/272', 'path_type': 'local', 'destinations': 0, 'route_type': 2}),
+                ('route_distinguisher', '201.1.1.1:33769', {'route': '[2]:[0]:[0]:[48]:[0003.abba.edda]:[32]:[5.1.1.3]/272', 'vni': 1002, 'imported': '', 'path_type': 'internal', 'destinations': 2, 'route_type': 2})]
+
+    lines = test_message.splitlines()
+    assert list(bgp_evpn_records(lines, 2)) == expected
+    assert list(bgp_evpn_records(lines, 2, block_lines=1)) == expected
+    assert list(bgp_evpn_records(lines, 2, workers=2, block_lines=1)) == expected
+
+def test_version_patterns():
+#
+# Verify the pattern set selected for listed versions and the fallback for other releases in the same release train
+#
+    patterns = NXShowNveInternalTrigger.patterns
+    assert patterns.get('9.3(8)') is patterns.get('9.3(6)')
+    assert patterns.get('9.3(13)') is patterns.get('9.3(12)')
+    assert patterns.get('9.3(1)') is patterns.get('9.3(6)')
+    assert patterns.get('10.4(3)') is patterns.get('10.4(1)')
+    assert patterns.get('10.3(1)') is None
+    assert patterns.get('unknown') is None
+
+    assert genie_str_to_class("NXShowNveInternalTrigger") is genie_str_to_class("NXShowNveInternalTrigger")
+    assert genie_str_to_class("NoSuchParser") is None
+
+def test_event_watermark():
+#
+# Verify that only event-history entries newer than the watermark are returned and that lines
+# older than the watermark are not read
+#
+    assert event_time_key('2023 Feb 13 17:54:44.468645') == '2023-02-13 17:54:44.468645000'
+    assert event_time_key('2023-03-30T14:07:01.292434') == '2023-03-30 14:07:01.292434000'
+    assert event_time_key('2023 Feb 13 17:54:44.468645') < event_time_key('2023-03-30T14:07:01.29')
+    assert event_time_key('unknown') is None
+
+    first_output = '''2023-03-30T14:07:01.292434000+00:00 [M 27] [nve] E_DEBUG [nve_l2rib_notify_eoc:1568] Sent EOC for obj: 5
+2023-03-30T14:07:01.292321000+00:00 [M 27] [nve] E_DEBUG [nve_l2rib_send_all_peer_obj:1158] Adding all peer related objects to L2RIB'''
+    second_output = '''2023-03-30T14:08:00.000100000+00:00 [M 27] [nve] E_DEBUG [nve_l2rib_notify_eoc:1568] Sent EOC for obj: 6
+''' + first_output
+
+    parser = NXShowNveInternalTrigger()
+    assert parser.newest_first
+    marks = {}
+    key = ('DUMMY', 'NXShowNveInternalTrigger')
+    records = list(records_newer_than(parser.parse_iter(first_output.splitlines(), '10.4(1)'), marks, key))
+    assert len(records) == 2
+    assert marks[key] == '2023-03-30 14:07:01.292434000'
+
+    lines_read = []
+    def lines(output):
+        for line in output.splitlines():
+            lines_read.append(line)
+            yield line
+
+    records = list(records_newer_than(parser.parse_iter(lines(second_output), '10.4(1)'), marks, key))
+    assert [record[1] for record in records] == ['2023-03-30T14:08:00.0001']
+    assert len(lines_read) == 2
+    assert marks[key] == '2023-03-30 14:08:00.000100000'
+
+    assert list(records_newer_than(parser.parse_iter(second_output.splitlines(), '10.4(1)'), marks, key)) == []
+
+def test_event_watermark_per_command():
+#
+# Verify rule calls of one event-history parser with different parameters each keep their own watermark
+#
+    fact = {"fact_type": "run_show_parameter",
+            "genie_parser": "NXShowNveInternalTrigger",
+            "assert_fact_for_each_item_in": "event_record",
+            "protofact": {"template": "evpn-log-trigger", "slots": {"message": "$+message"}, "types": {"message": "str"}}}
+    engine = ddr_engine(**{"show-parameter-fact-list": [fact],
+                           "device-list": [["10.1.1.1", 22, "admin", "admin", "leaf1", "ssh", "", "", "", "", "10.4(1)"]]})
+    engine.env.build('(deftemplate evpn-log-trigger (slot device) (slot timestamp) (slot message))')
+    event = '2023-03-30T14:07:01.292434000+00:00 [M 27] [nve] E_DEBUG [nve_l2rib_notify_eoc:1568] Sent EOC for obj: '
+    responses = {"show nve internal event-history obj 5": event + "5", "show nve internal event-history obj 6": event + "6"}
+    commands = []
+    def ssh_command(device_info, command, timeout):
+        commands.append(command)
+        return responses[command]
+    engine.ssh_command = ssh_command
+
+    template = "show nve internal event-history obj {0}"
+    for obj in ["5", "6", "5"]:
+        engine.run_show_parameter_index_version(0, 0, template, 1, obj, None, None, 0, "10.4(1)")
+    assert commands == ["show nve internal event-history obj 5", "show nve internal event-history obj 6", "show nve internal event-history obj 5"]
+    assert [fact1["message"] for fact1 in engine.env.facts()] == ["Sent EOC for obj: 5", "Sent EOC for obj: 6"]
+    assert sorted(engine.event_watermarks) == [("leaf1", "show nve internal event-history obj 5"), ("leaf1", "show nve internal event-history obj 6")]
+
+def test_netconf_fact_plan():
+#
+# Verify FACTs generated from a NETCONF get reply using the compiled slot paths, enclosing list keys and element_list
+#
+    get_result = '''<rpc-reply xmlns="urn:ietf:params:xml:ns:netconf:base:1.0" message-id="101"><data>
+  <System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device"><eps-items><epId-items>
+    <Ep-list><epId>1</epId><adminSt>enabled</adminSt><primaryIp>204.1.1.1</primaryIp>
+      <peers-items><dy_peer-items>
+        <DyPeer-list><ip>201.1.1.1</ip><state>Up</state><mac>00:00:00:00:00:00</mac></DyPeer-list>
+        <DyPeer-list><ip>1.2.3.4</ip><state>Down</state></DyPeer-list>
+      </dy_peer-items></peers-items>
+    </Ep-list>
+    <Ep-list><epId>2</epId><adminSt>disabled</adminSt><primaryIp>204.1.1.2</primaryIp>
+      <peers-items><dy_peer-items>
+        <DyPeer-list><ip>201.1.1.2</ip><state>Up</state><mac>10:00:00:00:00:00</mac></DyPeer-list>
+      </dy_peer-items></peers-items>
+    </Ep-list>
+  </epId-items></eps-items></System></data></rpc-reply>'''
+
+    fact = {"fact_type": "multitemplate_protofact",
+            "device": "n9k-test-1",
+            "assert_fact_for_each": "DyPeer-list",
+            "hardcoded_list": ["device"],
+            "protofact": {"template": "nve-peer-list",
+                          "slots": {"device": "None", "nve": "Ep-list/epId", "admin-state": "Ep-list/adminSt",
+                                    "peer-ip": "ip", "peer-state": "state", "peer-mac": "mac"},
+                          "types": {"device": "str", "nve": "int", "admin-state": "str",
+                                    "peer-ip": "str", "peer-state": "str", "peer-mac": "str"}
+                         }
+           }
+
+    plan = compile_netconf_fact(fact)
+    assert plan.upper_tags == {"Ep-list"}
+    facts = [fact1 for fact1, errors in plan.extract(get_result, "n9k-test-1")]
+    assert facts == [{"device": "n9k-test-1", "nve": 1, "admin-state": "enabled", "peer-ip": "201.1.1.1", "peer-state": "Up", "peer-mac": "00:00:00:00:00:00"},
+                     {"device": "n9k-test-1", "nve": 1, "admin-state": "enabled", "peer-ip": "1.2.3.4", "peer-state": "Down", "peer-mac": "nil"},
+                     {"device": "n9k-test-1", "nve": 2, "admin-state": "disabled", "peer-ip": "201.1.1.2", "peer-state": "Up", "peer-mac": "10:00:00:00:00:00"}]
+
+    fact["element_list"] = {"peer-ip": ["1.2.3.4", "201.1.1.2"], "device": ["n9k-test-1"]}
+    plan = compile_netconf_fact(fact)
+    assert [fact1["peer-ip"] for fact1, errors in plan.extract(get_result.encode(), "n9k-test-1")] == ["1.2.3.4", "201.1.1.2"]
+
+    assert [instance.findtext("{*}epId") for instance in netconf_instances(get_result, "Ep-list")] == ["1", "2"]
+
+def test_merge_subtree_filters():
+#
+# Verify subtree filters for the same model are merged into one get and the data for each filter is returned from the merged reply
+#
+    ns = "http://cisco.com/ns/yang/cisco-nx-os-device"
+    peers = '<System xmlns="%s"><eps-items><epId-items><Ep-list><epId>1</epId><peers-items><dy_peer-items><DyPeer-list/></dy_peer-items></peers-items></Ep-list></epId-items></eps-items></System>' % ns
+    admin1 = '<System xmlns="%s"><eps-items><epId-items><Ep-list><epId>1</epId><adminSt/></Ep-list></epId-items></eps-items></System>' % ns
+    admin2 = '<System xmlns="%s"><eps-items><epId-items><Ep-list><epId>2</epId><adminSt/></Ep-list></epId-items></eps-items></System>' % ns
+    hostname = '<native xmlns="http://cisco.com/ns/yang/Cisco-IOS-XE-native"><hostname/></native>'
+
+    merged = merge_subtree_filters([peers, admin1, admin2, hostname])
+    assert [indexes for subtree, indexes in merged] == [[0, 1, 2], [3]]
+    assert merged[0][0] == ('<System xmlns="%s"><eps-items><epId-items>' % ns +
+                            '<Ep-list><epId>1</epId><peers-items><dy_peer-items><DyPeer-list/></dy_peer-items></peers-items><adminSt/></Ep-list>' +
+                            '<Ep-list><epId>2</epId><adminSt/></Ep-list></epId-items></eps-items></System>')
+    assert merge_subtree_filters([admin1, '<System xmlns="%s"><eps-items/></System>' % ns])[0][0] == '<System xmlns="%s"><eps-items/></System>' % ns
+
+    get_result = '''<rpc-reply xmlns="urn:ietf:params:xml:ns:netconf:base:1.0" message-id="101"><data>
+  <System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device"><eps-items><epId-items>
+    <Ep-list><epId>1</epId><adminSt>enabled</adminSt>
+      <peers-items><dy_peer-items><DyPeer-list><ip>201.1.1.1</ip></DyPeer-list></dy_peer-items></peers-items>
+    </Ep-list>
+    <Ep-list><epId>2</epId><adminSt>disabled</adminSt></Ep-list>
+  </epId-items></eps-items></System></data></rpc-reply>'''
+
+    fact = {"assert_fact_for_each": "Ep-list",
+            "protofact": {"template": "nve", "slots": {"nve": "epId", "admin-state": "adminSt", "peer-ip": "ip"},
+                          "types": {"nve": "int", "admin-state": "str", "peer-ip": "str"}}}
+    plan = compile_netconf_fact(fact)
+    assert [fact1 for fact1, errors in plan.extract(filter_reply(get_result, peers))] == [{"nve": 1, "admin-state": "nil", "peer-ip": "201.1.1.1"}]
+    assert [fact1 for fact1, errors in plan.extract(filter_reply(get_result, admin1))] == [{"nve": 1, "admin-state": "enabled", "peer-ip": "nil"}]
+    assert [fact1 for fact1, errors in plan.extract(filter_reply(get_result, admin2))] == [{"nve": 2, "admin-state": "disabled", "peer-ip": "nil"}]
+    assert split_reply(get_result, [peers, admin1, admin2, hostname]) == [filter_reply(get_result, subtree) for subtree in [peers, admin1, admin2, hostname]]
+    assert split_reply(etree.fromstring(get_result.encode("utf-8")), []) == []
+
+    engine = ddr_engine(**{"nc-merge-filters": 1, "netconf-workers": 1, "debug-nc": 0})
+    facts = [{"fact_type": "multitemplate_protofact", "device_index": 0, "path": subtree} for subtree in [peers, admin1, admin2]]
+    gets = []
+    engine.netconf_get_many = lambda requests: gets.extend(requests) or [{"device_index": 0, "device": "leaf1", "xml": get_result, "error": None, "time": 0}]
+    replies = engine.prefetch_netconf_facts(facts)
+    assert len(gets) == 1
+    assert [replies[id(fact)] for fact in facts] == [filter_reply(get_result, subtree) for subtree in [peers, admin1, admin2]]
+
+def test_response_cache():
+#
+# Verify cached responses are used until the TTL expires or the cycle ends and the least recently used response is removed first
+#
+    now = [0.0]
+    cache = ResponseCache(size=2, ttl=10, per_cycle=True, clock=lambda: now[0])
+    assert cache.get(("nc", 0, "<System/>")) == (False, None)
+    cache.put(("nc", 0, "<System/>"), "<data/>")
+    cache.put(("show", 1, "show nve peers"), "peers")
+    assert cache.get(("nc", 0, "<System/>")) == (True, "<data/>")
+    cache.put(("show", 1, "show nve vni"), "vni")
+    assert cache.get(("show", 1, "show nve peers")) == (False, None)
+    assert (cache.hits, cache.misses, len(cache)) == (1, 2, 2)
+
+    now[0] = 10.0
+    assert cache.get(("nc", 0, "<System/>")) == (False, None)
+    assert cache.get(("show", 1, "show nve vni")) == (False, None)
+    assert len(cache) == 0
+
+    cache.put(("show", 1, "show nve vni"), "vni")
+    cache.new_cycle()
+    assert (cache.hits, cache.misses, len(cache)) == (0, 0, 0)
+
+    cache = ResponseCache(ttl=0, per_cycle=False, clock=lambda: now[0])
+    cache.put(("show", 1, "show nve vni"), "vni")
+    cache.new_cycle()
+    now[0] = 1000.0
+    assert cache.get(("show", 1, "show nve vni")) == (True, "vni")
+
+def test_collect_fact_list_order():
+#
+# Verify the fact-list FACTs collected by the workers are asserted in fact-list order when the responses complete out of order
+#
+    header = '''
+Topology ID VNI         Prod  IP Addr                                 Flags
+----------- ----------- ----- --------------------------------------- -------
+'''
+    responses = {"show l2route evpn imet all": (0.3, header + "1001        1001        VXLAN 201.1.1.1                               -\n"),
+                 "show l2route evpn imet vni 1002": (0.2, header + "1002        1002        BGP   204.1.1.1                               -\n"),
+                 "show l2route evpn imet vni 1003": (0.0, header + "1003        1003        BGP   205.1.1.1                               -\n")}
+    def imet_fact(command, device_index):
+        return {"fact_type": "show_and_assert", "device_index": device_index,
+                "command": command,
+                "genie_parser": "NXShowL2RouteEvpnImetAll",
+                "assert_fact_for_each_item_in": "nve_peer_l2vpn",
+                "protofact": {"template": "nve-peer-imet",
+                              "slots": {"nve-peer": "$", "vni": "$+vni"},
+                              "types": {"nve-peer": "str", "vni": "int"}}}
+    devices = [["10.1.1.1", 22, "admin", "admin", "leaf1", "ssh", "", "", "", "", "10.2(1)"],
+               ["10.1.1.2", 22, "admin", "admin", "leaf2", "ssh", "", "", "", "", "10.2(1)"]]
+    engine = ddr_engine(**{"device-list": devices, "collect-workers": 3, "collect-device-workers": 2, "nc-merge-filters": 0,
+                           "fact-list": [imet_fact("show l2route evpn imet all", 0), imet_fact("show l2route evpn imet vni 1002", 1),
+                                         imet_fact("show l2route evpn imet vni 1003", 0)]})
+    engine.env.build('(deftemplate nve-peer-imet (slot device) (slot timestamp) (slot nve-peer) (slot vni))')
+    completed = []
+    def ssh_command(device_info, command, timeout):
+        delay, response = responses[command]
+        time.sleep(delay)
+        completed.append(command)
+        return response
+    engine.ssh_command = ssh_command
+
+    engine.collect_fact_list()
+    assert completed == ["show l2route evpn imet vni 1003", "show l2route evpn imet vni 1002", "show l2route evpn imet all"]
+    assert [(fact1["device"], fact1["nve-peer"], fact1["vni"]) for fact1 in engine.env.facts()] == [
+        ("leaf1", "201.1.1.1", 1001), ("leaf2", "204.1.1.1", 1002), ("leaf1", "205.1.1.1", 1003)]
+
+def test_show_response_unchanged():
+#
+# Verify an unchanged show_and_assert response asserts the cached FACTs without parsing and a changed response is parsed
+#
+    response = '''
+Topology ID VNI         Prod  IP Addr                                 Flags
+----------- ----------- ----- --------------------------------------- -------
+1002        1002        BGP   204.1.1.1                               -
+1001        1001        VXLAN 201.1.1.1                               -
+'''
+    fact = {"fact_type": "show_and_assert",
+            "command": "show l2route evpn imet all",
+            "genie_parser": "NXShowL2RouteEvpnImetAll",
+            "assert_fact_for_each_item_in": "nve_peer_l2vpn",
+            "protofact": {"template": "nve-peer-imet",
+                          "slots": {"nve-peer": "$", "vni": "$+vni", "producer": "$+producer"},
+                          "types": {"nve-peer": "str", "vni": "int", "producer": "str"}}}
+    engine = ddr_engine(**{"show-response-cache": 1, "device-list": [["10.1.1.1", 22, "admin", "admin", "leaf1", "ssh", "", "", "", "", "10.2(1)"]]})
+    engine.env.build('(deftemplate nve-peer-imet (slot device) (slot timestamp) (slot nve-peer) (slot vni) (slot producer))')
+    responses = [response]
+    engine.ssh_command = lambda device_info, command, timeout: responses[0]
+    parses = []
+    parse_show_response = engine.parse_show_response
+    def counted_parse(*args):
+        parses.append(args[0]["command"])
+        return parse_show_response(*args)
+    engine.parse_show_response = counted_parse
+
+    def facts():
+        return sorted((fact1["device"], fact1["nve-peer"], fact1["vni"]) for fact1 in engine.env.facts())
+
+    engine.show_and_assert_fact(fact, 0)
+    assert facts() == [("leaf1", "201.1.1.1", 1001), ("leaf1", "204.1.1.1", 1002)]
+    assert (len(parses), engine.response_cache_hits) == (1, 0)
+
+    engine.env.reset()
+    engine.show_and_assert_fact(fact, 0)
+    assert facts() == [("leaf1", "201.1.1.1", 1001), ("leaf1", "204.1.1.1", 1002)]
+    assert (len(parses), engine.response_cache_hits) == (1, 1)
+
+    engine.env.reset()
+    engine.control["show-response-cache-keep-facts"] = 0
+    engine.show_and_assert_fact(fact, 0)
+    assert facts() == []
+    assert (len(parses), engine.response_cache_hits) == (1, 2)
+
+    engine.env.reset()
+    responses[0] = response.replace("1001        1001", "1001        1003")
+    engine.show_and_assert_fact(fact, 0)
+    assert facts() == [("leaf1", "201.1.1.1", 1003), ("leaf1", "204.1.1.1", 1002)]
+    assert (len(parses), engine.response_cache_hits) == (2, 2)
+
+def test_yang_push_publisher():
+#
+# Verify YANG push subscriptions and the periodic and on-change updates from the local publisher
+#
+    ns = "http://cisco.com/ns/yang/cisco-nx-os-device"
+    data = '<data><System xmlns="%s"><eps-items><epId-items><Ep-list><epId>1</epId><adminSt>%s</adminSt></Ep-list></epId-items></eps-items></System></data>'
+    path = '<System xmlns="%s"><eps-items><epId-items><Ep-list><adminSt/></Ep-list></epId-items></eps-items></System>' % ns
+    now = [0.0]
+    publisher = YangPushPublisher(data % (ns, "enabled"), clock=lambda: now[0])
+
+    rpc = yang_push_subscription({"path": path, "period": 500})
+    assert "<yp:periodic><yp:period>500</yp:period></yp:periodic>" in rpc
+    periodic = subscription_id(publisher.dispatch(rpc).xml)
+    on_change = subscription_id(publisher.dispatch(yang_push_subscription({"path": path, "on_change": True})).xml)
+    assert (periodic, on_change) == ("1", "2")
+
+    updates = []
+    while True:
+        notification = publisher.take_notification(block=False)
+        if notification is None:
+            break
+        updates.extend(push_updates(notification.notification_xml))
+    assert sorted(sid for sid, content in updates) == ["1", "2"]
+
+    fact = {"assert_fact_for_each": "Ep-list",
+            "protofact": {"template": "nve", "slots": {"admin-state": "adminSt"}, "types": {"admin-state": "str"}}}
+    plan = compile_netconf_fact(fact)
+    assert [fact1 for fact1, errors in plan.extract(updates[0][1])] == [{"admin-state": "enabled"}]
+
+    publisher.set_data(data % (ns, "disabled"))
+    sid, content = list(push_updates(publisher.take_notification(block=False).notification_xml))[0]
+    assert sid == on_change
+    assert [fact1 for fact1, errors in plan.extract(content)] == [{"admin-state": "disabled"}]
+    assert publisher.take_notification(block=False) is None
+
+    now[0] = 5.0
+    sid, content = list(push_updates(publisher.take_notification(block=False).notification_xml))[0]
+    assert sid == periodic
+    assert [fact1 for fact1, errors in plan.extract(content)] == [{"admin-state": "disabled"}]
+
+def test_telemetry_updates():
+#
+# Verify the listener queues only updates for its subscriptions and FACTs from later updates replace the earlier FACTs
+#
+    ns = "http://cisco.com/ns/yang/cisco-nx-os-device"
+    peer = '<DyPeer-list><ip>%s</ip><state>%s</state></DyPeer-list>'
+    data = '<data><System xmlns="%s"><eps-items><epId-items><Ep-list><epId>1</epId><peers-items><dy_peer-items>%s</dy_peer-items></peers-items></Ep-list></epId-items></eps-items></System></data>'
+    path = '<System xmlns="%s"><eps-items><epId-items><Ep-list><peers-items><dy_peer-items><DyPeer-list/></dy_peer-items></peers-items></Ep-list></epId-items></eps-items></System>' % ns
+    publisher = YangPushPublisher(data % (ns, peer % ("10.1.1.1", "Up") + peer % ("10.1.1.2", "Up")))
+    session = NetconfSession("leaf1", lambda: publisher)
+    session.connect()
+    engine = ddr_engine(**{"debug-nc": 0, "retry-time": 1, "device-list": [["10.1.1.1", 830, "admin", "admin", "leaf1"]]})
+    engine.env.build('(deftemplate nve-peer (slot device) (slot timestamp) (slot peer-ip) (slot state))')
+    engine.netconf_plans = {}
+    engine.device = [session]
+    engine.telemetry_queue = queue.Queue()
+    engine.telemetry_event = threading.Event()
+    engine.telemetry_stop = threading.Event()
+    engine.telemetry_facts = {}
+    engine.telemetry_update_facts = {}
+    entry = {"path": path, "on_change": True, "assert_fact_for_each": "DyPeer-list", "key_slots": ["peer-ip"],
+             "protofact": {"template": "nve-peer", "slots": {"peer-ip": "ip", "state": "state"}, "types": {"peer-ip": "str", "state": "str"}}}
+
+    listener = threading.Thread(target=engine.telemetry_listener, args=(0, [entry]))
+    listener.start()
+    try:
+        assert engine.telemetry_event.wait(5)
+        assert engine.assert_telemetry_updates() == 1
+        engine.telemetry_event.clear()
+        with publisher.condition:
+            publisher.notifications.append(publisher.push_update("99", ""))
+            publisher.condition.notify_all()
+        deadline = time.time() + 5
+        while publisher.notifications != [] and time.time() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.1)
+        assert not engine.telemetry_event.is_set()
+        assert engine.telemetry_queue.empty()
+
+        publisher.set_data(data % (ns, peer % ("10.1.1.1", "Down") + peer % ("10.1.1.2", "Up")))
+        assert engine.telemetry_event.wait(5)
+        assert engine.assert_telemetry_updates() == 1
+    finally:
+        engine.telemetry_stop.set()
+        listener.join(5)
+    assert sorted((fact1["peer-ip"], fact1["state"]) for fact1 in engine.env.facts()) == [("10.1.1.1", "Down"), ("10.1.1.2", "Up")]
+
+    periodic = dict(entry, period=100)
+    del periodic["key_slots"]
+    update = '<System xmlns="%s"><eps-items><epId-items><Ep-list><epId>1</epId><peers-items><dy_peer-items>%s</dy_peer-items></peers-items></Ep-list></epId-items></eps-items></System>'
+    engine.env.reset()
+    for state in ["Up", "Down", "Up"]:
+        engine.assert_telemetry_update(periodic, 0, update % (ns, peer % ("10.1.1.1", state) + peer % ("10.1.1.3", state)))
+    assert sorted((fact1["peer-ip"], fact1["state"]) for fact1 in engine.env.facts()) == [("10.1.1.1", "Up"), ("10.1.1.3", "Up")]
+
+def test_element_filter():
+#
+# Verify element_list values are normalized for the slot type and compiled into a frozenset
+#
+    assert element_filter(["201.1.1.1", " 1.2.3.4 "]) == frozenset(["201.1.1.1", "1.2.3.4"])
+    assert element_filter(["1", 2, "x"], "int") == frozenset([1, 2])
+    assert normalize_element(" 2 ", "int") == 2
+    assert normalize_element("Up", "int") is None
+
+    get_result = '''<data><System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device"><eps-items><epId-items>
+    <Ep-list><epId>1</epId><adminSt>enabled</adminSt></Ep-list>
+    <Ep-list><epId>2</epId><adminSt>disabled</adminSt></Ep-list>
+  </epId-items></eps-items></System></data>'''
+    fact = {"assert_fact_for_each": "Ep-list",
+            "element_list": {"nve": ["2"]},
+            "protofact": {"template": "nve", "slots": {"nve": "epId", "admin-state": "adminSt"},
+                          "types": {"nve": "int", "admin-state": "str"}}}
+    plan = compile_netconf_fact(fact)
+    assert [fact1 for fact1, errors in plan.extract(get_result)] == [{"nve": 2, "admin-state": "disabled"}]
+
+def test_trigger_matcher():
+#
+# Verify every trigger with all strings in the message is returned in ddr-facts order and regexes are precompiled
+#
+    triggers = [[['BGP-5-ADJCHANGE', 'Down'], [], 'False', ['.*', '.*neighbor (?P<neighbor>(\\S+)) Down.*', 'leaf1', [['neighbor', 'str']], 'NEIGHBOR-DOWN', 'bgp-event']],
+                [['ADJCHANGE'], [], 'False', []],
+                [['LINEPROTO', 'down'], [], 'False', ['(unbalanced', '.*']],
+                [[], [], 'False', []],
+                [['she', 'hers'], [], 'False', []]]
+    matcher = TriggerMatcher(triggers, regex_fields=(0, 1))
+    automaton = TriggerMatcher(triggers)
+    automaton.automaton_triggers = 0
+    message = "%BGP-5-ADJCHANGE: neighbor 10.1.1.1 Down BGP Notification sent"
+    for trigger_matcher in [matcher, automaton]:
+        assert trigger_matcher.match(message) == [0, 1, 3]
+        assert trigger_matcher.match("%LINEPROTO-5-UPDOWN: changed state to down") == [2, 3]
+        assert trigger_matcher.match("ushers") == [3, 4]
+        assert trigger_matcher.match("%SYS-5-CONFIG_I: Configured") == [3]
+    assert matcher.regex(0, 1).search(message).groupdict()["neighbor"] == "10.1.1.1"
+    with pytest.raises(re.error):
+        matcher.regex(2, 0)
+    assert TriggerMatcher([]).match(message) == []
+
+def test_coalesce_triggers():
+#
+# Verify trigger counts are kept for each trigger and events matched within trigger-window are processed together
+#
+    engine = ddr_engine(**{"trigger-max-batch": 3, "trigger-window": 0,
+                           "syslog-triggers": [[['BGP', 'Down'], [], 'False', []], [['BGP', 'Down'], [], 'False', []], [[], [], 'False', []]],
+                           "notification-triggers": [[['BGP', 'Down'], [], 'False', []]]})
+    engine.trigger_counts = {}
+    for kind, trigger_index in [("syslog", 0), ("syslog", 1), ("syslog", 1), ("syslog", 2), ("notification", 0)]:
+        engine.count_trigger(kind, trigger_index)
+    assert engine.trigger_counts_xml() == ('      <trigger><type>syslog</type><index>0</index><match>BGP Down</match><count>1</count></trigger>\n'
+                                           '      <trigger><type>syslog</type><index>1</index><match>BGP Down</match><count>2</count></trigger>\n'
+                                           '      <trigger><type>syslog</type><index>2</index><match></match><count>1</count></trigger>\n'
+                                           '      <trigger><type>notification</type><index>0</index><match>BGP Down</match><count>1</count></trigger>\n')
+    assert engine.trigger_counts == {}
+
+    waits = []
+    def events(batches):
+        def wait_event(timeout, limit):
+            waits.append((timeout is None, limit))
+            return batches.pop(0)[:limit] if batches else []
+        return wait_event
+    processed = []
+    def process_event(event):
+        processed.append(event)
+        return event
+
+    assert engine.coalesce_triggers(events([[False, True, True], [True]]), process_event) == 2
+    assert waits == [(True, 3)]
+    assert engine.coalesce_triggers(events([[False], [True]]), process_event) == 0
+    assert processed == [False, True, True, False]
+
+    engine.control["trigger-window"] = 1000
+    waits.clear()
+    processed.clear()
+    assert engine.coalesce_triggers(events([[True], [False, True], [True, True]]), process_event) == 3
+    assert waits == [(True, 3), (False, 2), (False, 1)]
+    assert processed == [True, False, True, True]
+
+    engine.control["trigger-window"] = 20
+    waits.clear()
+    assert engine.coalesce_triggers(events([[True]]), process_event) == 1
+    assert waits == [(True, 3), (False, 2)]
+
+def test_syslog_receiver():
+#
+# Verify the bounded syslog queue counters and that datagrams received by the asyncio receiver are returned in batches
+#
+    syslog_queue = SyslogQueue(size=3)
+    syslog_queue.put_many(["m1", "m2", "m3", "m4", "m5"])
+    assert (syslog_queue.received, syslog_queue.dropped, syslog_queue.overflows) == (5, 2, 1)
+    assert syslog_queue.get_batch(2) == ["m3", "m4"]
+    assert syslog_queue.get_batch(10) == ["m5"]
+    assert syslog_queue.get_batch(10, timeout=0.01) == []
+    assert syslog_queue.batches == 2
+
+    syslog_queue = SyslogQueue(size=1000)
+    hub = SyslogHub("localhost", 0)
+    hub.subscriptions = [SyslogSubscription(syslog_queue)]
+    receiver = SyslogReceiver(hub, "localhost", 0)
+    port = receiver.start()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        for index in range(100):
+            sock.sendto(("<189>leaf1: %BGP-5-ADJCHANGE: neighbor 10.1.1." + str(index) + " Down").encode(), ("localhost", port))
+        messages = []
+        while len(messages) < 100:
+            batch = syslog_queue.get_batch(500, timeout=5)
+            assert batch != []
+            messages.extend(batch)
+    finally:
+        sock.close()
+        receiver.stop()
+    assert messages[0] == (" %BGP-5-ADJCHANGE: neighbor 10.1.1.0 Down", None)
+    assert syslog_queue.dropped == 0
+
+def test_syslog_hub():
+#
+# Verify one shared listener routes each message to the queues of the subscriptions accepting the source and triggers
+#
+    bgp = TriggerMatcher([[['BGP-5-ADJCHANGE', 'Down'], [], 'False', []]])
+    link = TriggerMatcher([[['LINK-3-UPDOWN'], [], 'False', []]])
+    bgp_queue, link_queue, other_queue = SyslogQueue(), SyslogQueue(), SyslogQueue()
+    hub = SyslogHub.shared("localhost", 0)
+    assert SyslogHub.shared("localhost", 0) is hub
+    bgp_subscription = hub.subscribe(bgp_queue, ["127.0.0.1"], bgp)
+    link_subscription = hub.subscribe(link_queue, [], link)
+    other_subscription = hub.subscribe(other_queue, ["10.9.9.9"], None)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        for message in ["<189>leaf1: %BGP-5-ADJCHANGE: neighbor 10.1.1.1 Down", "<187>leaf1: %LINK-3-UPDOWN: Interface Ethernet1/1, changed state to down", "<189>leaf1: %SYS-5-CONFIG_I: Configured"]:
+            sock.sendto(message.encode(), ("127.0.0.1", hub.port))
+        assert bgp_queue.get_batch(10, timeout=5) == [(" %BGP-5-ADJCHANGE: neighbor 10.1.1.1 Down", [0])]
+        assert link_queue.get_batch(10, timeout=5) == [(" %LINK-3-UPDOWN: Interface Ethernet1/1, changed state to down", [0])]
+        deadline = time.time() + 5
+        while hub.received < 3 and time.time() < deadline:
+            time.sleep(0.01)
+        assert hub.unrouted == 1
+        assert len(other_queue) == 0
+    finally:
+        sock.close()
+        for subscription in [bgp_subscription, link_subscription, other_subscription]:
+            hub.unsubscribe(subscription)
+    assert hub.receiver is None
+    assert ("localhost", 0) not in SyslogHub.hubs
+    stale = SyslogHub.shared("localhost", 0)
+    stale.unsubscribe(stale.subscribe(SyslogQueue()))
+    assert ("localhost", 0) not in SyslogHub.hubs and stale.receiver is None
+    current = SyslogHub.shared("localhost", 0)
+    assert current is not stale
+    subscription = stale.subscribe(SyslogQueue())
+    assert SyslogHub.hubs[("localhost", 0)] is current and subscription.hub is current
+    assert stale.receiver is None and current.receiver is not None
+    stale.unsubscribe(subscription)
+    assert current.receiver is None and ("localhost", 0) not in SyslogHub.hubs
+
+def test_syslog_tcp():
+#
+# Verify RFC6587 framing, RFC5424 header parsing and TCP syslog routed by the hub with the UDP listener
+#
+    message = '<165>1 2003-10-11T22:14:15.003Z leaf1 bgp - ID47 [exampleSDID@32473 iut="3" eventSource="Appl\\"ic\\]ation"] %BGP-5-ADJCHANGE: neighbor 10.1.1.1 Down'
+    header = parse_syslog_5424(message)
+    assert (header["facility"], header["severity"], header["hostname"], header["procid"]) == (20, 5, "leaf1", None)
+    assert header["structured-data"] == {"exampleSDID@32473": {"iut": "3", "eventSource": 'Appl"ic]ation'}}
+    assert header["msg"] == "%BGP-5-ADJCHANGE: neighbor 10.1.1.1 Down"
+    assert parse_syslog_5424("<189>123: leaf1: %BGP-5-ADJCHANGE: neighbor 10.1.1.1 Down") is None
+    assert syslog_entry(message.encode(), "10.0.0.1") == ("%BGP-5-ADJCHANGE: neighbor 10.1.1.1 Down", ("10.0.0.1", "leaf1"))
+
+    buffer = bytearray(b"16 <1>1 - - - - - -\n<2>abc\r\n\n5 <3>x")
+    assert syslog_frames(buffer) == [b"<1>1 - - - - - -", b"<2>abc"]
+    assert buffer == bytearray(b"5 <3>x")
+    buffer.extend(b"y")
+    assert syslog_frames(buffer) == [b"<3>xy"]
+    with pytest.raises(ValueError):
+        syslog_frames(bytearray(b"99999999 x"), 100)
+
+    bgp = TriggerMatcher([[['BGP-5-ADJCHANGE', 'Down'], [], 'False', []]])
+    bgp_queue = SyslogQueue()
+    hub = SyslogHub.shared("localhost", 0)
+    subscription = hub.subscribe(bgp_queue, ["leaf1", "leaf2"], bgp, tcp=True)
+    try:
+        frames = b"".join((str(len(line)) + " " + line).encode() for line in [message.replace("10.1.1.1", "10.1.1." + str(index)) for index in range(200)])
+        frames += b"<189>1 2023-05-18T10:00:00Z leaf2 bgp - - - %BGP-5-ADJCHANGE: neighbor 10.2.2.2 Down\n"
+        frames += b"<189>1 2023-05-18T10:00:00Z leaf3 bgp - - - %BGP-5-ADJCHANGE: neighbor 10.3.3.3 Down\n"
+        with socket.create_connection(("localhost", hub.port)) as sock:
+            sock.sendall(frames)
+        messages = []
+        while len(messages) < 201:
+            batch = bgp_queue.get_batch(500, timeout=5)
+            assert batch != []
+            messages.extend(batch)
+        deadline = time.time() + 5
+        while hub.received < 202 and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        hub.unsubscribe(subscription)
+    assert messages[0] == ("%BGP-5-ADJCHANGE: neighbor 10.1.1.0 Down", [0])
+    assert messages[-1] == ("%BGP-5-ADJCHANGE: neighbor 10.2.2.2 Down", [0])
+    assert bgp_queue.dropped == 0
+    assert hub.unrouted == 1
+
+def test_netconf_fact_records(tmp_path):
+#
+# Verify FACTs are generated from a directory of captured get replies for protofact and multitemplate definitions
+#
+    reply = '''<rpc-reply xmlns="urn:ietf:params:xml:ns:netconf:base:1.0" message-id="101"><data>
+  <System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device"><eps-items><epId-items>
+    <Ep-list><epId>%d</epId><adminSt>enabled</adminSt>
+      <peers-items><dy_peer-items><DyPeer-list><ip>201.1.1.%d</ip><state>Up</state></DyPeer-list></dy_peer-items></peers-items>
+    </Ep-list>
+  </epId-items></eps-items></System></data></rpc-reply>'''
+    for index in range(1, 3):
+        (tmp_path / ("reply-%d.xml" % index)).write_text(reply % (index, index))
+
+    fact = {"fact_type": "multitemplate_protofact",
+            "assert_fact_for_each": "DyPeer-list",
+            "hardcoded_list": ["device"],
+            "protofact": {"template": "nve-peer",
+                          "slots": {"device": "None", "nve": "Ep-list/epId", "peer-ip": "ip", "peer-state": "state"},
+                          "types": {"device": "str", "nve": "int", "peer-ip": "str", "peer-state": "str"}}}
+    assert list(netconf_fact_records(fact, str(tmp_path), "leaf1")) == [
+        ("nve-peer", {"device": "leaf1", "nve": 1, "peer-ip": "201.1.1.1", "peer-state": "Up"}),
+        ("nve-peer", {"device": "leaf1", "nve": 2, "peer-ip": "201.1.1.2", "peer-state": "Up"})]
+
+    multitemplate = {"fact_type": "multitemplate",
+                     "data": ["multitemplate", 0, "leaf1", "", "nve-state", "Ep-list",
+                              ["epId", "adminSt"], [["epId", "int"], ["admin-state", "str"]], [], [2]]}
+    env = clips.Environment()
+    env.build("(deftemplate nve-state (slot device) (slot epId) (slot admin-state))")
+    count, errors = assert_netconf_files(env, multitemplate, [str(tmp_path / "reply-1.xml"), str(tmp_path / "reply-2.xml")], "leaf1")
+    assert (count, errors) == (1, [])
+    assert [dict(fact1) for fact1 in env.facts()] == [{"device": "leaf1", "epId": 2, "admin-state": "enabled"}]
+
+    env = clips.Environment()
+    env.build("(deftemplate nve-state (slot device) (slot epId) (slot admin-state))")
+    assert get_netconf_fact(multitemplate["data"], reply % (2, 2), env) == []
+    assert len(list(env.facts())) == 1
+
+class FakeSSHSession:
+#
+# Stand-in for an SSHSession that logs in without a device.  Sessions to an address in "down" fail to connect
+# and a session to an address in "dropped" is closed by the device after the first command
+#
+    down = set()
+    dropped = set()
+
+    def __init__(self, address, user, password, timeout=30, logfile=None):
+        self.address = address
+        self.user = user
+        self.open = False
+        self.commands = []
+
+    def connect(self):
+        if self.address in FakeSSHSession.down:
+            raise pexpect.EOF("connection refused")
+        self.open = True
+
+    def alive(self):
+        return self.open
+
+    def run(self, command, timeout=None):
+        self.commands.append(command)
+        if self.address in FakeSSHSession.dropped:
+            self.open = False
+            raise pexpect.EOF("closed by device")
+        return command + " response"
+
+    def close(self):
+        self.open = False
+
+def test_ssh_session_pool():
+#
+# Verify sessions are reused, a checkout waits for a session to be returned or discarded and
+# commands are retried once on a new session
+#
+    pool = SSHSessionPool(session_class=FakeSSHSession)
+    pool.set_size("10.1.1.1", 2)
+    first = pool.checkout("10.1.1.1", "admin", "admin", 1)
+    second = pool.checkout("10.1.1.1", "admin", "admin", 1)
+    assert first is not second
+    with pytest.raises(pexpect.TIMEOUT, match="No SSH session to 10.1.1.1 available"):
+        pool.checkout("10.1.1.1", "admin", "admin", 0.05)
+    pool.checkin(first)
+    assert pool.checkout("10.1.1.1", "admin", "admin", 1) is first
+
+    checked_out = []
+    waiter = threading.Thread(target=lambda: checked_out.append(pool.checkout("10.1.1.1", "admin", "admin", 5)))
+    start = time.time()
+    waiter.start()
+    time.sleep(0.05)
+    second.close()
+    pool.discard(("10.1.1.1", "admin"))
+    waiter.join(5)
+    assert time.time() - start < 1
+    assert checked_out[0] not in [first, second] and checked_out[0].alive()
+    assert pool.created[("10.1.1.1", "admin")] == 2
+
+    pool.checkin(first)
+    pool.checkin(checked_out[0])
+    first.close()
+    assert pool.run_command("10.1.1.1", "admin", "admin", "show version") == "show version response"
+    assert checked_out[0].commands == ["show version"]
+    assert pool.created[("10.1.1.1", "admin")] == 1
+
+    FakeSSHSession.down.add("10.2.2.2")
+    with pytest.raises(pexpect.EOF):
+        pool.checkout("10.2.2.2", "admin", "admin", 1)
+    assert pool.created[("10.2.2.2", "admin")] == 0
+    FakeSSHSession.down.clear()
+
+    FakeSSHSession.dropped.add("10.3.3.3")
+    with pytest.raises(pexpect.EOF, match="closed by device"):
+        pool.run_command("10.3.3.3", "admin", "admin", "show version")
+    assert pool.created[("10.3.3.3", "admin")] == 0
+    FakeSSHSession.dropped.clear()
+    pool.close_all()
+    assert pool.created[("10.1.1.1", "admin")] == 0
+
+class FakeTransport:
+    def __init__(self):
+        self.keepalives = 0
+
+    def send_ignore(self):
+        self.keepalives += 1
+
+class FakeNetconfManager:
+#
+# Stand-in for an ncclient manager.  get raises "error" when set and the session drops when connected is False
+#
+    def __init__(self):
+        self.connected = True
+        self.session = type("FakeSession", (), {})()
+        self.session._transport = FakeTransport()
+        self.error = None
+        self.closed = False
+
+    def get(self, filter=None):
+        if self.error is not None:
+            raise self.error
+        return type("FakeReply", (), {"xml": "<data/>"})()
+
+    def close_session(self):
+        self.closed = True
+
+def test_netconf_session_breaker():
+#
+# Verify the circuit breaker states, the reconnect backoff schedule, keepalive and reconnect after a failure
+#
+    attempts = []
+    managers = []
+    def connect():
+        attempts.append(len(attempts))
+        if down[0]:
+            raise OSError("connection refused")
+        managers.append(FakeNetconfManager())
+        return managers[-1]
+    down = [True]
+    logs = []
+    session = NetconfSession("leaf1", connect, logs.append, timeout=0.05)
+    pool = NetconfSessionPool(keepalive=30, backoff=1, backoff_max=8)
+    pool.add(session)
+
+    assert pool.connect([session])[0][0] is session
+    assert (session.state, session.error) == ("open", "connection refused")
+    with pytest.raises(NetconfSessionUnavailable, match="not connected: connection refused"):
+        session.get_xml("<System/>")
+
+    retries = []
+    for now in [100, 101, 103, 107, 115, 123]:
+        pool.maintain(now, 1000)
+        retries.append(session.retry_time)
+    assert retries == [101, 103, 107, 115, 123, 131]
+    assert len(attempts) == 6
+    assert logs[-1] == "%%%% DDR Error: NETCONF session to leaf1 reconnect failed: connection refused"
+
+    down[0] = False
+    pool.maintain(131, 1000)
+    assert (session.state, session.failures) == ("closed", 0)
+    assert logs[-1] == "**** DDR Notice: NETCONF session to leaf1 reconnected"
+    assert session.get_xml("<System/>") == "<data/>"
+
+    managers[-1].error = ncclient.operations.RPCError(to_ele('<rpc-error xmlns="urn:ietf:params:xml:ns:netconf:base:1.0"><error-type>application</error-type>'
+                                                               '<error-tag>invalid-value</error-tag><error-severity>error</error-severity></rpc-error>'))
+    with pytest.raises(ncclient.operations.RPCError):
+        session.get_xml("<System/>")
+    assert session.state == "closed"
+    managers[-1].error = None
+
+    session.lock.acquire()
+    try:
+        with pytest.raises(NetconfSessionUnavailable, match="busy"):
+            session.get_xml("<System/>")
+    finally:
+        session.lock.release()
+
+    pool.maintain(200, 200)
+    assert managers[-1].session._transport.keepalives == 1
+    managers[-1].connected = False
+    pool.maintain(230, 230)
+    assert (session.state, session.retry_time) == ("open", 231)
+    assert managers[-1].closed
+    assert logs[-1] == "%%%% DDR Error: NETCONF session to leaf1 dropped: session closed"
+    pool.maintain(231, 1000)
+    assert session.state == "closed" and len(managers) == 2
+
+class FakeNetconfDevice:
+#
+# Stand-in for a NetconfSession that replies to each get after "delay" seconds or blocks until released
+#
+    def __init__(self, name, delay=0, release=None):
+        self.name = name
+        self.delay = delay
+        self.release = release
+        self.gets = []
+
+    def get_xml(self, subtree):
+        self.gets.append(subtree)
+        if self.release is not None:
+            self.release.wait(10)
+        time.sleep(self.delay)
+        return "<data><name>" + self.name + "</name></data>"
+
+def test_netconf_get_many_timeout():
+#
+# Verify the timeout is measured from the start of each get so gets queued for a worker are not reported as timed out
+# and a device that does not reply does not stop the gets for the other devices
+#
+    names = ["leaf" + str(index) for index in range(6)]
+    engine = ddr_engine(**{"nc-timeout": 0.25, "netconf-workers": 2, "debug-nc": 0,
+                           "device-list": [["10.1.1." + str(index), 830, "admin", "admin", name] for index, name in enumerate(names)]})
+    engine.device = [FakeNetconfDevice(name, delay=0.1) for name in names]
+    results = engine.netconf_get_many([(index, "<System/>") for index in range(6)])
+    assert [result["error"] for result in results] == [None] * 6
+    assert [result["xml"] for result in results] == ["<data><name>" + name + "</name></data>" for name in names]
+    assert [result["device"] for result in results] == names
+
+    release = threading.Event()
+    engine.device[0] = FakeNetconfDevice("leaf0", release=release)
+    try:
+        requests = [(0, "<System/>"), (0, "<Interfaces/>"), (1, "<System/>"), (2, "<System/>"), (3, "<System/>")]
+        engine.control["netconf-workers"] = 1
+        results = engine.netconf_get_many(requests)
+        assert [result["error"] for result in results] == ["timeout", "timeout", None, None, None]
+        assert engine.device[0].gets == ["<System/>"]
+    finally:
+        release.set()
+
+def test_netconf_stand_in_server():
+#
+# Verify ncclient gets, RFC5277 notifications and injected errors using the local NETCONF stand-in server
+#
+    import ncclient.manager
+    server = NetconfStandInServer(synthetic_nve_data(peers=50, vnis=5, eps=2), notification_rate=50, seed=1)
+    port = server.start()
+    try:
+        manager = ncclient.manager.connect_ssh(host="localhost", port=port, username="ddr", password="ddr",
+                                               hostkey_verify=False, look_for_keys=False, allow_agent=False, timeout=10)
+        path = ('<System xmlns="http://cisco.com/ns/yang/cisco-nx-os-device"><eps-items><epId-items><Ep-list><epId>2</epId>'
+                '<peers-items><dy_peer-items><DyPeer-list/></dy_peer-items></peers-items></Ep-list></epId-items></eps-items></System>')
+        fact = {"assert_fact_for_each": "DyPeer-list",
+                "protofact": {"template": "nve-peer", "slots": {"nve": "Ep-list/epId", "peer-ip": "ip"}, "types": {"nve": "int", "peer-ip": "str"}}}
+        facts = [fact1 for fact1, errors in compile_netconf_fact(fact).extract(manager.get(filter=("subtree", path)).xml)]
+        assert len(facts) == 50
+        assert facts[0] == {"nve": 2, "peer-ip": "10.2.0.0"}
+
+        manager.create_subscription(stream_name="snmpevents")
+        notification = manager.take_notification(block=True, timeout=5)
+        assert "DDR stand-in notification 0" in notification.notification_xml
+
+        server.error_rate = 1.0
+        with pytest.raises(Exception):
+            manager.get(filter=("subtree", path))
+        assert server.counters["error"] == 1
+        server.error_rate = 0
+        assert len(server.sessions) == 1
+        manager.close_session()
+        deadline = time.time() + 5
+        while server.sessions != [] and time.time() < deadline:
+            time.sleep(0.01)
+        assert server.sessions == []
+    finally:
+        server.stop()